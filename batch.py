@@ -0,0 +1,86 @@
+"""
+Offline batch writing the indicator snapshots served by the dashboard,
+to be run after the market close
+
+    python batch.py AAPL MSFT ...
+    python batch.py --tickers tickers.txt --workers 4
+"""
+import os
+import sys
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from src.providers import getProvider
+from src.dataStore import OHLCVStore
+from src.snapshots import SnapshotStore
+from src.stockClass import Stock
+
+PROVIDER = os.environ.get('TRADE_DASH_PROVIDER', 'yahoo')
+REPLAY_FOLDER = os.environ.get('TRADE_DASH_REPLAY', 'replay')
+DATA_FOLDER = os.environ.get('TRADE_DASH_DATA', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data'))
+
+
+def snapshotTicker(ticker, dataFolder, provider) :
+    """
+    Refresh the history of a ticker, compute its indicators and write its snapshot
+
+    Parameters
+    ----------
+    ticker : str
+        Name of the stock
+    dataFolder : str
+        Folder of the history store and of the snapshots
+    provider : str
+        Market data provider, see providers.getProvider
+
+    Returns
+    -------
+    str
+        Identifier of the snapshot, None when the ticker has no bars
+    """
+    provider = getProvider(provider, folder=REPLAY_FOLDER) if provider == 'replay' else getProvider(provider)
+    store = OHLCVStore(dataFolder, provider)
+    stock = Stock(ticker.strip().upper(), lib=provider, history=store.history(ticker, refresh=True))
+    if stock.stockValue.empty : return None
+    stock.computeIndicators()
+    return SnapshotStore(os.path.join(dataFolder, 'snapshots')).save(stock)
+
+
+def readTickers(path) :
+    # One ticker per line, blank lines and # comments are skipped
+    with open(path) as f :
+        lines = [line.split('#')[0].strip() for line in f]
+    return [line for line in lines if line]
+
+
+def main(argv=None) :
+    parser = argparse.ArgumentParser(description='Write the indicator snapshots of the tickers')
+    parser.add_argument('tickers', nargs='*', help='Names of the stocks')
+    parser.add_argument('--tickers', dest='tickerFile', help='File with one ticker per line')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Number of worker processes')
+    parser.add_argument('--data', default=DATA_FOLDER, help='Folder of the history store and of the snapshots')
+    parser.add_argument('--provider', default=PROVIDER, help='Market data provider')
+    args = parser.parse_args(argv)
+
+    tickers = list(args.tickers) + (readTickers(args.tickerFile) if args.tickerFile else [])
+    tickers = list(dict.fromkeys(t.strip().upper() for t in tickers))
+    if not tickers : parser.error('no tickers given')
+
+    start = time.time()
+    failed = 0
+    with ProcessPoolExecutor(max_workers=max(1, min(args.workers, len(tickers)))) as executor :
+        futures = {t : executor.submit(snapshotTicker, t, args.data, args.provider) for t in tickers}
+        for ticker, future in futures.items() :
+            try :
+                snapshot = future.result()
+                print('%-10s %s' % (ticker, snapshot if snapshot is not None else 'no data'))
+                if snapshot is None : failed += 1
+            except Exception as error :
+                print('%-10s failed: %r' % (ticker, error))
+                failed += 1
+    print('%d snapshots written in %.1f s, %d failed' % (len(tickers)-failed, time.time()-start, failed))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__' :
+    sys.exit(main())
@@ -0,0 +1,64 @@
+"""
+Microbenchmark of the extrema detector against the per-element loop
+previously used by utils.computeMinMax
+
+Run from the repository root with
+    python -m benchmarks.extrema
+"""
+import timeit
+import numpy as np
+import pandas as pd
+from src.extrema import extremaDates, extremaMask
+from .indicators import syntheticClose
+
+
+# Reference implementation, kept as it was in utils
+def legacyMinMax(arr,length=200, tollerance=1.5) :
+    maxima = [];    minima = []
+    # Compute for the last n values
+    length = len(arr) - length
+    for i in range(length,len(arr)-1) : 
+        if arr[i-1] < arr[i] > arr[i+1] :
+            if maxima == [] : maxima.append(arr.index[i]) 
+            if minima != [] :
+                if (((arr[maxima[-1]]+arr[maxima[-1]]*0.01*tollerance) >= arr[i]) \
+                    and (((arr[maxima[-1]]-arr[maxima[-1]]*0.01*tollerance) <= arr[i]))
+                    or
+                    ((arr[minima[-1]]+arr[minima[-1]]*0.01*tollerance) >= arr[i] ) \
+                    and ((arr[minima[-1]]-arr[minima[-1]]*0.01*tollerance <= arr[i]))): continue
+                maxima.append(arr.index[i]) 
+        if arr[i-1] > arr[i] < arr[i+1] :
+            if minima == [] : minima.append(arr.index[i]) 
+            if maxima != [] :
+                if (((arr[minima[-1]]+arr[minima[-1]]*0.01*tollerance) >= arr[i] ) \
+                    and ((arr[minima[-1]]-arr[minima[-1]]*0.01*tollerance <= arr[i]))
+                    or
+                    ((arr[maxima[-1]]+arr[maxima[-1]]*0.01*tollerance) >= arr[i]) \
+                    and (((arr[maxima[-1]]-arr[maxima[-1]]*0.01*tollerance) <= arr[i]))): continue
+            minima.append(arr.index[i]) 
+
+    i = len(arr)-1
+    if arr[-2] < arr[-1] : maxima.append(arr.index[-1]) 
+    if arr[-2] > arr[-1] : minima.append(arr.index[-1])
+    return maxima[1:], minima[1:]
+
+
+def run(days=1260, tickers=500, repeat=5) :
+    close = pd.Series(syntheticClose(days), index=pd.bdate_range('2017-01-02', periods=days))
+    print('{:<22}{:>14}{:>14}{:>10}{:>8}'.format('case', 'legacy [ms]', 'engine [ms]', 'speedup', 'match'))
+    for tollerance in [1.5, 4.0] :
+        match = legacyMinMax(close, tollerance=tollerance) == extremaDates(close, tollerance=tollerance)
+        tLegacy = min(timeit.repeat(lambda : legacyMinMax(close, tollerance=tollerance), number=1, repeat=repeat))*1e3
+        tEngine = min(timeit.repeat(lambda : extremaDates(close, tollerance=tollerance), number=1, repeat=repeat))*1e3
+        print('{:<22}{:>14.3f}{:>14.3f}{:>9.0f}x{:>8}'.format('series, tol %.1f' % tollerance, tLegacy, tEngine, tLegacy/tEngine, str(match)))
+
+    # Whole panel at once against one legacy call per ticker
+    panel = np.column_stack([syntheticClose(days, seed) for seed in range(tickers)])
+    columns = [pd.Series(panel[:, i], index=close.index) for i in range(tickers)]
+    tLegacy = min(timeit.repeat(lambda : [legacyMinMax(c) for c in columns], number=1, repeat=1))*1e3
+    tEngine = min(timeit.repeat(lambda : extremaMask(panel), number=1, repeat=repeat))*1e3
+    print('{:<22}{:>14.3f}{:>14.3f}{:>9.0f}x{:>8}'.format('panel of %d' % tickers, tLegacy, tEngine, tLegacy/tEngine, '-'))
+
+
+if __name__ == '__main__' :
+    run()
@@ -0,0 +1,61 @@
+"""
+Cold start of the dashboard: import time and peak memory of the modules
+loaded before the server can bind its port. Fails (exit status 1) when one
+of the forecasting backends, which must only be loaded on first use
+(see src.backends), is imported at start
+
+Run from the repository root with
+    python -m benchmarks.importTime [module]
+"""
+import re
+import sys
+import subprocess
+
+
+# Modules that must not be imported at start
+LAZY = ['keras', 'tensorflow', 'statsmodels', 'pmdarima', 'sklearn', 'matplotlib', 'trendet', 'prophet', 'src.forecast']
+
+LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)$')
+
+
+def importProfile(module='src.layout') :
+    """
+    Import module in a new interpreter with -X importtime
+
+    Returns
+    -------
+    list
+        (name, self [us], cumulative [us], depth) of every imported module, in import order
+    int
+        Peak resident memory of the interpreter [kB]
+    """
+    code = 'import resource, %s; print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)' % module
+    done = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], capture_output=True, text=True)
+    if done.returncode != 0 : raise RuntimeError(done.stderr.strip().splitlines()[-1])
+    modules = []
+    for line in done.stderr.splitlines() :
+        match = LINE.match(line)
+        if match is None : continue
+        selfTime, cumulative, indent, name = match.groups()
+        modules.append((name, int(selfTime), int(cumulative), len(indent)//2))
+    return modules, int(done.stdout.split()[-1])
+
+
+def run(module='src.layout', top=15) :
+    modules, memory = importProfile(module)
+    total = sum(cumulative for _, _, cumulative, depth in modules if depth == 0)
+    print('{:<40}{:>12.3f} s'.format('import %s' % module, total*1e-6))
+    print('{:<40}{:>12.1f} MB'.format('peak memory', memory/1024))
+    print('{:<40}{:>12}'.format('modules', len(modules)))
+    print('\n{:<40}{:>14}'.format('slowest', 'cumulative [s]'))
+    for name, _, cumulative, _ in sorted(modules, key=lambda m : -m[2])[:top] :
+        print('{:<40}{:>14.3f}'.format(name, cumulative*1e-6))
+    eager = [lazy for lazy in LAZY if any((name == lazy) or name.startswith(lazy + '.') for name, _, _, _ in modules)]
+    if eager :
+        print('\nLoaded at start, they should be loaded on first use: %s' % ', '.join(eager))
+        return 1
+    return 0
+
+
+if __name__ == '__main__' :
+    sys.exit(run(*sys.argv[1:2]))
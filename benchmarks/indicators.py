@@ -0,0 +1,76 @@
+"""
+Microbenchmark of the vectorized indicator engine against the per-element
+loops previously used by Stock.computeMA, Stock.computeMomentum and Stock.computeMACD
+
+Run from the repository root with
+    python -m benchmarks.indicators
+"""
+import timeit
+import numpy as np
+from src import indicators
+
+
+# Reference implementations, kept as they were in Stock
+def legacyMA(close, nDays=20, kind='simple', limiter=None) :
+    if limiter != None : limit = min(len(close)-nDays,limiter)
+    else : limit = len(close)-nDays
+
+    if kind == 'simple' :
+        SMA = []
+        for i in range(limit) :
+            SMA.append((1/nDays)*sum(close[np.arange(-i-nDays,-i)]))
+        SMA.reverse()
+        return SMA
+    if kind == 'exp' :
+        EMA = [(1/nDays)*sum(close[-limit:-limit+nDays])]
+        K = 2/(nDays+1)
+        for i in range(1,limit) :
+            EMA.append(K* (close[-limit-nDays+i] - EMA[i-1]) + EMA[i-1])
+        return EMA
+
+
+def legacyMomentum(close, nDays=14) :
+    Mom = []
+    for days in range(nDays,len(close)) :
+        Mom.append(100*(close[days] - close[days-nDays])/close[days-nDays])
+    return Mom
+
+
+def legacyMACD(close, nDays=[3,10]) :
+    shortTerm = legacyMA(close, nDays=nDays[0])
+    longTerm = legacyMA(close, nDays=nDays[1])
+    MACD = []
+    for i in range(len(longTerm)) :
+        MACD.append(shortTerm[i] - longTerm[i])
+    return MACD
+
+
+def syntheticClose(days=1260, seed=0) :
+    """
+    Geometric random walk standing for 5 years of daily closing values
+    """
+    rng = np.random.default_rng(seed)
+    return 100*np.exp(np.cumsum(rng.normal(0, 0.02, days)))
+
+
+CASES = {
+    'EMA20'    : (lambda c : legacyMA(c, 20, 'exp'),    lambda c : indicators.computeMA(c, 20, 'exp')),
+    'EMA50'    : (lambda c : legacyMA(c, 50, 'exp'),    lambda c : indicators.computeMA(c, 50, 'exp')),
+    'SMA200'   : (lambda c : legacyMA(c, 200, 'simple'), lambda c : indicators.computeMA(c, 200, 'simple')),
+    'Momentum' : (legacyMomentum,                        indicators.computeMomentum),
+    'MACD'     : (legacyMACD,                            indicators.computeMACD),
+}
+
+
+def run(days=1260, repeat=5) :
+    close = syntheticClose(days)
+    print('{:<10}{:>14}{:>14}{:>10}{:>8}'.format('indicator', 'legacy [ms]', 'engine [ms]', 'speedup', 'match'))
+    for name, (legacy, engine) in CASES.items() :
+        match = np.allclose(legacy(close), engine(close), rtol=1e-10, atol=1e-10*close.max())
+        tLegacy = min(timeit.repeat(lambda : legacy(close), number=1, repeat=repeat))*1e3
+        tEngine = min(timeit.repeat(lambda : engine(close), number=1, repeat=repeat))*1e3
+        print('{:<10}{:>14.3f}{:>14.3f}{:>9.0f}x{:>8}'.format(name, tLegacy, tEngine, tLegacy/tEngine, str(match)))
+
+
+if __name__ == '__main__' :
+    run()
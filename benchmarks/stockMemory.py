@@ -0,0 +1,64 @@
+"""
+Memory held by a computed Stock: the compact slotted layout (one matrix of
+bars, one array of dates, float64 indicators and int64 positions) against
+the lists of Timestamps and the DataFrames previously kept by Stock
+
+Run from the repository root with
+    python -m benchmarks.stockMemory [days] [stocks]
+"""
+import sys
+import pickle
+import tracemalloc
+import numpy as np
+import pandas as pd
+from src.stockClass import Stock, DATES
+from .indicators import syntheticClose
+
+
+def syntheticBars(days, seed=0) :
+    close = syntheticClose(days, seed)
+    return pd.DataFrame({
+        'Open'   : close*0.99,
+        'High'   : close*1.01,
+        'Low'    : close*0.98,
+        'Close'  : close,
+        'Volume' : np.full(days, 1000000, dtype=np.int64),
+    }, index=pd.DatetimeIndex(pd.bdate_range('2000-01-03', periods=days), name='Date'))
+
+
+def legacyState(stock) :
+    # What Stock held before: the bars DataFrame, the lists of Timestamps and the trends DataFrame
+    state = {name : list(getattr(stock, name)) for name in DATES}
+    state['stockValue'] = stock.stockValue.copy()
+    state['trends'] = stock.trends
+    return state
+
+
+def footprint(build, count) :
+    # Bytes allocated per object still alive after building count of them
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    objects = [build(i) for i in range(count)]
+    size = tracemalloc.get_traced_memory()[0] - start
+    tracemalloc.stop()
+    return size/len(objects)
+
+
+def run(days=1300, count=20) :
+    stocks = []
+    for seed in range(count) :
+        stock = Stock('S%d' % seed, history=syntheticBars(days, seed))
+        stock.computeIndicators()
+        stocks.append(stock)
+    compact = footprint(lambda i : pickle.loads(pickle.dumps(stocks[i])), count)
+    legacy = footprint(lambda i : legacyState(stocks[i]), count) + sum(a.nbytes for a in [stocks[0].closeSum, stocks[0].momentum,
+        stocks[0].momentumDerivative, stocks[0].EMA20, stocks[0].EMA50, stocks[0].SMA200, stocks[0].MACD])
+    print('{:<30}{:>12}'.format('days', days))
+    print('{:<30}{:>12.1f} kB'.format('legacy Stock', legacy/1024))
+    print('{:<30}{:>12.1f} kB'.format('compact Stock', compact/1024))
+    print('{:<30}{:>12.1f} kB'.format('pickled compact Stock', len(pickle.dumps(stocks[0]))/1024))
+    print('{:<30}{:>12.1f}'.format('ratio', legacy/compact))
+
+
+if __name__ == '__main__' :
+    run(*[int(arg) for arg in sys.argv[1:3]])
@@ -0,0 +1,88 @@
+import numpy as np
+from statsmodels.tsa.arima.model import ARIMA
+
+
+# ARIMA fits run by the workers of forecast.AutoARIMA_batch. Only statsmodels
+# is imported, the workers do not load the rest of the forecast backend
+
+
+def arima_candidate(train_data, order, start_params=None) :
+    """
+    Fit of a candidate order
+
+    Returns
+    -------
+    dict
+        order, aic, nobs, fitted params and pvalue of the Ljung-Box test of
+        the residuals (10 lags), aic is inf when the fit fails
+    """
+    try :
+        model = ARIMA(train_data, order=order)
+        fitted = model.fit() if start_params is None else model.fit(start_params=start_params)
+    except Exception :
+        return {'order' : order, 'aic' : np.inf}
+    return {
+        'order'  : order,
+        'aic'    : fitted.aic,
+        'nobs'   : fitted.nobs,
+        'params' : np.asarray(fitted.params),
+        'pvalue' : fitted.test_serial_correlation('ljungbox', lags=10)[0, 1, -1],
+    }
+
+
+def arima_degraded(fit, state, aicTolerance=0.02, minPvalue=0.05) :
+    # A stored order is searched again when the residuals get autocorrelated or the aic per observation worsens
+    if not np.isfinite(fit['aic']) : return True
+    if fit['pvalue'] < minPvalue : return True
+    return fit['aic']/fit['nobs'] > state.get('aic', np.inf)/state.get('nobs', 1) + aicTolerance
+
+
+def arima_stepwise(train_data, d, start_p=2, start_q=2, max_p=5, max_q=5, maxFits=30) :
+    """
+    Stepwise search of the (p, q) orders, as auto_arima(stepwise=True)
+
+    The search starts from (start_p, start_q), (0, 0), (1, 0) and (0, 1),
+    then moves to the neighbour (p and/or q changed by one) lowering the
+    aic until none does
+
+    Parameters
+    ----------
+    train_data : Series
+        Training data
+    d : int
+        Order of differencing
+    start_p : int, optional
+        Starting p, by default 2
+    start_q : int, optional
+        Starting q, by default 2
+    max_p : int, optional
+        Maximum p, by default 5
+    max_q : int, optional
+        Maximum q, by default 5
+    maxFits : int, optional
+        Maximum number of fits, by default 30
+
+    Returns
+    -------
+    dict
+        Fit with the lowest aic, see arima_candidate
+    """
+    fits = {}
+    def fit(p, q) :
+        if (p, q) not in fits : fits[(p, q)] = arima_candidate(train_data, (p, d, q))
+        return fits[(p, q)]
+
+    best = min([fit(p, q) for p, q in [(min(start_p, max_p), min(start_q, max_q)), (0, 0), (1, 0), (0, 1)]], key=lambda f : f['aic'])
+    improved = True
+    while improved and (len(fits) < maxFits) :
+        improved = False
+        p, q = best['order'][0], best['order'][2]
+        for dp, dq in [(-1, 0), (1, 0), (0, -1), (0, 1), (-1, -1), (1, 1), (-1, 1), (1, -1)] :
+            if not ((0 <= p+dp <= max_p) and (0 <= q+dq <= max_q)) or ((p+dp, q+dq) in fits) : continue
+            if len(fits) >= maxFits : break
+            candidate = fit(p+dp, q+dq)
+            if candidate['aic'] < best['aic'] :
+                best = candidate
+                improved = True
+                break
+    return best
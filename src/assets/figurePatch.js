@@ -0,0 +1,51 @@
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    figure: {
+        /*
+         * Turn the rendered figure into the queried one by removing and
+         * adding traces, keyed by trace uid (see dashCallbacks.figurePatch).
+         * The added traces are inserted at their position in the new figure,
+         * the data of the restyled traces is replaced (e.g. after a zoom).
+         */
+        applyPatch: function(patch, graphId) {
+            var container = document.getElementById(graphId);
+            var gd = container ? container.getElementsByClassName('js-plotly-plot')[0] : null;
+            if (!patch || !gd || !gd.data) {
+                return window.dash_clientside.no_update;
+            }
+            var remove = [];
+            gd.data.forEach(function(trace, i) {
+                if (patch.remove.indexOf(trace.uid) >= 0) {
+                    remove.push(i);
+                }
+            });
+            if (remove.length > 0) {
+                Plotly.deleteTraces(gd, remove);
+            }
+            if (patch.add.length > 0) {
+                Plotly.addTraces(gd, patch.add, patch.indices);
+            }
+            if (patch.restyle) {
+                // Plotly restyles many traces at once only with a common set of attributes
+                var groups = {};
+                gd.data.forEach(function(trace, i) {
+                    var update = patch.restyle[trace.uid];
+                    if (!update) {
+                        return;
+                    }
+                    var keys = Object.keys(update).sort();
+                    var name = keys.join(',');
+                    if (!groups[name]) {
+                        groups[name] = {update: {}, indices: []};
+                        keys.forEach(function(key) { groups[name].update[key] = []; });
+                    }
+                    keys.forEach(function(key) { groups[name].update[key].push(update[key]); });
+                    groups[name].indices.push(i);
+                });
+                Object.keys(groups).forEach(function(name) {
+                    Plotly.restyle(gd, groups[name].update, groups[name].indices);
+                });
+            }
+            return patch.indices.length;
+        }
+    }
+});
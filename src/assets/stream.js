@@ -0,0 +1,47 @@
+// Dates are compared up to the seconds, serializers differ in the fractional part
+function sameDate(a, b) {
+    return String(a).replace(' ', 'T').substring(0, 19) === String(b).replace(' ', 'T').substring(0, 19);
+}
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    stream: {
+        /*
+         * Extend the rendered figure with the points streamed by the server,
+         * keyed by trace uid (see Stock.streamPoints).
+         * When the first point shares the date of the last rendered one it
+         * replaces it, since that bar may have been partial.
+         */
+        extendFigure: function(points, graphId) {
+            var container = document.getElementById(graphId);
+            var gd = container ? container.getElementsByClassName('js-plotly-plot')[0] : null;
+            if (!points || !gd || !gd.data) {
+                return window.dash_clientside.no_update;
+            }
+            // Plotly extends traces only with a common set of attributes
+            var groups = {};
+            gd.data.forEach(function(trace, i) {
+                var update = points[trace.uid];
+                if (!update || update.x.length === 0) {
+                    return;
+                }
+                var keys = Object.keys(update).sort();
+                if (trace.x.length > 0 && sameDate(trace.x[trace.x.length - 1], update.x[0])) {
+                    keys.forEach(function(key) {
+                        trace[key] = trace[key].slice(0, -1);
+                    });
+                }
+                var name = keys.join(',');
+                if (!groups[name]) {
+                    groups[name] = {update: {}, indices: []};
+                    keys.forEach(function(key) { groups[name].update[key] = []; });
+                }
+                keys.forEach(function(key) { groups[name].update[key].push(update[key]); });
+                groups[name].indices.push(i);
+            });
+            Object.keys(groups).forEach(function(name) {
+                Plotly.extendTraces(gd, groups[name].update, groups[name].indices);
+            });
+            return points.OHLC ? points.OHLC.x[points.OHLC.x.length - 1] : window.dash_clientside.no_update;
+        }
+    }
+});
@@ -0,0 +1,41 @@
+import importlib
+import threading
+
+
+# Heavy optional backends, imported on first use so that the server starts
+# without loading them. name -> module, relative to this package or absolute
+BACKENDS = {
+    'forecast' : '.forecast',         # keras/TensorFlow, statsmodels, pmdarima, scikit-learn, matplotlib
+    'prophet'  : 'prophet',           # Prophet forecasts (cmdstanpy), loaded by forecast.prophet
+    'trendet'  : 'trendet',           # Trend benchmark of Stock.minMaxTrend_buylogic_benchmark
+}
+
+_modules = {}
+_guard   = threading.Lock()
+
+
+def backend(name) :
+    """
+    Module of a backend, imported on the first call
+
+    Parameters
+    ----------
+    name : str
+        Name of the backend, see BACKENDS
+
+    Returns
+    -------
+    module
+        The imported module
+    """
+    module = _modules.get(name)
+    if module is not None : return module
+    with _guard :
+        if name not in _modules :
+            if name not in BACKENDS : raise KeyError('Unknown backend %s' % name)
+            _modules[name] = importlib.import_module(BACKENDS[name], __package__)
+        return _modules[name]
+
+
+def loaded(name) :
+    return name in _modules
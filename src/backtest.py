@@ -0,0 +1,151 @@
+import numpy as np
+
+
+# Vectorized backtests
+# close is a dates x tickers matrix (or a single series) and positions the
+# exposure held at the close of each date, with the same leading shape plus
+# optional trailing axes (e.g. one per parameter set). The position of date t
+# earns the return from t to t+1, so every ticker and parameter set is
+# evaluated with the same array operations.
+
+def alignTail(values, length) :
+    """
+    Indicator aligned to the last dates of a history of length dates,
+    the missing head is filled with zeros
+
+    Parameters
+    ----------
+    values : array
+        Values of the last len(values) dates, along axis 0
+    length : int
+        Number of dates of the history
+
+    Returns
+    -------
+    np.array
+        length x values.shape[1:]
+    """
+    values = np.asarray(values)
+    aligned = np.zeros((length,) + values.shape[1:], dtype=values.dtype)
+    if len(values) : aligned[length-len(values):] = values[len(values)-min(len(values), length):]
+    return aligned
+
+
+def crossoverPositions(fast, slow, length) :
+    """
+    Long positions while the fast average is above the slow one
+
+    Parameters
+    ----------
+    fast : array
+        Fast average, aligned to the last dates
+    slow : array
+        Slow average, aligned to the last dates
+    length : int
+        Number of dates of the history
+
+    Returns
+    -------
+    np.array
+        1.0 where fast > slow, 0.0 elsewhere (and before the slow average starts)
+    """
+    days = min(len(fast), len(slow))
+    return alignTail((np.asarray(fast)[len(fast)-days:] > np.asarray(slow)[len(slow)-days:]).astype(np.float64), length)
+
+
+def positionsFromDays(index, enterDays, exitDays) :
+    """
+    Positions of the enter and exit days given by the buy logics of Stock
+    (MA_buyLogic, minMaxTrend_buylogic). A trade bought at the close of the
+    enter day and sold at the close of the exit day earns
+    Stock.computePercentualGain(enterDay, exitDay)
+
+    Parameters
+    ----------
+    index : DatetimeIndex
+        Dates of the history
+    enterDays : list
+        Enter days, repeated days are ignored
+    exitDays : list
+        Exit day of each enter day
+
+    Returns
+    -------
+    np.array
+        1.0 from each enter day (included) to its exit day (excluded)
+    """
+    change = np.zeros(len(index)+1)
+    pairs = set(zip(index.get_indexer(enterDays), index.get_indexer(exitDays)))
+    for enter, exit in pairs :
+        if (enter < 0) or (exit < enter) : continue
+        change[enter] += 1
+        change[exit] -= 1
+    return np.minimum(np.cumsum(change[:-1]), 1.0)
+
+
+def backtest(close, positions, cost=0.0) :
+    """
+    Equity curve and statistics of the positions
+
+    Parameters
+    ----------
+    close : array
+        Closing values, dates x tickers (or 1-D)
+    positions : array
+        Exposure at the close of each date, close.shape plus optional
+        trailing axes (e.g. parameter sets)
+    cost : float, optional
+        Cost per unit of position change, as a fraction of the equity, by default 0.0
+
+    Returns
+    -------
+    dict
+        equity : np.array
+            Value of 1 invested at the first date, positions.shape
+        drawdown : np.array
+            Relative distance of the equity from its running maximum, positions.shape
+        totalReturn : np.array
+            Final equity - 1, positions.shape[1:]
+        maxDrawdown : np.array
+            Minimum of the drawdown, positions.shape[1:]
+        trades : np.array
+            Number of trades, positions.shape[1:]
+        hitRate : np.array
+            Fraction of trades with a gain, nan without trades, positions.shape[1:]
+        turnover : np.array
+            Sum of the absolute position changes, positions.shape[1:]
+    """
+    close = np.asarray(close, dtype=np.float64)
+    positions = np.asarray(positions, dtype=np.float64)
+    close = close.reshape(close.shape + (1,)*(positions.ndim - close.ndim))
+    returns = close[1:]/close[:-1] - 1
+    changes = np.abs(np.diff(positions, axis=0, prepend=0))
+    strategy = positions[:-1]*returns - cost*changes[:-1]
+
+    equity = np.ones(positions.shape)
+    np.cumprod(1 + strategy, axis=0, out=equity[1:])
+    drawdown = equity/np.maximum.accumulate(equity, axis=0) - 1
+
+    # Trades, one per run of held dates of each column
+    shape = positions.shape[1:]
+    held = (positions[:-1] > 0).reshape(len(positions)-1, -1).T
+    growth = np.log1p(strategy).reshape(len(positions)-1, -1).T
+    starts = held & ~np.hstack([np.zeros((held.shape[0], 1), dtype=bool), held[:, :-1]])
+    tradeId = np.cumsum(starts.ravel()) - 1
+    inTrade = held.ravel()
+    tradeGrowth = np.bincount(tradeId[inTrade], weights=growth.ravel()[inTrade], minlength=int(starts.sum()))
+    tradeColumn = np.nonzero(starts)[0]
+    trades = np.bincount(tradeColumn, minlength=held.shape[0])
+    wins = np.bincount(tradeColumn, weights=tradeGrowth > 0, minlength=held.shape[0])
+    with np.errstate(invalid='ignore', divide='ignore') :
+        hitRate = np.where(trades > 0, wins/trades, np.nan)
+
+    return {
+        'equity'      : equity,
+        'drawdown'    : drawdown,
+        'totalReturn' : equity[-1] - 1,
+        'maxDrawdown' : drawdown.min(axis=0),
+        'trades'      : trades.reshape(shape),
+        'hitRate'     : hitRate.reshape(shape),
+        'turnover'    : changes.sum(axis=0),
+    }
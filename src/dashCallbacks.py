@@ -1,16 +1,71 @@
-from .server import app, cache, TIMEOUT_CACHE
-from .stockClass import Stock
+from .server import app, provider, store, snapshots, stockCache, streamCache, forecastCache, figureCache, jobQueue, INTRADAY_PERIOD, MAX_POINTS, CONTEXT_POINTS
+from .downsample import downsampleFigure, downsampleTrace, sampledData, visibleRange, rangeChanged
+from .stockClass import Stock, STREAMED
+from . import metrics
+import copy
 import dash
-from dash.dependencies import Input, Output, State
+from dash.dependencies import Input, Output, State, ClientsideFunction
 
 
-# Setup the Stock object into the cache
-stockMem = []
+def buildStock(name) :
+    """
+    Load the snapshot of the stock written by batch.py, or load the stock
+    and compute its indicators when there is none
+
+    Parameters
+    ----------
+    name : str
+        Name of the stock to load
+
+    Returns
+    -------
+    Object
+        Stock object with the indicators computed
+    """
+    with metrics.span('snapshot') :
+        stock = snapshots.load(name, provider)
+    if stock is not None : return stock
+    stock = Stock(name, lib=provider, store=store)
+    if stock.stockValue.empty is False :
+        stock.computeIndicators()
+    return stock
+
+
+def refreshStock(stock) :
+    """
+    Bring a cached stock up to date, only the new bars are processed
+
+    Parameters
+    ----------
+    stock : Stock
+        Expired stock object
+
+    Returns
+    -------
+    Object
+        Updated Stock object
+    """
+    if stock.stockValue.empty : return buildStock(stock.stockName)
+    if stock.snapshot is not None :
+        # Snapshots are read-only, they are only replaced by a newer one
+        header = snapshots.current(stock.stockName)
+        if header is None or header['snapshot'] == stock.snapshot : return stock
+        return snapshots.load(stock.stockName, provider) or stock
+    history = store.history(stock.stockName)
+    # The last cached bar is passed again, it may have been partial
+    with metrics.span('indicators') :
+        return stock.extend(history[history.index >= stock.stockValue.index[-1]])
+
+
+def withProvider(stock) :
+    # Stock objects read from the shared cache are pickled without their provider
+    if stock.provider is None : stock.provider = provider
+    return stock
+
 
-@cache.memoize(timeout=TIMEOUT_CACHE)
 def globalStore(name) :
     """
-    Used to cache the stock
+    Used to cache the stock, shared across the sessions and the callbacks
 
     Parameters
     ----------
@@ -20,16 +75,169 @@ def globalStore(name) :
     Returns
     -------
     Object
-        Stock object accessible across the callbacks
+        Stock object accessible across the callbacks, it must not be modified
     """
-    global stockMem
-    stockMem = Stock(name)
-    if stockMem.stockValue.empty is False :
-        stockMem.computeMomentum()
-        stockMem.EMA20  = stockMem.computeMA(nDays=20, kind='exp')
-        stockMem.EMA50  = stockMem.computeMA(nDays=50, kind='exp')
-        stockMem.SMA200 = stockMem.computeMA(nDays=200, kind='simple')
-    return stockMem
+    name = name.strip().upper()
+    return withProvider(stockCache.get(name, lambda : buildStock(name), refreshStock))
+
+
+def buildIntraday(name, interval) :
+    """
+    Load the intraday bars of the stock and compute its indicators
+
+    Parameters
+    ----------
+    name : str
+        Name of the stock to load
+    interval : str
+        Bar width, '1m' or '5m'
+
+    Returns
+    -------
+    Object
+        Stock object with the indicators computed
+    """
+    stock = Stock(name, lib=provider, interval=interval, period=INTRADAY_PERIOD)
+    if stock.stockValue.empty is False :
+        stock.computeIndicators()
+    return stock
+
+
+def refreshIntraday(stock) :
+    """
+    Append the intraday bars published after the last cached one
+
+    Parameters
+    ----------
+    stock : Stock
+        Expired intraday stock object
+
+    Returns
+    -------
+    Object
+        Updated Stock object
+    """
+    if stock.stockValue.empty : return buildIntraday(stock.stockName, stock.interval)
+    with metrics.span('fetch') :
+        bars = provider.history(stock.stockName, start=stock.stockValue.index[-1], interval=stock.interval)
+    with metrics.span('indicators') :
+        return stock.extend(bars)
+
+
+def intradayStore(name, interval) :
+    """
+    Used to cache the intraday stock, refreshed every STREAM_PERIOD seconds
+
+    Parameters
+    ----------
+    name : str
+        Name of the stock to load
+    interval : str
+        Bar width, '1m' or '5m'
+
+    Returns
+    -------
+    Object
+        Stock object accessible across the callbacks, it must not be modified
+    """
+    name = name.strip().upper()
+    return withProvider(streamCache.get((name, interval), lambda : buildIntraday(name, interval), refreshIntraday))
+
+
+def withForecasts(stock, kinds) :
+    """
+    Attach the forecasts trained by the background jobs of the stock, if done.
+    The cached stock is shared by the sessions and is left unchanged, the
+    forecasts are set on a copy
+
+    Parameters
+    ----------
+    stock : Stock
+        Stock object with the indicators computed
+    kinds : list
+        Forecasts queried, 'lstm' and/or 'prophet'
+
+    Returns
+    -------
+    Stock
+        The stock, or a copy of it with the forecasts attached
+    list
+        Kinds of the forecasts which can be rendered
+    """
+    jobs = jobQueue()
+    forecasts = {}
+    for kind in kinds :
+        if stock.hasForecast(kind) : continue
+        jobId = jobs.jobId(kind, stock)
+        # Not cached until the job is done
+        forecast = forecastCache.get(jobId, lambda : jobs.result(jobId))
+        if forecast is not None : forecasts[kind] = forecast
+    if forecasts :
+        stock = copy.copy(stock)
+        for kind, forecast in forecasts.items() :
+            stock.setForecast(kind, forecast)
+    return stock, [kind for kind in kinds if stock.hasForecast(kind)]
+
+
+def renderFigure(stock, key) :
+    """
+    Figure of the stock, cached per figure key
+
+    Parameters
+    ----------
+    stock : Stock
+        Stock object with the indicators computed
+    key : list
+        Ticker, interval, data version and the 7 toggles of Stock.updateGraphs
+
+    Returns
+    -------
+    Plotly figure handler
+        Figure rendering the attributes queried, it must not be modified
+    """
+    def build() :
+        with metrics.span('figure') :
+            return stock.updateGraphs(*key[3:])
+    return figureCache.get(tuple(key), build)
+
+
+def figurePatch(oldKey, newKey, window=None, keep=()) :
+    """
+    Traces to remove from and to add to the rendered figure to turn it into
+    the figure of newKey. A patch is only possible when the figures share the
+    data and the subplots
+
+    Parameters
+    ----------
+    oldKey : list
+        Key of the rendered figure
+    newKey : list
+        Key of the queried figure
+    window : list, optional
+        Visible date range, the added traces are downsampled outside of it
+    keep : list, optional
+        Uids of the traces sent whole, see downsample.reduceTrace
+
+    Returns
+    -------
+    dict
+        Uids of the traces to remove, traces to add and their positions in
+        the new figure, None when the whole figure must be sent
+    """
+    if (oldKey is None) or (list(oldKey[:3]) != list(newKey[:3])) : return None
+    # Momentum and MACD share the middle subplot
+    if (oldKey[6] or oldKey[7]) != (newKey[6] or newKey[7]) : return None
+    old = figureCache.peek(tuple(oldKey))
+    new = figureCache.peek(tuple(newKey))
+    if (old is None) or (new is None) : return None
+    oldUids = [trace.uid for trace in old.data]
+    newUids = [trace.uid for trace in new.data]
+    indices = [i for i, uid in enumerate(newUids) if uid not in oldUids]
+    return {
+        'remove'  : [uid for uid in oldUids if uid not in newUids],
+        'add'     : [downsampleTrace(new.data[i], window, MAX_POINTS, CONTEXT_POINTS, keep) for i in indices],
+        'indices' : indices,
+    }
 
 
 # Callbacks
@@ -38,6 +246,7 @@ def globalStore(name) :
      Output('noDataFound', 'displayed')],
      Input('stockName','value')
 )
+@metrics.timed('updateStock')
 def updateStock(stockName) :
     """
     Takes the stock name queried by the user and use it to
@@ -56,18 +265,12 @@ def updateStock(stockName) :
         The second entry is used to trigger the noDataFound popup
     """
     if len(stockName)>0:
-        globalStore(stockName)
-        if stockMem.stockValue.empty is False :
-            try : 
-                return [
-                        [stockMem.stockTicker.info['shortName'] + ' Stocks'],
-                        False
-                    ]
-            except :
-                return [
-                        [stockMem.stockTicker.ticker + ' Stocks'],
-                        False
-                    ]
+        stock = globalStore(stockName)
+        if stock.stockValue.empty is False :
+            return [
+                    [stock.shortName() + ' Stocks'],
+                    False
+                ]
         else :
             return [
                     dash.no_update,
@@ -81,7 +284,12 @@ def updateStock(stockName) :
 
 
 @app.callback(
-    [Output('stockGraph','figure')],
+    [Output('stockGraph','figure'),
+     Output('streamData','data'),
+     Output('streamCursor','data'),
+     Output('figurePatch','data'),
+     Output('figureKey','data'),
+     Output('visibleRange','data')],
     [Input('graphTitle','children'),
      Input('EMA20Toggle','on'),
      Input('EMA50Toggle','on'),
@@ -89,16 +297,34 @@ def updateStock(stockName) :
      Input('MomentumToggle','on'),
      Input('MACDToggle','on'),
      Input('LSTMToggle','on'),
-     Input('ProphetToggle','on')]
+     Input('ProphetToggle','on'),
+     Input('StreamToggle','on'),
+     Input('intradayInterval','value'),
+     Input('streamTick','n_intervals'),
+     Input('stockGraph','relayoutData'),
+     Input('jobsDone','data')],
+    [State('stockName','value'),
+     State('streamCursor','data'),
+     State('figureKey','data'),
+     State('visibleRange','data')]
     )
-def updateGraph(stockName,EMA20,EMA50,SMA200,Momentum,MACD,LSTM,Prophet) :
+@metrics.timed('updateGraph')
+def updateGraph(graphTitle,EMA20,EMA50,SMA200,Momentum,MACD,LSTM,Prophet,Stream,interval,n_intervals,relayoutData,jobsDone,stockName,cursor,renderedKey,window) :
     """
     This routine is used to render the graph and act as interface 
-    between the dashboard and the Stock class method updateGraphs 
+    between the dashboard and the Stock class method updateGraphs.
+    In the intraday mode the streaming ticks only send the new points,
+    which are appended to the rendered figure by assets/stream.js.
+    Figures are cached per figure key; when only the traces change, the
+    traces to add or remove are sent and applied by assets/figurePatch.js.
+    Only the visible date range is sent at full resolution, zooming sends
+    the data of the traces for the new range.
+    Forecasts are trained in the background (see pollJobs) and rendered
+    once their job is done
 
     Parameters
     ----------
-    stockName : str
+    graphTitle : str
         Trigger used to call this routine after updateStock(stockName) 
     EMA20 : bool
         See Stock.updateGraphs
@@ -108,29 +334,188 @@ def updateGraph(stockName,EMA20,EMA50,SMA200,Momentum,MACD,LSTM,Prophet) :
         See Stock.updateGraphs
     Momentum : bool
         See Stock.updateGraphs
-    Forecast : bool
+    MACD : bool
         See Stock.updateGraphs
+    LSTM : bool
+        See Stock.updateGraphs
+    Prophet : bool
+        See Stock.updateGraphs
+    Stream : bool
+        Render the intraday bars and stream the new ones.
+        Forecasts are trained on daily bars, so they are not rendered
+    interval : str
+        Bar width of the intraday mode
+    n_intervals : int
+        Trigger of the streaming tick
+    relayoutData : dict
+        Zoom and pan events of the chart
+    jobsDone : list
+        Trigger used to call this routine when a forecast job is done
+    stockName : str
+        Name of the stock to render
+    cursor : str
+        Date of the last intraday bar sent to the browser
+    renderedKey : list
+        Key of the rendered figure, see renderFigure
+    window : list
+        Date range shown by the chart, see downsample.visibleRange
 
     Returns
     -------
     Plotly figure handler
         Figure which will be rendered
+    dict
+        New points keyed by trace uid, see Stock.streamPoints
+    str
+        Date of the last intraday bar sent to the browser
+    dict
+        Traces to add or remove, see figurePatch
+    list
+        Key of the rendered figure
+    list
+        Date range shown by the chart
     """
-    if stockMem.stockValue.empty is False :
-        stockMem.updateGraphs(EMA20,EMA50,SMA200,Momentum,MACD,LSTM,Prophet)
-        return [stockMem.figHandler]
+    if not stockName :
+        return [dash.no_update, dash.no_update, None, dash.no_update, None, None]
+    triggered = [t['prop_id'] for t in dash.callback_context.triggered]
+
+    # Streaming tick, only the new points are sent
+    if triggered == ['streamTick.n_intervals'] :
+        if (not Stream) or (cursor is None) :
+            return [dash.no_update]*6
+        stock = intradayStore(stockName, interval)
+        with metrics.span('serialization') :
+            points = stock.streamPoints(cursor) if stock.stockValue.empty is False else {}
+        if not points :
+            return [dash.no_update]*6
+        return [dash.no_update, points, stock.stockValue.index[-1].isoformat(), dash.no_update, dash.no_update, dash.no_update]
+
+    # Zoom, only the date axis changes the sampling
+    zoomed = 'stockGraph.relayoutData' in triggered
+    if zoomed :
+        if (not rangeChanged(relayoutData)) or (renderedKey is None) :
+            return [dash.no_update]*6
+        window = visibleRange(relayoutData)
+
+    if Stream :
+        stock = intradayStore(stockName, interval)
+        LSTM = False;   Prophet = False
     else :
-        return [dash.no_update]
+        stock = globalStore(stockName)
+    # Streamed traces are extended with single bars by assets/stream.js, they are not downsampled
+    keep = STREAMED if Stream else ()
+    if stock.stockValue.empty is False :
+        stock, ready = withForecasts(stock, [kind for kind, on in [('lstm', LSTM), ('prophet', Prophet)] if on])
+        LSTM    = 'lstm' in ready
+        Prophet = 'prophet' in ready
+        cursor = stock.stockValue.index[-1].isoformat() if Stream else None
+        key = [stock.stockName.strip().upper(), stock.interval, stock.version] + [bool(t) for t in [EMA20,EMA50,SMA200,Momentum,MACD,LSTM,Prophet]]
+        # A new stock or interval is shown whole
+        if (renderedKey is None) or (list(renderedKey[:2]) != key[:2]) : window = None
+        fig = renderFigure(stock, key)
+        if zoomed :
+            with metrics.span('serialization') :
+                patch = {'remove' : [], 'add' : [], 'indices' : [], 'restyle' : sampledData(fig, window, MAX_POINTS, CONTEXT_POINTS, keep)}
+            return [dash.no_update, dash.no_update, cursor, patch, dash.no_update, window]
+        with metrics.span('serialization') :
+            patch = figurePatch(renderedKey, key, window, keep)
+            if patch is None : fig = downsampleFigure(fig, window, MAX_POINTS, CONTEXT_POINTS, keep)
+        if patch is None :
+            return [fig, dash.no_update, cursor, dash.no_update, key, window]
+        if (not patch['remove']) and (not patch['add']) :
+            return [dash.no_update, dash.no_update, cursor, dash.no_update, key, window]
+        return [dash.no_update, dash.no_update, cursor, patch, key, window]
+    else :
+        return [dash.no_update, dash.no_update, None, dash.no_update, None, None]
+
+
+@app.callback(
+    [Output('jobStatus','children'),
+     Output('jobTick','disabled'),
+     Output('jobsDone','data')],
+    [Input('graphTitle','children'),
+     Input('LSTMToggle','on'),
+     Input('ProphetToggle','on'),
+     Input('StreamToggle','on'),
+     Input('jobTick','n_intervals')],
+    [State('stockName','value'),
+     State('jobsDone','data')]
+    )
+@metrics.timed('pollJobs')
+def pollJobs(graphTitle,LSTM,Prophet,Stream,n_intervals,stockName,jobsDone) :
+    """
+    Queue the forecasts queried by the user and report the progress of
+    their jobs, polled every JOB_PERIOD seconds until they are over
+
+    Returns
+    -------
+    str
+        Status of the forecast jobs
+    bool
+        Disable the polling when no job is pending
+    list
+        Jobs done, updated to render the new forecasts
+    """
+    if (not stockName) or Stream :
+        return ['', True, dash.no_update]
+    stock = globalStore(stockName)
+    if stock.stockValue.empty :
+        return ['', True, dash.no_update]
+    jobs = jobQueue()
+    labels = []
+    pending = False
+    done = []
+    for kind, name, on in [('lstm', 'LSTM', LSTM), ('prophet', 'Prophet', Prophet)] :
+        if not on : continue
+        jobId = jobs.submit(kind, stock)
+        status = jobs.status(jobId)
+        if status['status'] in ['queued', 'running'] :
+            pending = True
+            labels.append('%s %s %d%%' % (name, status['status'], round(100*status['progress'])))
+        elif status['status'] == 'failed' :
+            labels.append('%s failed' % name)
+        else :
+            done.append(jobId)
+    return [' - '.join(labels), not pending, done if done != jobsDone else dash.no_update]
+
+
+@app.callback(
+    Output('streamTick','disabled'),
+    Input('StreamToggle','on')
+)
+def toggleStream(Stream) :
+    return not Stream
+
+
+# Append the streamed points to the rendered figure, see assets/stream.js
+app.clientside_callback(
+    ClientsideFunction(namespace='stream', function_name='extendFigure'),
+    Output('streamAck','data'),
+    Input('streamData','data'),
+    State('stockGraph','id')
+)
+
+
+# Add and remove the traces of a figure patch, see assets/figurePatch.js
+app.clientside_callback(
+    ClientsideFunction(namespace='figure', function_name='applyPatch'),
+    Output('figurePatchAck','data'),
+    Input('figurePatch','data'),
+    State('stockGraph','id')
+)
 
 
 @app.callback(
     [dash.dependencies.Output('textual_gain', 'children'),
      dash.dependencies.Output('textual_gain', 'style')],
     [dash.dependencies.Input('date_picker_range', 'start_date'),
-     dash.dependencies.Input('date_picker_range', 'end_date')])
-def update_output(start_date, end_date):
-    if ((start_date is not None) and (end_date is not None) and (stockMem.stockValue.empty is False)):
-        perc = stockMem.computePercentualGain(start_date, end_date)
+     dash.dependencies.Input('date_picker_range', 'end_date')],
+    [State('stockName','value')])
+@metrics.timed('update_output')
+def update_output(start_date, end_date, stockName):
+    stock = globalStore(stockName) if stockName else None
+    if ((start_date is not None) and (end_date is not None) and (stock is not None) and (stock.stockValue.empty is False)):
+        perc = stock.computePercentualGain(start_date, end_date)
         if perc > 1.0 : 
             return [
                 'Potential Gain is around ' + str(round(100*(perc-1),1)) + '%',
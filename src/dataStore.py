@@ -0,0 +1,143 @@
+import os
+import time
+import threading
+import numpy as np
+import pandas as pd
+from .providers import getProvider
+
+
+COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume', 'Dividends', 'Stock Splits']
+RECORD = np.dtype([('Date', 'i8')] + [(c, 'f8') for c in COLUMNS])
+
+
+# Class Definitions
+class OHLCVStore(object) :
+    """Class designed to keep the daily history of the stocks on disk
+
+    Each ticker is a single memory-mappable .npy file of records
+    (Date as epoch nanoseconds, then the COLUMNS as float64).
+    On refresh only the bars after the last stored date are fetched;
+    the last stored bar is fetched again, since it may have been partial.
+
+    Attributes
+    ----------
+    folder : str
+        Folder holding one file per ticker
+    provider : Provider
+        Market data provider used to fetch the bars
+    maxAge : float
+        Seconds after which a stored history is refreshed
+    period : str
+        History depth downloaded for a new ticker
+
+    Methods
+    -------
+    history(ticker,refresh=None)
+        History of the ticker, refreshed if older than maxAge
+
+    refresh(ticker)
+        Fetch and append the bars after the last stored date
+
+    load(ticker)
+        Stored history, without any fetch
+    """
+
+    def __init__(self, folder, provider='yahoo', maxAge=150, period='5y') :
+        self.folder   = folder
+        self.provider = getProvider(provider)
+        self.maxAge   = maxAge
+        self.period   = period
+        self._locks   = {}
+        self._guard   = threading.Lock()
+        os.makedirs(self.folder, exist_ok=True)
+
+
+    def path(self, ticker) :
+        return os.path.join(self.folder, ticker.upper() + '.npy')
+
+
+    def _lock(self, ticker) :
+        with self._guard :
+            return self._locks.setdefault(ticker.upper(), threading.Lock())
+
+
+    def history(self, ticker, refresh=None) :
+        """
+        History of the ticker
+
+        Parameters
+        ----------
+        ticker : str
+            Name of the stock
+        refresh : bool, optional
+            Force (True) or skip (False) the refresh, by default
+            it is refreshed when the stored file is older than maxAge
+
+        Returns
+        -------
+        DataFrame
+            Daily bars indexed by date, empty if the ticker is unknown
+        """
+        with self._lock(ticker) :
+            if refresh is None :
+                path = self.path(ticker)
+                refresh = (not os.path.exists(path)) or (time.time() - os.path.getmtime(path) > self.maxAge)
+            if refresh : return self.refresh(ticker)
+            return self.load(ticker)
+
+
+    def load(self, ticker) :
+        """
+        Stored history of the ticker, empty if never fetched
+        """
+        path = self.path(ticker)
+        if not os.path.exists(path) : return _toFrame(np.empty(0, dtype=RECORD))
+        return _toFrame(np.load(path, mmap_mode='r'))
+
+
+    def refresh(self, ticker) :
+        """
+        Fetch the bars after the last stored date and append them
+
+        Parameters
+        ----------
+        ticker : str
+            Name of the stock
+
+        Returns
+        -------
+        DataFrame
+            Updated history of the ticker
+        """
+        path = self.path(ticker)
+        stored = np.load(path) if os.path.exists(path) else np.empty(0, dtype=RECORD)
+        if len(stored) == 0 :
+            fetched = self.provider.history(ticker, period=self.period)
+        else :
+            fetched = self.provider.history(ticker, start=pd.Timestamp(stored['Date'][-1]))
+        delta = _toRecords(fetched)
+        if len(delta) > 0 :
+            stored = np.concatenate([stored[stored['Date'] < delta['Date'][0]], delta])
+            # Each process writes its own temporary file, the rename is atomic
+            tmp = '%s.%d.tmp.npy' % (path, os.getpid())
+            np.save(tmp, stored)
+            os.replace(tmp, path)
+        elif os.path.exists(path) :
+            os.utime(path)
+        return _toFrame(stored)
+
+
+def _toRecords(df) :
+    records = np.zeros(len(df), dtype=RECORD)
+    if len(df) == 0 : return records
+    index = pd.DatetimeIndex(df.index)
+    if index.tz is not None : index = index.tz_localize(None)
+    records['Date'] = index.values.astype('datetime64[ns]').astype('i8')
+    for c in COLUMNS :
+        if c in df : records[c] = df[c].to_numpy(dtype=np.float64)
+    return records
+
+
+def _toFrame(records) :
+    index = pd.DatetimeIndex(np.asarray(records['Date']).astype('datetime64[ns]'), name='Date')
+    return pd.DataFrame({c : np.array(records[c]) for c in COLUMNS}, index=index)
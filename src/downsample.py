@@ -0,0 +1,250 @@
+import re
+import numpy as np
+import pandas as pd
+
+
+# Downsampling of the chart traces
+# The visible window of the chart is sent at full resolution (up to maxPoints
+# points) and the rest of the history is reduced to contextPoints points per
+# side, so panning still shows the shape of the series. Lines are reduced with
+# Largest-Triangle-Three-Buckets, OHLC and bars are aggregated per bucket.
+# Traces extended in place by the browser (see Stock.streamPoints) are listed
+# in keep and sent whole, a streamed bar must not follow an aggregated bucket.
+
+def lttb(y, threshold) :
+    """
+    Largest-Triangle-Three-Buckets selection of the points of a line
+
+    Parameters
+    ----------
+    y : array
+        Values of the line, equally spaced
+    threshold : int
+        Number of points to keep
+
+    Returns
+    -------
+    np.array
+        Sorted positions of the kept points, the first and the last are always kept
+    """
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if (threshold >= n) or (threshold < 3) : return np.arange(n)
+    # Buckets of the inner points, the first and the last point have their own
+    edges = np.linspace(1, n-1, threshold-1).astype(np.int64)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n-1
+    a = 0
+    for i in range(threshold-2) :
+        start, end = edges[i], edges[i+1]
+        # Average point of the next bucket
+        nextStart, nextEnd = end, edges[i+2] if i+2 < len(edges) else n
+        nextX = (nextStart + nextEnd - 1)/2
+        nextY = y[nextStart:nextEnd].mean()
+        x = np.arange(start, end)
+        area = np.abs((a - nextX)*(y[start:end] - y[a]) - (a - x)*(nextY - y[a]))
+        a = start + int(np.argmax(area))
+        selected[i+1] = a
+    return selected
+
+
+def bucketEdges(n, threshold) :
+    """
+    Edges of threshold buckets of similar size over n points
+
+    Returns
+    -------
+    np.array
+        Start of each bucket, the last bucket ends at n
+    """
+    return np.unique(np.linspace(0, n, min(threshold, n)+1).astype(np.int64)[:-1])
+
+
+def minMaxBuckets(values, edges, kind='max') :
+    """
+    Minimum or maximum of the values in each bucket
+
+    Parameters
+    ----------
+    values : array
+        Values to reduce
+    edges : np.array
+        Start of each bucket, see bucketEdges
+    kind : str, optional
+        'min' or 'max', by default 'max'
+
+    Returns
+    -------
+    np.array
+        One value per bucket
+    """
+    reduce = np.maximum if kind == 'max' else np.minimum
+    return reduce.reduceat(np.asarray(values, dtype=np.float64), edges)
+
+
+def visibleRange(relayoutData) :
+    """
+    Date range shown by the chart
+
+    Parameters
+    ----------
+    relayoutData : dict
+        relayoutData of the dcc.Graph
+
+    Returns
+    -------
+    list or None
+        First and last visible dates (iso strings), None when the whole
+        history is shown or the event does not involve the date axis
+    """
+    if not relayoutData : return None
+    for key, value in relayoutData.items() :
+        match = re.fullmatch(r'xaxis\d*\.range(\[[01]\])?', key)
+        if match is None : continue
+        if match.group(1) is None : return [str(value[0]), str(value[1])]
+        axis = key.split('.')[0]
+        return [str(relayoutData[axis + '.range[0]']), str(relayoutData[axis + '.range[1]'])]
+    return None
+
+
+def rangeChanged(relayoutData) :
+    """
+    True when the relayout event zooms, pans or resets the date axis
+    """
+    if not relayoutData : return False
+    return any(re.fullmatch(r'xaxis\d*\.(range.*|autorange)', key) for key in relayoutData)
+
+
+def _parts(x, window) :
+    # Positions of the history before, inside and after the visible window
+    n = len(x)
+    if window is None : return [(0, 0), (0, n), (n, n)]
+    dates = pd.DatetimeIndex(np.asarray(x))
+    lo = int(dates.searchsorted(pd.Timestamp(window[0]), side='left'))
+    hi = int(dates.searchsorted(pd.Timestamp(window[1]), side='right'))
+    # One more point on each side, so lines cross the edges of the chart
+    lo, hi = max(lo-1, 0), min(hi+1, n)
+    return [(0, lo), (lo, hi), (hi, n)]
+
+
+def _selectLine(y, parts, budgets) :
+    return np.concatenate([start + lttb(y[start:end], budget) for (start, end), budget in zip(parts, budgets)])
+
+
+def _bucketStarts(parts, budgets) :
+    return [start + bucketEdges(end-start, budget) for (start, end), budget in zip(parts, budgets) if end > start]
+
+
+def _reducible(trace, contextPoints, keep=()) :
+    if trace.uid in keep : return False
+    if (trace.type == 'scatter') and (trace.mode == 'markers') : return False
+    if trace.type not in ['scatter', 'ohlc', 'bar'] : return False
+    return (trace.x is not None) and (len(trace.x) > contextPoints)
+
+
+def _fields(trace) :
+    return ['x', 'open', 'high', 'low', 'close'] if trace.type == 'ohlc' else ['x', 'y']
+
+
+def reduceTrace(trace, window=None, maxPoints=1500, contextPoints=200, keep=()) :
+    """
+    Downsampled data of a trace
+
+    Parameters
+    ----------
+    trace : Plotly trace
+        Scatter, Ohlc or Bar trace with dates on the x axis
+    window : list, optional
+        Visible date range, see visibleRange, by default the whole history
+    maxPoints : int, optional
+        Points kept inside the visible window, by default 1500
+    contextPoints : int, optional
+        Points kept on each side of the visible window, by default 200
+    keep : list, optional
+        Uids of the traces never reduced, by default none
+
+    Returns
+    -------
+    dict
+        x and y (open, high, low, close for OHLC) of the reduced trace,
+        None when the trace is not reduced. Markers are never reduced
+    """
+    if not _reducible(trace, contextPoints, keep) : return None
+    x = np.asarray(trace.x)
+    parts = _parts(x, window)
+    budgets = [contextPoints, maxPoints, contextPoints]
+    if all(end-start <= budget for (start, end), budget in zip(parts, budgets)) : return None
+    if trace.type == 'scatter' :
+        y = np.asarray(trace.y)
+        selected = _selectLine(y, parts, budgets)
+        return {'x' : x[selected], 'y' : y[selected]}
+    # OHLC and bars are aggregated per bucket, labelled with the last date of the bucket
+    pieces = []
+    for starts, (start, end) in zip(_bucketStarts(parts, budgets), [p for p in parts if p[1] > p[0]]) :
+        local = starts - start
+        last = np.append(starts[1:], end) - 1
+        piece = {'x' : x[last]}
+        if trace.type == 'ohlc' :
+            piece['open']  = np.asarray(trace.open)[starts]
+            piece['high']  = minMaxBuckets(np.asarray(trace.high)[start:end], local, 'max')
+            piece['low']   = minMaxBuckets(np.asarray(trace.low)[start:end], local, 'min')
+            piece['close'] = np.asarray(trace.close)[last]
+        else :
+            piece['y'] = minMaxBuckets(np.asarray(trace.y)[start:end], local, 'max')
+        pieces.append(piece)
+    return {key : np.concatenate([piece[key] for piece in pieces]) for key in pieces[0]}
+
+
+def downsampleTrace(trace, window=None, maxPoints=1500, contextPoints=200, keep=()) :
+    """
+    Downsampled copy of a trace, see reduceTrace
+
+    Returns
+    -------
+    dict
+        Trace ready to be sent to the browser
+    """
+    reduced = trace.to_plotly_json()
+    data = reduceTrace(trace, window, maxPoints, contextPoints, keep)
+    if data is not None : reduced.update(data)
+    return reduced
+
+
+def downsampleFigure(fig, window=None, maxPoints=1500, contextPoints=200, keep=()) :
+    """
+    Downsampled copy of a figure, see reduceTrace
+
+    Parameters
+    ----------
+    fig : Plotly figure handler
+        Figure at full resolution, it is not modified
+
+    Returns
+    -------
+    dict
+        Figure with the reduced traces
+    """
+    return {
+        'data'   : [downsampleTrace(trace, window, maxPoints, contextPoints, keep) for trace in fig.data],
+        'layout' : fig.layout.to_plotly_json(),
+    }
+
+
+def sampledData(fig, window=None, maxPoints=1500, contextPoints=200, keep=()) :
+    """
+    Data of the reducible traces of a figure, to restyle a rendered figure
+    after a zoom without sending it again
+
+    Returns
+    -------
+    dict
+        uid -> x and y (open, high, low, close for OHLC) of the trace for the
+        window, the traces in keep are left as rendered
+    """
+    data = {}
+    for trace in fig.data :
+        if not _reducible(trace, contextPoints, keep) : continue
+        reduced = reduceTrace(trace, window, maxPoints, contextPoints)
+        data[trace.uid] = reduced if reduced is not None else {key : getattr(trace, key) for key in _fields(trace)}
+    return data
@@ -0,0 +1,184 @@
+import numpy as np
+
+
+# Local extrema with the tolerance of utils.computeMinMax
+# The candidates (sign changes of the first difference) are found in bulk;
+# the tolerance depends on the last accepted maximum and minimum, so it is
+# applied by a single loop over the dates holding a candidate, updating all
+# the columns of a dates x tickers matrix at once.
+
+def _near(reference, values, tollerance) :
+    # Same operations as computeMinMax, so the comparisons are bit identical
+    return ((reference + reference*0.01*tollerance) >= values) & ((reference - reference*0.01*tollerance) <= values)
+
+
+def _scan(values, length, tollerance) :
+    """
+    Number of times each date is appended to the maxima and minima lists
+    of utils.computeMinMax, the first append of each list included
+
+    Returns
+    -------
+    np.array
+        Positions scanned, the last one is the last date
+    np.array
+        Appends to the maxima, len(positions) x tickers
+    np.array
+        Appends to the minima, len(positions) x tickers
+    """
+    n, tickers = values.shape
+    # Negative steps index from the end, as the loop of computeMinMax does on short arrays
+    steps = np.arange(max(n - length, 1 - n), n - 1)
+    positions = np.r_[steps % n, n - 1]
+    prev, curr, succ = values[(steps - 1) % n], values[steps % n], values[(steps + 1) % n]
+    isMax = (prev < curr) & (curr > succ)
+    isMin = (prev > curr) & (curr < succ)
+    maxCount = np.zeros((len(positions), tickers), dtype=np.int64)
+    minCount = np.zeros((len(positions), tickers), dtype=np.int64)
+
+    candidates = np.flatnonzero((isMax | isMin).any(axis=1))
+    if tickers == 1 : _suppressSeries(curr[:, 0], isMax[:, 0], isMin[:, 0], candidates, tollerance, maxCount[:, 0], minCount[:, 0])
+    else : _suppressPanel(curr, isMax, isMin, candidates, tollerance, maxCount, minCount)
+
+    # The last value follows its last step
+    maxCount[-1] += values[-2] < values[-1]
+    minCount[-1] += values[-2] > values[-1]
+    return positions, _dropFirst(maxCount), _dropFirst(minCount)
+
+
+def _suppressSeries(curr, isMax, isMin, candidates, tollerance, maxCount, minCount) :
+    # Scalar loop over the candidates of a single series
+    lastMax = lastMin = None
+    values = curr[candidates].tolist()
+    for row, value, maximum in zip(candidates.tolist(), values, isMax[candidates].tolist()) :
+        if maximum :
+            # The first maximum is taken as it is, the next ones (once there
+            # is a minimum) only when far from the last extrema
+            if lastMax is None :
+                maxCount[row] += 1
+                lastMax = value
+            if (lastMin is not None) and not (_near(lastMax, value, tollerance) or _near(lastMin, value, tollerance)) :
+                maxCount[row] += 1
+                lastMax = value
+        else :
+            if lastMin is None :
+                minCount[row] += 1
+                lastMin = value
+            # A minimum is appended again unless there is a maximum close to it
+            if (lastMax is None) or not (_near(lastMin, value, tollerance) or _near(lastMax, value, tollerance)) :
+                minCount[row] += 1
+                lastMin = value
+
+
+def _suppressPanel(curr, isMax, isMin, candidates, tollerance, maxCount, minCount) :
+    # Loop over the dates holding a candidate, all the columns at once
+    tickers = curr.shape[1]
+    lastMax = np.full(tickers, np.nan);     lastMin = np.full(tickers, np.nan)
+    hasMax = np.zeros(tickers, dtype=bool);     hasMin = np.zeros(tickers, dtype=bool)
+    for row in candidates :
+        value = curr[row]
+        maxima, minima = isMax[row], isMin[row]
+        if maxima.any() :
+            first = maxima & ~hasMax
+            maxCount[row] += first
+            hasMax |= first
+            lastMax = np.where(first, value, lastMax)
+            add = maxima & hasMin & ~(_near(lastMax, value, tollerance) | _near(lastMin, value, tollerance))
+            maxCount[row] += add
+            lastMax = np.where(add, value, lastMax)
+        if minima.any() :
+            first = minima & ~hasMin
+            minCount[row] += first
+            hasMin |= first
+            lastMin = np.where(first, value, lastMin)
+            add = minima & ~(hasMax & (_near(lastMin, value, tollerance) | _near(lastMax, value, tollerance)))
+            minCount[row] += add
+            lastMin = np.where(add, value, lastMin)
+
+
+def _dropFirst(count) :
+    # computeMinMax returns its lists without the first element
+    columns = np.flatnonzero(count.any(axis=0))
+    count[(count[:, columns] > 0).argmax(axis=0), columns] -= 1
+    return count
+
+
+def extremaPositions(values, length=200, tollerance=1.5) :
+    """
+    Positions of the local Maxima and Minima of a series, the same points
+    (in the same order) as the dates returned by utils.computeMinMax
+
+    Parameters
+    ----------
+    values : array
+        f(x), 1-D
+    length : int, optional
+        Window length of computation, by default 200
+    tollerance : float, optional
+        Percentual tollerance which determines if values are
+        too close to each other to be declared extremant points, by default 1.5
+
+    Returns
+    -------
+    np.array
+        Positions of the maxima
+    np.array
+        Positions of the minima
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) < 2 : return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    positions, maxCount, minCount = _scan(values[:, None], length, tollerance)
+    return np.repeat(positions, maxCount[:, 0]), np.repeat(positions, minCount[:, 0])
+
+
+def extremaDates(arr, length=200, tollerance=1.5) :
+    """
+    Dates of the local Maxima and Minima of a series, see extremaPositions
+
+    Parameters
+    ----------
+    arr : Series
+        f(x) indexed by date
+
+    Returns
+    -------
+    list
+        Dates of the maxima
+    list
+        Dates of the minima
+    """
+    maxima, minima = extremaPositions(arr.to_numpy(), length, tollerance)
+    return list(arr.index[maxima]), list(arr.index[minima])
+
+
+def extremaMask(values, length=200, tollerance=1.5) :
+    """
+    Local Maxima and Minima of every column of a matrix, see extremaPositions
+
+    Parameters
+    ----------
+    values : array
+        f(x), 1-D or 2-D (dates x tickers)
+    length : int, optional
+        Window length of computation, by default 200
+    tollerance : float, optional
+        Percentual tollerance, by default 1.5
+
+    Returns
+    -------
+    np.array
+        Boolean markers of the maxima, values.shape
+    np.array
+        Boolean markers of the minima, values.shape
+    """
+    values = np.asarray(values, dtype=np.float64)
+    maxima = np.zeros(values.shape, dtype=bool);     minima = np.zeros(values.shape, dtype=bool)
+    if len(values) < 2 : return maxima, minima
+    matrix = values.reshape(len(values), -1)
+    positions, maxCount, minCount = _scan(matrix, length, tollerance)
+    # Positions repeat only when the window is longer than the series
+    for count, mask in [(maxCount, maxima), (minCount, minima)] :
+        flags = np.zeros(matrix.shape, dtype=np.int64)
+        np.add.at(flags, positions, count)
+        mask[...] = (flags > 0).reshape(values.shape)
+    return maxima, minima
@@ -0,0 +1,123 @@
+import threading
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, Future
+from .providers import Provider, getProvider
+
+
+# Class Definitions
+class FetchPool(Provider) :
+    """Provider running the downloads of another provider on a bounded pool
+    of threads
+
+    Requests for the same bars issued while a download is running share its
+    future instead of downloading again. Many tickers are downloaded with
+    batched historyMany calls when the provider supports them, in parallel
+    single calls otherwise. Futures can be awaited with asyncio.wrap_future.
+
+    Attributes
+    ----------
+    provider : Provider
+        Provider performing the downloads
+    workers : int
+        Maximum number of concurrent downloads
+    batchSize : int
+        Maximum number of tickers of a batched download
+
+    Methods
+    -------
+    submit(ticker,start=None,period='5y',interval='1d')
+        Future of the bars of the ticker
+
+    submitMany(tickers,period='5y',interval='1d')
+        Futures of the bars of many tickers
+
+    shutdown(wait=True)
+        Stop the threads of the pool
+    """
+
+    def __init__(self, provider='yahoo', workers=8, batchSize=50) :
+        self.provider  = getProvider(provider)
+        self.workers   = workers
+        self.batchSize = batchSize
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='fetch')
+        self._inflight = {}
+        self._guard    = threading.Lock()
+
+
+    def _release(self, key, future) :
+        with self._guard :
+            if self._inflight.get(key) is future : del self._inflight[key]
+
+
+    def submit(self, ticker, start=None, period='5y', interval='1d') :
+        """
+        Future of the bars of the ticker, shared with the running download
+        of the same bars if any
+
+        Returns
+        -------
+        Future
+            Resolves to the DataFrame returned by provider.history, it must not be modified
+        """
+        key = (ticker.upper(), None if start is None else pd.Timestamp(start), period, interval)
+        with self._guard :
+            future = self._inflight.get(key)
+            if future is not None : return future
+            future = self._executor.submit(self.provider.history, ticker, start=start, period=period, interval=interval)
+            self._inflight[key] = future
+        future.add_done_callback(lambda done : self._release(key, done))
+        return future
+
+
+    def submitMany(self, tickers, period='5y', interval='1d') :
+        """
+        Futures of the bars of many tickers
+
+        Returns
+        -------
+        dict
+            ticker -> Future, see submit
+        """
+        if not self.provider.batched :
+            return {t : self.submit(t, period=period, interval=interval) for t in tickers}
+        futures = {}
+        missing = []
+        with self._guard :
+            for t in tickers :
+                key = (t.upper(), None, period, interval)
+                if key not in self._inflight :
+                    self._inflight[key] = Future()
+                    missing.append(t.upper())
+                futures[t] = self._inflight[key]
+        for i in range(0, len(missing), self.batchSize) :
+            batch = missing[i:i+self.batchSize]
+            download = self._executor.submit(self.provider.historyMany, batch, period=period, interval=interval)
+            download.add_done_callback(lambda done, batch=batch : self._distribute(done, batch, period, interval))
+        return futures
+
+
+    def _distribute(self, download, batch, period, interval) :
+        # Resolve the futures of the tickers of a batched download
+        with self._guard :
+            pending = [(t, self._inflight.pop((t, None, period, interval))) for t in batch]
+        error = download.exception()
+        for t, future in pending :
+            if error is not None : future.set_exception(error)
+            else : future.set_result(download.result().get(t, pd.DataFrame()))
+
+
+    def history(self, ticker, start=None, period='5y', interval='1d') :
+        return self.submit(ticker, start=start, period=period, interval=interval).result().copy()
+
+
+    def historyMany(self, tickers, period='5y', interval='1d') :
+        futures = self.submitMany(tickers, period=period, interval=interval)
+        return {t : future.result().copy() for t, future in futures.items()}
+
+
+    def shortName(self, ticker) :
+        return self.provider.shortName(ticker)
+
+
+    def shutdown(self, wait=True) :
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,98 @@
+import numpy as np
+
+
+# Finite difference schemes
+# Every scheme works along an axis of an array, so the same call serves a
+# single series or a whole dates x tickers matrix. The operations are those of
+# the former loops of utils.derivative, in the same order, so the results are
+# bit identical. Upwind results are aligned to the last entries of the input.
+
+def _shift(A, start, stop, axis) :
+    # A[start:len(A)-stop] along axis, empty when A is shorter than the scheme
+    index = [slice(None)]*A.ndim
+    index[axis] = slice(start, start + max(A.shape[axis]-start-stop, 0))
+    return A[tuple(index)]
+
+
+def _upwindFirst(A, axis, out) :
+    return np.subtract(_shift(A, 1, 0, axis), _shift(A, 0, 1, axis), out=out)
+
+
+def _upwindSecond(A, axis, out) :
+    # (3*A[i] - 4*A[i-1] + A[i-2])*0.5
+    np.multiply(_shift(A, 2, 0, axis), 3, out=out)
+    out -= 4*_shift(A, 1, 1, axis)
+    out += _shift(A, 0, 2, axis)
+    out *= 0.5
+    return out
+
+
+def _upwindThird(A, axis, out) :
+    # (11*A[i] - 18*A[i-1] + 9*A[i-2] - 2*A[i-3])/6
+    np.multiply(_shift(A, 3, 0, axis), 11, out=out)
+    out -= 18*_shift(A, 2, 1, axis)
+    out += 9*_shift(A, 1, 2, axis)
+    out -= 2*_shift(A, 0, 3, axis)
+    out /= 6
+    return out
+
+
+def _centeredSecond(A, axis, out) :
+    # (A[i+1] - A[i-1])*0.5
+    np.subtract(_shift(A, 2, 0, axis), _shift(A, 0, 2, axis), out=out)
+    out *= 0.5
+    return out
+
+
+# (schema, order) -> (scheme, number of entries lost along the axis)
+SCHEMES = {
+    ('upwind', 'first')    : (_upwindFirst, 1),
+    ('upwind', 'second')   : (_upwindSecond, 2),
+    ('upwind', 'third')    : (_upwindThird, 3),
+    ('centered', 'second') : (_centeredSecond, 2),
+}
+
+
+def derivativeShape(shape, schema='upwind', order='first', axis=0) :
+    """
+    Shape of the derivative of an array of the given shape, to allocate
+    the out buffer of derivative
+    """
+    shape = list(shape)
+    shape[axis] = max(shape[axis] - SCHEMES[(schema, order)][1], 0)
+    return tuple(shape)
+
+
+def derivative(A, schema='upwind', order='first', axis=0, out=None) :
+    """
+    Compute the derivative of the array A along an axis
+
+    Parameters
+    ----------
+    A : array
+        f(x), 1-D or N-D (e.g. dates x tickers)
+    schema : str, optional, [upwind/centered]
+        Define the differentiation schema, by default 'upwind'
+    order : str, optional, [first/second/third]
+        Define the order of the derivative schema, by default 'first'
+        (only 'second' for the centered schema)
+    axis : int, optional
+        Axis of differentiation, by default 0
+    out : np.array, optional
+        float64 buffer of shape derivativeShape(A.shape, schema, order, axis)
+        receiving the result, by default a new array is allocated
+
+    Returns
+    -------
+    np.array
+        Derivative of A, shorter than A along axis by the width of the scheme
+        (the centered one is aligned to the entries between the first and the last)
+    """
+    if (schema, order) not in SCHEMES : raise ValueError('Unknown scheme %s %s' % (schema, order))
+    A = np.asarray(A, dtype=np.float64)
+    axis = axis % A.ndim
+    shape = derivativeShape(A.shape, schema, order, axis)
+    if out is None : out = np.empty(shape)
+    elif out.shape != shape : raise ValueError('out has shape %s, %s expected' % (out.shape, shape))
+    scheme, _ = SCHEMES[(schema, order)]
+    return scheme(A, axis, out)
@@ -1,15 +1,21 @@
 from statsmodels.tsa.seasonal import seasonal_decompose
 from statsmodels.tsa.arima.model import ARIMA
-from pmdarima.arima import auto_arima
+from pmdarima.arima import auto_arima, ndiffs
 from matplotlib import pyplot as plt 
 import numpy as np
 import pandas as pd
-#from fbprophet import Prophet
 from sklearn.preprocessing import MinMaxScaler
 from keras.models import Sequential
 from keras.layers import Dense, LSTM, Dropout
+from keras.callbacks import LambdaCallback
+from keras.utils import Sequence
+from numpy.lib.stride_tricks import sliding_window_view
 import datetime
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from scipy.fft import dct, idct
+from .backends import backend
+from .arima import arima_candidate, arima_degraded, arima_stepwise
 
 
 def decompose(stock) :
@@ -17,60 +23,178 @@ def decompose(stock) :
      return result
 
 
-def AutoARIMA(stock) :
-     # Seasonality check
-     decomposed_df = decompose(stock)             # TODO create new tab to plot the backend analysis
+# Registry key of the ARIMA models, shared by AutoARIMA and AutoARIMA_batch
+ARIMA_PARAMS = {'start_p' : 5, 'start_q' : 5, 'max_p' : 7, 'max_q' : 7, 'trainingSetDim' : 0.98}
+
 
+def arima_split(stock) :
      # The training will be carried out in logarithmic domain, to reduce data fluctuations and retrieve the best pqd triplet
      dfClean = np.log(stock.stockValue['Close'])
-     
      # Split in train data and test data
      train_data, test_data = dfClean[10:int(len(dfClean)*0.98)], dfClean[int(len(dfClean)*0.98):]
+     return dfClean, train_data, test_data
 
-     # AutoARIMA pdq identification
-     model_autoARIMA = auto_arima(train_data, start_p=5, start_q=5,
-                      test='adf',       # use adftest to find optimal 'd'
-                      max_p=7, max_q=7, # maximum p and q
-                      m=1,              # frequency of series
-                      d=None,           # let model determine 'd'
-                      seasonal=False,   # No Seasonality
-                      start_P=0, 
-                      D=0, 
-                      trace=True,
-                      error_action='ignore',  
-                      suppress_warnings=True, 
-                      stepwise=True)
-     print(model_autoARIMA.summary())
-     
-     # Train ARIMA Model
-     model = ARIMA(train_data, order=model_autoARIMA.order)  
-     fitted = model.fit()  
 
-     # Forecast
-     forecastedSteps = 15
+def arima_forecast(fitted, test_data, forecastedSteps=15) :
      model_predictions = fitted.get_forecast(steps=forecastedSteps)  
      forecasted_value = model_predictions.predicted_mean
      forecasted_series = pd.Series(forecasted_value.values, index=test_data.index[:forecastedSteps])
      confidence = model_predictions.conf_int(alpha=0.25) # 75% confidence
      lower_series = pd.Series(confidence['lower Close'].values, index=test_data.index[:forecastedSteps])
      upper_series = pd.Series(confidence['upper Close'].values, index=test_data.index[:forecastedSteps])
-
-     print('MAPE: {:.2%}'.format(np.mean(np.abs(forecasted_value.values - test_data[:forecastedSteps].values)/np.abs(test_data[:forecastedSteps].values))))
      return forecasted_series, lower_series, upper_series
 
 
-def prophet(stock) :
+def arima_state(fitted, order, forecast) :
+     # State stored in the registry, the diagnostics tell later runs whether the order still fits
+     return {'order' : order, 'params' : np.asarray(fitted.params), 'aic' : fitted.aic, 'nobs' : fitted.nobs, 'forecast' : forecast}
+
+
+def AutoARIMA(stock, registry=None) :
+     # Seasonality check
+     decomposed_df = decompose(stock)             # TODO create new tab to plot the backend analysis
+
+     dfClean, train_data, test_data = arima_split(stock)
+
+     # A stored model trained on the same data is reused, one trained before the new bars is warm started
+     state, rows = (None, 0) if registry is None else registry.load(stock.stockName, 'arima', ARIMA_PARAMS, dfClean.values)
+     if rows == len(dfClean) : return state['forecast']
+
+     if state is None :
+          # AutoARIMA pdq identification
+          model_autoARIMA = auto_arima(train_data, start_p=5, start_q=5,
+                           test='adf',       # use adftest to find optimal 'd'
+                           max_p=7, max_q=7, # maximum p and q
+                           m=1,              # frequency of series
+                           d=None,           # let model determine 'd'
+                           seasonal=False,   # No Seasonality
+                           start_P=0, 
+                           D=0, 
+                           trace=False,
+                           error_action='ignore',  
+                           suppress_warnings=True, 
+                           stepwise=True)
+          order = model_autoARIMA.order
+     else :
+          # The order search is skipped
+          order = state['order']
+     
+     # Train ARIMA Model, starting from the stored parameters when available
+     model = ARIMA(train_data, order=order)  
+     fitted = model.fit() if state is None else model.fit(start_params=state['params'])
+
+     # Forecast
+     forecast = arima_forecast(fitted, test_data)
+     if registry is not None :
+          registry.save(stock.stockName, 'arima', ARIMA_PARAMS, dfClean.values, arima_state(fitted, order, forecast))
+     return forecast
+
+
+def AutoARIMA_batch(stocks, registry=None, workers=None, max_p=7, max_q=7, aicTolerance=0.02) :
+     """
+     AutoARIMA of many stocks, the order search and the fits run on a pool of processes
+
+     The order of every stock is searched stepwise by its own task (see
+     arima.arima_stepwise), d is given by the adf test as auto_arima does.
+     The workers only import statsmodels (see src.arima). The selected order
+     is kept in the registry and reused by the next runs, unless its
+     diagnostics degrade (see arima_degraded)
+
+     Parameters
+     ----------
+     stocks : list
+          Stock Class objects
+     registry : ModelRegistry, optional
+          Store of the selected orders, by default every run searches them
+     workers : int, optional
+          Processes of the pool, by default one per CPU
+     max_p : int, optional
+          Maximum p, by default 7
+     max_q : int, optional
+          Maximum q, by default 7
+     aicTolerance : float, optional
+          Increase of the aic per observation accepted for a stored order, by default 0.02
+
+     Returns
+     -------
+     dict
+          stockName -> (forecasted_series, lower_series, upper_series) as returned by AutoARIMA
+     """
+     params = dict(ARIMA_PARAMS, max_p=max_p, max_q=max_q)
+     forecasts = {}
+     series = {}
+     # Spawned workers do not inherit the threads and the Keras state of the caller,
+     # they only import src.arima
+     with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool :
+          cached = {}
+          for stock in stocks :
+               dfClean, train_data, test_data = arima_split(stock)
+               state, rows = (None, 0) if registry is None else registry.load(stock.stockName, 'arima', params, dfClean.values)
+               if rows == len(dfClean) :
+                    forecasts[stock.stockName] = state['forecast']
+                    continue
+               series[stock.stockName] = (dfClean, train_data, test_data)
+               if state is not None : cached[stock.stockName] = (state, pool.submit(arima_candidate, train_data, state['order'], state['params']))
+
+          best = {}
+          search = {}
+          for name, (dfClean, train_data, test_data) in series.items() :
+               if name in cached :
+                    state, future = cached[name]
+                    fit = future.result()
+                    if not arima_degraded(fit, state, aicTolerance) :
+                         best[name] = fit
+                         continue
+               d = ndiffs(train_data, test='adf', max_d=2)
+               search[name] = pool.submit(arima_stepwise, train_data, d, ARIMA_PARAMS['start_p'], ARIMA_PARAMS['start_q'], max_p, max_q)
+          for name, future in search.items() :
+               best[name] = future.result()
+
+     for name, fit in best.items() :
+          dfClean, train_data, test_data = series[name]
+          if not np.isfinite(fit['aic']) : continue
+          # The selected parameters are applied without fitting again
+          fitted = ARIMA(train_data, order=fit['order']).filter(fit['params'])
+          forecasts[name] = arima_forecast(fitted, test_data)
+          if registry is not None :
+               registry.save(name, 'arima', params, dfClean.values, arima_state(fitted, fit['order'], forecasts[name]))
+     return forecasts
+
+
+def prophet_init(m) :
+     # Fitted parameters of a Prophet model, used to warm start the fit of a new one
+     return {
+          'k'         : m.params['k'][0][0],
+          'm'         : m.params['m'][0][0],
+          'sigma_obs' : m.params['sigma_obs'][0][0],
+          'delta'     : m.params['delta'][0],
+          'beta'      : m.params['beta'][0],
+     }
+
+
+def prophet(stock, progress=None, registry=None) :
+     # A stored model trained on the same data is reused, one trained before the new bars is warm started
+     params = {'daily_seasonality' : False, 'periods' : 15, 'periods_m30' : 45}
+     state, rows = (None, 0) if registry is None else registry.load(stock.stockName, 'prophet', params, stock.stockValue['Close'].values)
+     if rows == len(stock.stockValue['Close']) : return state['forecast']
+     warm = lambda name : {} if state is None else {'init' : state[name]}
+     Prophet = backend('prophet').Prophet
+
      m = Prophet(daily_seasonality = False) # the Prophet class (model)
-     m.fit(pd.DataFrame({'y': np.log(stock.stockValue['Close']), 'ds': stock.stockValue['Close'].index}))
+     m.fit(pd.DataFrame({'y': np.log(stock.stockValue['Close']), 'ds': stock.stockValue['Close'].index}), **warm('init'))
      future = m.make_future_dataframe(periods=15) #we need to specify the number of days in future
      prediction = m.predict(future)
+     if progress is not None : progress(0.5)
 
      # Prediction at t-30gg
      p = Prophet(daily_seasonality = False)
-     p.fit(pd.DataFrame({'y': np.log(stock.stockValue['Close'][:-30]), 'ds': stock.stockValue['Close'][:-30].index}))
+     p.fit(pd.DataFrame({'y': np.log(stock.stockValue['Close'][:-30]), 'ds': stock.stockValue['Close'][:-30].index}), **warm('init_m30'))
      future_m30 = p.make_future_dataframe(periods=45) #we need to specify the number of days in future
      prediction_m30 = p.predict(future_m30)
 
+     if registry is not None :
+          registry.save(stock.stockName, 'prophet', params, stock.stockValue['Close'].values,
+               {'init' : prophet_init(m), 'init_m30' : prophet_init(p), 'forecast' : (prediction, prediction_m30)})
      return prediction, prediction_m30
 
 
@@ -102,7 +226,91 @@ def lstm_initialization(tensorShape, unitsPerLayer=[128, 64, 16], dropoutPerLaye
      else: 
           print('Error: Units per Layer and Dropouts mismatch!')
 
-def lstm(stock, daysOfForecast=1, trainingSetDim=0.85, historicalWindowSize=60, epochs=100, batchSize=3) :
+def lstm_windows(scaledDF, historicalWindowSize, start, end) :
+     """
+     Windows of the historicalWindowSize rows preceding each row in [start, end)
+
+     Parameters
+     ----------
+     scaledDF : np.array
+          Scaled dataset, rows x features
+     historicalWindowSize : int
+          Rows of each window
+     start : int
+          Row following the first window, at least historicalWindowSize
+     end : int
+          Row following the last window plus one
+
+     Returns
+     -------
+     np.array
+          Read-only view of scaledDF, windows x historicalWindowSize x features
+     """
+     windows = sliding_window_view(scaledDF, historicalWindowSize, axis=0).transpose(0, 2, 1)
+     return windows[start-historicalWindowSize:end-historicalWindowSize]
+
+
+class WindowSequence(Sequence) :
+     """Batches of windows copied out of windows views only when requested,
+     so a dataset is never materialized as a whole. A list of views (e.g.
+     one per stock) is served as a single dataset, in order
+
+     Attributes
+     ----------
+     windows : list
+          Windows views, see lstm_windows
+     targets : list
+          Target of each window, None to only yield the windows (predict)
+     batchSize : int
+          Windows per batch
+     shuffle : bool
+          Shuffle the windows at every epoch, as fit does with arrays
+     """
+
+     def __init__(self, windows, targets=None, batchSize=32, shuffle=False) :
+          self.windows   = windows if isinstance(windows, list) else [windows]
+          self.targets   = targets if (targets is None) or isinstance(targets, list) else [targets]
+          self.batchSize = batchSize
+          self.shuffle   = shuffle
+          self.offsets   = np.cumsum([0] + [len(w) for w in self.windows])
+          self.order     = np.arange(self.offsets[-1])
+          if shuffle : np.random.shuffle(self.order)
+
+     def __len__(self) :
+          return int(np.ceil(self.offsets[-1]/self.batchSize))
+
+     def __getitem__(self, i) :
+          batch = np.sort(self.order[i*self.batchSize:(i+1)*self.batchSize])
+          source = np.searchsorted(self.offsets, batch, side='right') - 1
+          parts = [(k, batch[source == k] - self.offsets[k]) for k in np.unique(source)]
+          x = np.concatenate([self.windows[k][rows] for k, rows in parts])
+          if self.targets is None : return x
+          return x, np.concatenate([self.targets[k][rows] for k, rows in parts])
+
+     def on_epoch_end(self) :
+          if self.shuffle : np.random.shuffle(self.order)
+
+
+def lstm_dataset(stock) :
+     """
+     Features of the LSTM: Open, High, Low, Close, Volume, MACD, Momentum, EMA20 and EMA50
+
+     Returns
+     -------
+     DataFrame
+          One row per day, Close is the column 3
+     """
+     if len(stock.MACD) == 0 :
+          stock.MACD = stock.computeMACD()
+     minDim = min(len(stock.momentum), len(stock.MACD), len(stock.EMA50), len(stock.EMA20))
+     return stock.stockValue.iloc[-minDim:, 0:5].reset_index(drop=True)\
+          .join(pd.DataFrame(stock.MACD[-minDim:], columns=['MACD']))\
+          .join(pd.DataFrame(stock.momentum[-minDim:], columns=['Momentum']))\
+          .join(pd.DataFrame(stock.EMA20, columns=['EMA20']))\
+          .join(pd.DataFrame(stock.EMA50, columns=['EMA50']))
+
+
+def lstm(stock, daysOfForecast=1, trainingSetDim=0.85, historicalWindowSize=60, epochs=100, batchSize=3, progress=None, registry=None, fineTuneEpochs=5) :
      """
      [summary]
 
@@ -123,6 +331,14 @@ def lstm(stock, daysOfForecast=1, trainingSetDim=0.85, historicalWindowSize=60,
          The batchSize parameter of LSTM.
          This value is used during the training to 
          refine the parameters, by default 32
+     progress : callable, optional
+         Called with the fraction of the training done after each epoch
+     registry : ModelRegistry, optional
+         Store of the trained networks. A network trained on the same data
+         is reused, one trained before the new bars is only fine-tuned on
+         them, by default the network is always trained from scratch
+     fineTuneEpochs : int, optional
+         The epochs used to fine-tune a stored network, by default 5
 
      Returns
      -------
@@ -131,54 +347,111 @@ def lstm(stock, daysOfForecast=1, trainingSetDim=0.85, historicalWindowSize=60,
      predicted_stock_price : np.array
           Contains the forecasted values
      """     
-     if stock.MACD == [] :
-          stock.MACD = stock.computeMACD()
-     minDim = min(len(stock.momentum), len(stock.MACD), len(stock.EMA50), len(stock.EMA20))
-     trainSet = stock.stockValue.iloc[-minDim:, 0:5].reset_index(drop=True)\
-          .join(pd.DataFrame(stock.MACD[-minDim:], columns=['MACD']))\
-          .join(pd.DataFrame(stock.momentum[-minDim:], columns=['Momentum']))\
-          .join(pd.DataFrame(stock.EMA20, columns=['EMA20']))\
-          .join(pd.DataFrame(stock.EMA50, columns=['EMA50']))\
-
+     trainSet = lstm_dataset(stock)
      featuresCount = len(trainSet.iloc[0])
      closeColumnIdx = 3
-     # Scale the dset
-     sc = MinMaxScaler(feature_range = (0, 1))
-     scaledDF = sc.fit_transform(trainSet)
+     params = {'daysOfForecast' : daysOfForecast, 'trainingSetDim' : trainingSetDim, 'historicalWindowSize' : historicalWindowSize, 'epochs' : epochs, 'batchSize' : batchSize}
+     state, rows = (None, 0) if registry is None else registry.load(stock.stockName, 'lstm', params, trainSet.values)
+     if rows == len(trainSet) : return state['forecast']
+     # Scale the dset, a stored network keeps the scale it was trained with
+     if state is None :
+          sc = MinMaxScaler(feature_range = (0, 1))
+          scaledDF = sc.fit_transform(trainSet)
+     else :
+          sc = state['scaler']
+          scaledDF = sc.transform(trainSet)
 
      # Creating a data structure with a window of timesteps and 1 output
-     X_train = []
-     y_train = []
-     for i in range(historicalWindowSize, int(len(scaledDF)*trainingSetDim)):
-          X_train.append(scaledDF[i-historicalWindowSize:i, :])   # <-- Up to now just yfinance data, need integration with indicators
-          y_train.append(scaledDF[i+daysOfForecast-1, closeColumnIdx])  
-     X_train, y_train = np.array(X_train), np.array(y_train)
-     # Reshaping
-     X_train = np.reshape(X_train, (X_train.shape[0], X_train.shape[1], featuresCount))
+     # A stored network is only trained on the windows after the ones it has seen
+     # Windows are views of scaledDF, batches are copied out of them during the training
+     trainEnd = int(len(scaledDF)*trainingSetDim)
+     trainStart = historicalWindowSize if state is None else min(max(historicalWindowSize, state['trainEnd']), trainEnd)
+     X_train = lstm_windows(scaledDF, historicalWindowSize, trainStart, trainEnd)   # <-- Up to now just yfinance data, need integration with indicators
+     y_train = scaledDF[trainStart+daysOfForecast-1:trainEnd+daysOfForecast-1, closeColumnIdx]
 
      # Train the Network
-     regressor = lstm_initialization((X_train.shape[1], featuresCount))
-     regressor.fit(X_train, y_train, epochs=epochs, batch_size=batchSize)  # <-- creare lo scivolamento su y_train
-
-     # Prepare input for forecast
-     inputs = scaledDF[(int(len(scaledDF)*trainingSetDim) - historicalWindowSize):]
-     #inputs = inputs.reshape(-1,1)
-     X_test = []
-     for i in range(historicalWindowSize, len(inputs)):
-          X_test.append(inputs[i-historicalWindowSize:i, :])
-     X_test = np.array(X_test)
-     X_test = np.reshape(X_test, (X_test.shape[0], X_test.shape[1], featuresCount))
+     regressor = lstm_initialization((historicalWindowSize, featuresCount))
+     if state is not None :
+          regressor.set_weights(state['weights'])
+          epochs = fineTuneEpochs
+     callbacks = [] if progress is None else [LambdaCallback(on_epoch_end=lambda epoch, logs : progress((epoch+1)/epochs))]
+     if len(X_train) > 0 :
+          regressor.fit(WindowSequence(X_train, y_train, batchSize, shuffle=True), epochs=epochs, callbacks=callbacks)  # <-- creare lo scivolamento su y_train
+
+     # Prepare input for forecast, the windows following the training ones
+     X_test = lstm_windows(scaledDF, historicalWindowSize, trainEnd, len(scaledDF))
      # Forecast
-     Y_test = regressor.predict(X_test)
-
-     # Get something which has as many features as dataset
-     predict_extended = np.zeros((len(Y_test), featuresCount))
-     # Put the predictions there
-     predict_extended[:,closeColumnIdx] = Y_test.flatten()
-     # Inverse transform it and select the 3rd column.
-     predicted_stock_price = sc.inverse_transform(predict_extended)[:,closeColumnIdx]
+     Y_test = regressor.predict(WindowSequence(X_test, batchSize=256))
+
+     # Inverse transform of the close column only, as sc.inverse_transform does
+     predicted_stock_price = (Y_test.flatten() - sc.min_[closeColumnIdx])/sc.scale_[closeColumnIdx]
      
      # Timeseries of forecast validity
      valDays=stock.stockValue.index[-len(predicted_stock_price):]+datetime.timedelta(days=daysOfForecast)
 
+     if registry is not None :
+          registry.save(stock.stockName, 'lstm', params, trainSet.values,
+               {'weights' : regressor.get_weights(), 'scaler' : sc, 'trainEnd' : trainEnd, 'forecast' : (valDays, predicted_stock_price)})
      return valDays, predicted_stock_price
+
+
+def lstm_universe(stocks, daysOfForecast=1, trainingSetDim=0.85, historicalWindowSize=60, epochs=10, batchSize=256, progress=None) :
+     """
+     One LSTM shared by many stocks, trained on the windows of all of them
+
+     Parameters
+     ----------
+     stocks : list
+          Stock Class objects with the indicators computed
+     daysOfForecast : int, optional
+         Describe the number of days of forecast, by default 1
+     trainingSetDim : float, optional
+         Describe the number of days used for training the Net, by default 0.85
+     historicalWindowSize : int, optional
+         Describe the widthness of the window used to
+         generate the forecast, by default are used last 60 days
+     epochs : int, optional
+         The epochs used ot train the LSTM, by default 10
+     batchSize : int, optional
+         Windows per batch, the windows of all the stocks are mixed, by default 256
+     progress : callable, optional
+         Called with the fraction of the training done after each epoch
+
+     Returns
+     -------
+     dict
+          stockName -> (valDays, predicted_stock_price) as returned by lstm.
+          Stocks too short for a training window are left out
+     """
+     closeColumnIdx = 3
+     trained, scalers, X_train, y_train, X_test = [], [], [], [], []
+     for stock in stocks :
+          trainSet = lstm_dataset(stock)
+          trainEnd = int(len(trainSet)*trainingSetDim)
+          if trainEnd <= historicalWindowSize : continue
+          # Each stock is scaled on its own range, the network learns the shapes and not the price levels
+          sc = MinMaxScaler(feature_range = (0, 1))
+          scaledDF = sc.fit_transform(trainSet)
+          X_train.append(lstm_windows(scaledDF, historicalWindowSize, historicalWindowSize, trainEnd))
+          y_train.append(scaledDF[historicalWindowSize+daysOfForecast-1:trainEnd+daysOfForecast-1, closeColumnIdx])
+          X_test.append(lstm_windows(scaledDF, historicalWindowSize, trainEnd, len(scaledDF)))
+          trained.append(stock)
+          scalers.append(sc)
+     if len(trained) == 0 : return {}
+
+     # Train the Network
+     regressor = lstm_initialization((historicalWindowSize, X_train[0].shape[2]))
+     callbacks = [] if progress is None else [LambdaCallback(on_epoch_end=lambda epoch, logs : progress((epoch+1)/epochs))]
+     regressor.fit(WindowSequence(X_train, y_train, batchSize, shuffle=True), epochs=epochs, callbacks=callbacks)
+
+     # Forecast of every stock with a single predict call
+     Y_test = regressor.predict(WindowSequence(X_test, batchSize=batchSize)).flatten()
+     forecasts = {}
+     start = 0
+     for stock, sc, windows in zip(trained, scalers, X_test) :
+          predicted_stock_price = (Y_test[start:start+len(windows)] - sc.min_[closeColumnIdx])/sc.scale_[closeColumnIdx]
+          start += len(windows)
+          index = stock.stockValue.index
+          valDays = index[len(index)-len(predicted_stock_price):]+datetime.timedelta(days=daysOfForecast)
+          forecasts[stock.stockName] = (valDays, predicted_stock_price)
+     return forecasts
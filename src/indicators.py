@@ -0,0 +1,232 @@
+import numpy as np
+from scipy.signal import lfilter
+
+
+# Vectorized indicator engine
+# Every routine works along axis 0, so the same call serves a single close
+# series (1-D) or a whole dates x tickers matrix (2-D). Results are float64
+# arrays aligned to the last len(result) dates of the input.
+
+def _asFloat(close) :
+    return np.asarray(close, dtype=np.float64)
+
+
+def _limit(close, nDays, limiter=None) :
+    limit = close.shape[0] - nDays
+    if limiter != None : limit = min(limit, limiter)
+    return max(limit, 0)
+
+
+def cumulativeSum(close) :
+    """
+    Cumulative sum of the closing values with a leading zero, the
+    intermediate shared by every simple moving average of the series
+
+    Parameters
+    ----------
+    close : array
+        Closing values, 1-D or 2-D (dates x tickers)
+
+    Returns
+    -------
+    np.array
+        csum such that csum[j] - csum[i] is the sum of close[i:j]
+    """
+    close = _asFloat(close)
+    csum = np.zeros((close.shape[0]+1,) + close.shape[1:])
+    np.cumsum(close, axis=0, out=csum[1:])
+    return csum
+
+
+def _windowMean(csum, nDays, end) :
+    return (csum[end] - csum[end-nDays])/nDays
+
+
+def computeSMA(close, nDays=20, limiter=None, csum=None) :
+    """
+    Simple moving average computed through a cumulative sum
+
+    Parameters
+    ----------
+    close : array
+        Closing values, 1-D or 2-D (dates x tickers)
+    nDays : int, optional
+        Window of the average, by default 20
+    limiter : int, optional
+        Define the limit of backward steps, by default is None
+    csum : np.array, optional
+        cumulativeSum(close), computed when not given
+
+    Returns
+    -------
+    np.array
+        Simple moving average of the last limit days
+    """
+    close = _asFloat(close)
+    if csum is None : csum = cumulativeSum(close)
+    limit = _limit(close, nDays, limiter)
+    end = np.arange(close.shape[0]-limit+1, close.shape[0]+1)
+    return _windowMean(csum, nDays, end)
+
+
+def computeEMA(close, nDays=20, limiter=None) :
+    """
+    Exponential moving average computed as a first order recursive filter.
+    The seed and the lag of the recursion reproduce Stock.computeMA
+
+    Parameters
+    ----------
+    close : array
+        Closing values, 1-D or 2-D (dates x tickers)
+    nDays : int, optional
+        Window of the average, by default 20
+    limiter : int, optional
+        Define the limit of backward steps, by default is None
+
+    Returns
+    -------
+    np.array
+        Exponential moving average of the last limit days
+    """
+    close = _asFloat(close)
+    limit = _limit(close, nDays, limiter)
+    if limit == 0 : return np.empty((0,) + close.shape[1:])
+    K = 2/(nDays+1)
+    seed = np.sum(close[-limit:-limit+nDays], axis=0)/nDays
+    start = close.shape[0] - limit - nDays
+    samples = close[start+1:start+limit]
+    EMA = np.empty((limit,) + close.shape[1:])
+    EMA[0] = seed
+    if limit > 1 :
+        EMA[1:] = lfilter([K], [1, K-1], samples, axis=0, zi=np.expand_dims((1-K)*seed, 0))[0]
+    return EMA
+
+
+def computeMA(close, nDays=20, kind='simple', limiter=None) :
+    """
+    Compute Moving averages
+
+    Parameters
+    ----------
+    close : array
+        Closing values, 1-D or 2-D (dates x tickers)
+    nDays : int, optional
+        Days used to compute the moving average, by default 20
+    kind : str, optional
+        Specify if moving average is simple ('simple') or exponential ('exp'),
+        by default 'simple'
+    limiter : int, optional
+        Define the limit of backward steps, by default is None
+
+    Returns
+    -------
+    np.array
+        Simple/Exponential Moving average of the last nDays
+    """
+    if kind == 'simple' : return computeSMA(close, nDays, limiter)
+    if kind == 'exp' : return computeEMA(close, nDays, limiter)
+
+
+def computeMomentum(close, nDays=14) :
+    """
+    Compute Momentum (Rate of Change)
+
+    Parameters
+    ----------
+    close : array
+        Closing values, 1-D or 2-D (dates x tickers)
+    nDays : int, optional
+        Days used to compute the momentum, by default 14
+
+    Returns
+    -------
+    np.array
+        Percentual rate of change over nDays
+    """
+    close = _asFloat(close)
+    return 100*(close[nDays:] - close[:-nDays])/close[:-nDays]
+
+
+def computeMACD(close, nDays=[3,10], csum=None) :
+    """
+    Difference between the short and the long simple moving averages,
+    paired by position as Stock.computeMACD does
+
+    Parameters
+    ----------
+    close : array
+        Closing values, 1-D or 2-D (dates x tickers)
+    nDays : list, optional
+        Short and long windows, by default [3,10]
+    csum : np.array, optional
+        cumulativeSum(close), computed when not given
+
+    Returns
+    -------
+    np.array
+        MACD values
+    """
+    close = _asFloat(close)
+    if csum is None : csum = cumulativeSum(close)
+    shortTerm = computeSMA(close, nDays[0], csum=csum)
+    longTerm = computeSMA(close, nDays[1], csum=csum)
+    return shortTerm[:len(longTerm)] - longTerm
+
+
+# Incremental updates
+# close is the updated series and first the position of its first new (or
+# changed) value; only the entries depending on close[first:] are computed.
+# The results are the same as a full recompute over the updated series.
+
+def extendCumulativeSum(csum, close, first) :
+    """
+    Update cumulativeSum after close changed from position first on
+    """
+    close = _asFloat(close)
+    updated = np.empty((close.shape[0]+1,) + close.shape[1:])
+    updated[:first+1] = csum[:first+1]
+    np.cumsum(np.concatenate([csum[first:first+1], close[first:]]), axis=0, out=updated[first:])
+    return updated
+
+
+def extendSMA(SMA, csum, nDays, first) :
+    """
+    Update computeSMA (without limiter), csum is the updated cumulative sum
+    """
+    keep = min(max(first - nDays, 0), len(SMA))
+    end = np.arange(nDays+keep+1, csum.shape[0])
+    return np.concatenate([SMA[:keep], _windowMean(csum, nDays, end)])
+
+
+def extendEMA(EMA, close, nDays, first) :
+    """
+    Update computeEMA (without limiter). The recursion restarts from the last
+    unchanged value; a change inside the seed window triggers a full recompute
+    """
+    close = _asFloat(close)
+    keep = min(first, len(EMA))
+    if (first < 2*nDays) or (keep == 0) : return computeEMA(close, nDays)
+    K = 2/(nDays+1)
+    samples = close[keep:close.shape[0]-nDays]
+    if len(samples) == 0 : return np.array(EMA[:keep])
+    tail = lfilter([K], [1, K-1], samples, axis=0, zi=np.expand_dims((1-K)*EMA[keep-1], 0))[0]
+    return np.concatenate([EMA[:keep], tail])
+
+
+def extendMomentum(momentum, close, nDays, first) :
+    """
+    Update computeMomentum
+    """
+    keep = min(max(first - nDays, 0), len(momentum))
+    return np.concatenate([momentum[:keep], computeMomentum(_asFloat(close)[keep:], nDays)])
+
+
+def extendMACD(MACD, csum, nDays, first) :
+    """
+    Update computeMACD, csum is the updated cumulative sum
+    """
+    longest = max(nDays)
+    keep = min(max(first - longest, 0), len(MACD))
+    j = np.arange(keep, csum.shape[0]-1-nDays[1])
+    tail = _windowMean(csum, nDays[0], nDays[0]+j+1) - _windowMean(csum, nDays[1], nDays[1]+j+1)
+    return np.concatenate([MACD[:keep], tail])
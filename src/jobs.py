@@ -0,0 +1,227 @@
+import os
+import time
+import uuid
+import pickle
+import sqlite3
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from .backends import backend
+from . import metrics
+
+
+def _lstm(stock, progress, registry) :
+    return backend('forecast').lstm(stock, epochs=10, trainingSetDim=0.85, progress=progress, registry=registry)
+
+
+def _prophet(stock, progress, registry) :
+    return backend('forecast').prophet(stock, progress=progress, registry=registry)
+
+
+# Forecast trainers run by the workers, kind -> callable(stock, progress, registry).
+# They are sent to the workers by reference, the forecast backend is only
+# imported by the worker processes
+FORECASTS = {
+    'lstm'    : _lstm,
+    'prophet' : _prophet,
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id       TEXT PRIMARY KEY,
+    kind     TEXT,
+    ticker   TEXT,
+    status   TEXT,
+    progress REAL,
+    message  TEXT,
+    result   BLOB,
+    updated  REAL,
+    owner    TEXT
+)
+"""
+
+# Queue of this process, '<pid>-<random id>' so that a restarted server
+# reusing the pid (e.g. pid 1 in a container) does not own the old jobs
+BOOT = '%d-%s' % (os.getpid(), uuid.uuid4().hex)
+# Message of the jobs marked failed because their queue is gone
+INTERRUPTED = 'interrupted'
+
+
+def _connect(path) :
+    connection = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+    if path != ':memory:' : connection.execute('PRAGMA journal_mode=WAL')
+    return connection
+
+
+def _alive(pid) :
+    try :
+        os.kill(pid, 0)
+    except ProcessLookupError :
+        return False
+    except PermissionError :
+        # Owned by another user
+        pass
+    return True
+
+
+def _orphaned(owner) :
+    # Jobs queued by a process which is gone, or by a previous run of this pid
+    if not owner : return True
+    pid, boot = owner.split('-', 1)
+    if int(pid) == os.getpid() : return owner != BOOT
+    return not _alive(int(pid))
+
+
+def _interrupted(status, message, owner) :
+    # Jobs lost with the queue which submitted them are trained again
+    if status in ['queued', 'running'] : return _orphaned(owner)
+    return (status == 'failed') and (message == INTERRUPTED)
+
+
+def _report(path, jobId, status, progress) :
+    # Called by the workers, an in-memory queue is only updated by the server
+    if path == ':memory:' : return
+    connection = _connect(path)
+    try :
+        connection.execute('UPDATE jobs SET status=?, progress=?, updated=? WHERE id=?', (status, progress, time.time(), jobId))
+    finally :
+        connection.close()
+
+
+def _train(trainer, stock, path, jobId, registry) :
+    # Returns the forecast and the seconds spent training it
+    _report(path, jobId, 'running', 0.0)
+    start = time.perf_counter()
+    forecast = trainer(stock, lambda progress : _report(path, jobId, 'running', progress), registry)
+    return forecast, time.perf_counter() - start
+
+
+# Class Definitions
+class JobQueue(object) :
+    """Forecasts trained in the background by a pool of processes
+
+    Jobs are identified by forecast kind, ticker and data version, so a
+    forecast is trained once per history. Status, progress and results are
+    kept in a SQLite table, shared with the workers when path is a file.
+    Several servers may share the table: each job belongs to the queue which
+    submitted it, and the jobs left queued or running by a queue which is
+    gone are marked failed, and trained again when submitted again.
+
+    Attributes
+    ----------
+    path : str
+        SQLite database, ':memory:' keeps the queue in memory (the progress
+        of the running jobs is then not reported)
+    workers : int
+        Number of worker processes
+    registry : ModelRegistry
+        Store of the trained models, reused and fine-tuned by the next jobs
+
+    Methods
+    -------
+    jobId(kind,stock)
+        Identifier of the job training the kind forecast of stock
+
+    submit(kind,stock)
+        Queue the training of a forecast, unless already queued or done
+
+    status(jobId)
+        Status and progress of a job
+
+    result(jobId)
+        Forecast trained by a job, None until it is done
+    """
+
+    def __init__(self, path=':memory:', workers=1, registry=None) :
+        self.path     = path
+        self.workers  = workers
+        self.registry = registry
+        self._guard   = threading.Lock()
+        self._db      = _connect(path)
+        self._db.execute(SCHEMA)
+        if 'owner' not in [column[1] for column in self._db.execute('PRAGMA table_info(jobs)')] :
+            self._db.execute('ALTER TABLE jobs ADD COLUMN owner TEXT')
+        # Jobs of a previous run are lost with their processes, those of the
+        # other running servers are left alone
+        with self._guard :
+            for jobId, owner in self._db.execute("SELECT id, owner FROM jobs WHERE status IN ('queued', 'running')").fetchall() :
+                if _orphaned(owner) :
+                    self._db.execute("UPDATE jobs SET status='failed', message=?, updated=? WHERE id=? AND owner IS ?",
+                        (INTERRUPTED, time.time(), jobId, owner))
+        # Spawned workers do not inherit the threads and the Keras state of the server
+        self._executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+
+
+    @staticmethod
+    def jobId(kind, stock) :
+        return '%s-%s-%s' % (kind, stock.stockName.strip().upper(), stock.version)
+
+
+    def submit(self, kind, stock) :
+        """
+        Queue the training of a forecast
+
+        Parameters
+        ----------
+        kind : str
+            Forecast to train, see FORECASTS
+        stock : Stock
+            Stock object with the indicators computed
+
+        Returns
+        -------
+        str
+            Identifier of the job
+        """
+        jobId = self.jobId(kind, stock)
+        with self._guard :
+            row = self._db.execute('SELECT status, message, owner FROM jobs WHERE id=?', (jobId,)).fetchone()
+            if (row is not None) and (not _interrupted(*row)) : return jobId
+            self._db.execute('INSERT OR REPLACE INTO jobs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (jobId, kind, stock.stockName.strip().upper(), 'queued', 0.0, '', None, time.time(), BOOT))
+        # Only the data is sent to the worker, see Stock.__getstate__
+        future = self._executor.submit(_train, FORECASTS[kind], stock, self.path, jobId, self.registry)
+        future.add_done_callback(lambda done : self._finish(jobId, done))
+        return jobId
+
+
+    def _finish(self, jobId, future) :
+        error = future.exception()
+        if error is None :
+            forecast, seconds = future.result()
+            # Trained by a worker process, recorded in the metrics of the server
+            metrics.observe('trade_dash_stage_seconds', seconds, stage='forecast')
+        with self._guard :
+            if error is None :
+                self._db.execute("UPDATE jobs SET status='done', progress=1.0, result=?, updated=? WHERE id=?",
+                    (pickle.dumps(forecast), time.time(), jobId))
+            else :
+                self._db.execute("UPDATE jobs SET status='failed', message=?, updated=? WHERE id=?",
+                    (repr(error), time.time(), jobId))
+
+
+    def status(self, jobId) :
+        """
+        Status of a job
+
+        Returns
+        -------
+        dict
+            status ('queued', 'running', 'done' or 'failed'), progress
+            (from 0 to 1) and message (the error of a failed job),
+            None when the job is unknown
+        """
+        with self._guard :
+            row = self._db.execute('SELECT status, progress, message FROM jobs WHERE id=?', (jobId,)).fetchone()
+        if row is None : return None
+        return {'status' : row[0], 'progress' : row[1], 'message' : row[2]}
+
+
+    def result(self, jobId) :
+        with self._guard :
+            row = self._db.execute("SELECT result FROM jobs WHERE id=? AND status='done'", (jobId,)).fetchone()
+        return None if row is None else pickle.loads(row[0])
+
+
+    def shutdown(self, wait=True) :
+        self._executor.shutdown(wait=wait)
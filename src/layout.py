@@ -4,8 +4,8 @@ import dash_daq as daq
 from datetime import date
 import os
 from .stockClass import Stock
-from .server import app
-from .dashCallbacks import updateGraph, updateStock, stockMem, globalStore
+from .server import app, STREAM_PERIOD, JOB_PERIOD
+from .dashCallbacks import updateGraph, updateStock, globalStore
 
 
 # Dashboard Layout
@@ -68,6 +68,19 @@ app.layout = html.Div([
                 on=False,
                 color='lightblue',
             ),
+            daq.BooleanSwitch(
+                label='Intraday',
+                className='one columns',
+                id='StreamToggle',
+                on=False,
+                color='black',
+            ),
+            dcc.RadioItems(
+                className='one columns',
+                id='intradayInterval',
+                options=[{'label' : '1m', 'value' : '1m'}, {'label' : '5m', 'value' : '5m'}],
+                value='1m',
+            ),
             html.P(id='textual_gain'),
             dcc.DatePickerRange(
                 id='date_picker_range',
@@ -80,8 +93,24 @@ app.layout = html.Div([
     ),
     html.Br(),
     html.H5(id='graphTitle', children=''),
+    # Forecasts trained in the background, see dashCallbacks.pollJobs
+    html.P(id='jobStatus', style={'color':'silver'}),
+    dcc.Interval(id='jobTick', interval=JOB_PERIOD*1000, disabled=True),
+    dcc.Store(id='jobsDone'),
     dcc.Graph(id='stockGraph', config={'scrollZoom':True}),
 
+    # Intraday streaming, new points are appended to the rendered figure
+    dcc.Interval(id='streamTick', interval=STREAM_PERIOD*1000, disabled=True),
+    dcc.Store(id='streamCursor'),
+    dcc.Store(id='streamData'),
+    dcc.Store(id='streamAck'),
+    # Key of the rendered figure, toggles only send the traces to add or remove
+    dcc.Store(id='figureKey'),
+    dcc.Store(id='figurePatch'),
+    dcc.Store(id='figurePatchAck'),
+    # Date range shown by the chart, traces are downsampled outside of it
+    dcc.Store(id='visibleRange'),
+
     dcc.ConfirmDialog(
         id='noDataFound',
         message='No Data Found, check Stock Name',
@@ -0,0 +1,184 @@
+import json
+import time
+import bisect
+import threading
+import functools
+import contextlib
+
+
+# Latency instrumentation of the server
+# Callbacks are timed with timed, the stages inside them (fetch, indicators,
+# computeMinMax, minMaxTrend, forecast, serialization, ...) with span, and the
+# caches count their lookups with count. Metrics are kept per process and
+# exposed in the Prometheus text format on /metrics, see install. When a
+# trace log is set, every callback appends one JSON line with its spans.
+
+# name -> (type, help)
+METRICS = {
+    'trade_dash_callback_seconds'     : ('histogram', 'Duration of the Dash callbacks'),
+    'trade_dash_stage_seconds'        : ('histogram', 'Duration of the stages of the callbacks'),
+    'trade_dash_cache_requests_total' : ('counter', 'Cache lookups by cache, layer and result (hit, stale, miss)'),
+}
+BUCKETS = [0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0]
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+_histograms = {}
+_counters   = {}
+_guard      = threading.Lock()
+_local      = threading.local()
+_traceLog   = None
+
+
+def _key(name, labels) :
+    return name, tuple(sorted(labels.items()))
+
+
+def observe(name, seconds, **labels) :
+    """
+    Add an observation to a histogram
+
+    Parameters
+    ----------
+    name : str
+        Name of the histogram, see METRICS
+    seconds : float
+        Observed duration
+    **labels
+        Labels of the series, e.g. stage='fetch'
+    """
+    key = _key(name, labels)
+    with _guard :
+        histogram = _histograms.get(key)
+        if histogram is None : histogram = _histograms[key] = [[0]*(len(BUCKETS)+1), 0.0]
+        histogram[0][bisect.bisect_left(BUCKETS, seconds)] += 1
+        histogram[1] += seconds
+
+
+def count(name, value=1, **labels) :
+    """
+    Increase a counter, see observe
+    """
+    key = _key(name, labels)
+    with _guard :
+        _counters[key] = _counters.get(key, 0) + value
+
+
+@contextlib.contextmanager
+def span(stage) :
+    """
+    Time a stage, e.g.
+
+        with metrics.span('fetch') :
+            ...
+
+    The duration is added to trade_dash_stage_seconds and, inside a timed
+    callback, to the trace of the request
+
+    Parameters
+    ----------
+    stage : str
+        Name of the stage
+    """
+    trace = getattr(_local, 'trace', None)
+    depth = getattr(_local, 'depth', 0)
+    _local.depth = depth + 1
+    start = time.perf_counter()
+    try :
+        yield
+    finally :
+        seconds = time.perf_counter() - start
+        _local.depth = depth
+        observe('trade_dash_stage_seconds', seconds, stage=stage)
+        if trace is not None :
+            trace['spans'].append({'stage' : stage, 'offset' : round(start - trace['origin'], 6), 'seconds' : round(seconds, 6), 'depth' : depth})
+
+
+def timed(callback) :
+    """
+    Decorator timing a Dash callback, the duration is added to
+    trade_dash_callback_seconds and the spans of the call are traced
+
+    Parameters
+    ----------
+    callback : str
+        Name of the callback in the metrics
+    """
+    def decorator(function) :
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs) :
+            origin = time.perf_counter()
+            _local.trace = {'origin' : origin, 'spans' : []}
+            _local.depth = 0
+            try :
+                return function(*args, **kwargs)
+            finally :
+                seconds = time.perf_counter() - origin
+                trace, _local.trace = _local.trace, None
+                observe('trade_dash_callback_seconds', seconds, callback=callback)
+                if _traceLog is not None : _writeTrace(callback, seconds, trace['spans'])
+        return wrapper
+    return decorator
+
+
+def _writeTrace(callback, seconds, spans) :
+    line = json.dumps({'callback' : callback, 'time' : time.time(), 'seconds' : round(seconds, 6), 'spans' : spans})
+    with _guard :
+        with open(_traceLog, 'a') as f :
+            f.write(line + '\n')
+
+
+def _labels(labels, extra=()) :
+    pairs = list(labels) + list(extra)
+    if not pairs : return ''
+    escape = lambda value : str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return '{' + ','.join('%s="%s"' % (name, escape(value)) for name, value in pairs) + '}'
+
+
+def render() :
+    """
+    Metrics in the Prometheus text exposition format
+
+    Returns
+    -------
+    str
+        One block per metric of METRICS
+    """
+    with _guard :
+        histograms = {key : (list(buckets), total) for key, (buckets, total) in _histograms.items()}
+        counters = dict(_counters)
+    lines = []
+    for name, (kind, description) in METRICS.items() :
+        lines.append('# HELP %s %s' % (name, description))
+        lines.append('# TYPE %s %s' % (name, kind))
+        if kind == 'counter' :
+            for (metric, labels), value in sorted(counters.items()) :
+                if metric == name : lines.append('%s%s %s' % (name, _labels(labels), value))
+            continue
+        for (metric, labels), (buckets, total) in sorted(histograms.items()) :
+            if metric != name : continue
+            cumulative = 0
+            for bound, n in zip(BUCKETS + ['+Inf'], buckets) :
+                cumulative += n
+                lines.append('%s_bucket%s %d' % (name, _labels(labels, [('le', bound)]), cumulative))
+            lines.append('%s_sum%s %r' % (name, _labels(labels), total))
+            lines.append('%s_count%s %d' % (name, _labels(labels), cumulative))
+    return '\n'.join(lines) + '\n'
+
+
+def install(server, path='/metrics', traceLog=None) :
+    """
+    Expose the metrics on the Flask server
+
+    Parameters
+    ----------
+    server : Flask
+        Server of the Dash app (app.server)
+    path : str, optional
+        Route of the metrics, by default '/metrics'
+    traceLog : str, optional
+        File receiving one JSON line per timed callback with its spans,
+        by default no trace is written
+    """
+    global _traceLog
+    _traceLog = traceLog
+    server.add_url_rule(path, 'metrics', lambda : (render(), 200, {'Content-Type' : CONTENT_TYPE}))
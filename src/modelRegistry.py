@@ -0,0 +1,122 @@
+import os
+import json
+import time
+import pickle
+import hashlib
+import numpy as np
+
+
+def dataHash(data, rows=None) :
+    """
+    Hash of the first rows of the training data
+
+    Parameters
+    ----------
+    data : array
+        Training data, 1-D or 2-D
+    rows : int, optional
+        Number of rows hashed, by default all of them
+
+    Returns
+    -------
+    str
+        Hex digest of the values
+    """
+    data = np.ascontiguousarray(np.asarray(data, dtype=np.float64)[:rows])
+    return hashlib.sha1(data.tobytes()).hexdigest()
+
+
+def paramsHash(params) :
+    return hashlib.sha1(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()[:12]
+
+
+# Class Definitions
+class ModelRegistry(object) :
+    """Fitted forecast models stored on disk
+
+    A model is stored per ticker, model type and hyperparameters, together
+    with the hash of the data it was trained on. A stored model trained on
+    the same data is reused as it is; one trained on the first rows of the
+    data (i.e. before new bars arrived) is returned to be fine-tuned on the
+    new rows only.
+
+    Attributes
+    ----------
+    folder : str
+        Folder holding one <TICKER>/<kind>-<params hash>.pkl file per model
+
+    Methods
+    -------
+    load(ticker,kind,params,data)
+        Stored state of the model and number of rows it was trained on
+
+    save(ticker,kind,params,data,state)
+        Store the state of a model trained on data
+    """
+
+    def __init__(self, folder) :
+        self.folder = folder
+
+
+    def path(self, ticker, kind, params) :
+        return os.path.join(self.folder, ticker.strip().upper(), '%s-%s.pkl' % (kind, paramsHash(params)))
+
+
+    def load(self, ticker, kind, params, data) :
+        """
+        Stored state of the model
+
+        Parameters
+        ----------
+        ticker : str
+            Name of the stock
+        kind : str
+            Model type ('lstm', 'arima', 'prophet')
+        params : dict
+            Hyperparameters of the model
+        data : array
+            Current training data
+
+        Returns
+        -------
+        dict
+            State saved with the model, None when no stored model was trained
+            on data or on its first rows
+        int
+            Number of rows of data the model was trained on, len(data) when
+            it can be reused as it is
+        """
+        path = self.path(ticker, kind, params)
+        if not os.path.exists(path) : return None, 0
+        try :
+            with open(path, 'rb') as f :
+                stored = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError) :
+            return None, 0
+        rows = stored['rows']
+        if (rows > len(data)) or (dataHash(data, rows) != stored['hash']) : return None, 0
+        return stored['state'], rows
+
+
+    def save(self, ticker, kind, params, data, state) :
+        """
+        Store the state of a model trained on data, replacing the previous one
+
+        Parameters
+        ----------
+        state : dict
+            Picklable state of the model (weights, parameters, forecast...)
+        """
+        path = self.path(ticker, kind, params)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        stored = {
+            'params' : params,
+            'rows'   : len(data),
+            'hash'   : dataHash(data),
+            'saved'  : time.time(),
+            'state'  : state,
+        }
+        tmp = '%s.%d.tmp' % (path, os.getpid())
+        with open(tmp, 'wb') as f :
+            pickle.dump(stored, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
@@ -0,0 +1,202 @@
+import os
+import re
+import abc
+import time
+import threading
+import pandas as pd
+import yfinance as yf
+
+
+# Class Definitions
+class Provider(abc.ABC) :
+    """Interface of the market data providers, subclasses implement history
+
+    Attributes
+    ----------
+    batched : bool
+        True when historyMany downloads many tickers with a single request
+
+    Methods
+    -------
+    history(ticker,start=None,period='5y',interval='1d')
+        Bars of the ticker indexed by date
+
+    historyMany(tickers,period='5y',interval='1d')
+        Bars of many tickers, by default one history call per ticker
+
+    shortName(ticker)
+        Human readable name of the ticker
+    """
+    batched = False
+
+    @abc.abstractmethod
+    def history(self, ticker, start=None, period='5y', interval='1d') :
+        """
+        Bars of the ticker
+
+        Parameters
+        ----------
+        ticker : str
+            Name of the stock
+        start : Timestamp, optional
+            First date to return (included), by default the whole period is returned
+        period : str, optional
+            History depth used when start is None, by default '5y'
+        interval : str, optional
+            Bar width, by default '1d'
+
+        Returns
+        -------
+        DataFrame
+            Open, High, Low, Close, Volume (...) indexed by date, empty if the ticker is unknown
+        """
+
+
+    def historyMany(self, tickers, period='5y', interval='1d') :
+        """
+        Bars of many tickers
+
+        Returns
+        -------
+        dict
+            ticker -> DataFrame, as returned by history
+        """
+        return {t : self.history(t, period=period, interval=interval) for t in tickers}
+
+
+    def shortName(self, ticker) :
+        return ticker.upper()
+
+
+class YahooProvider(Provider) :
+    """Market data downloaded from Yahoo Finance
+    """
+    batched = True
+
+    def history(self, ticker, start=None, period='5y', interval='1d') :
+        stockTicker = yf.Ticker(ticker.upper())
+        if start is None : return stockTicker.history(period=period, interval=interval)
+        return stockTicker.history(start=start, interval=interval)
+
+
+    def historyMany(self, tickers, period='5y', interval='1d') :
+        tickers = [t.upper() for t in tickers]
+        history = yf.download(tickers, period=period, interval=interval, group_by='ticker', progress=False)
+        if len(tickers) == 1 : return {tickers[0] : history}
+        return {t : history[t].dropna(how='all') for t in tickers}
+
+
+    def shortName(self, ticker) :
+        try :
+            return yf.Ticker(ticker.upper()).info['shortName']
+        except :
+            return ticker.upper()
+
+
+class ReplayProvider(Provider) :
+    """Market data replayed from local files
+
+    Bars are read from <folder>/<TICKER>.csv (or .parquet) for daily bars and
+    from <folder>/<TICKER>_<interval>.csv for the other intervals. Files are
+    parsed once and then served from memory.
+
+    Attributes
+    ----------
+    folder : str
+        Folder holding the files
+    delay : float
+        Seconds waited on each call, used to emulate network latency
+    clock : callable
+        Returns the current replay Timestamp, bars after it are not served yet.
+        By default all the bars are served, see replayClock for a live feed
+    """
+
+    def __init__(self, folder, delay=0.0, clock=None) :
+        self.folder = folder
+        self.delay  = delay
+        self.clock  = clock
+        self._frames = {}
+        self._guard  = threading.Lock()
+
+
+    def _load(self, ticker, interval) :
+        name = ticker.upper() if interval == '1d' else ticker.upper() + '_' + interval
+        with self._guard :
+            if name in self._frames : return self._frames[name]
+        df = pd.DataFrame()
+        for ext in ['.parquet', '.csv'] :
+            path = os.path.join(self.folder, name + ext)
+            if not os.path.exists(path) : continue
+            if ext == '.csv' : df = pd.read_csv(path, index_col=0, parse_dates=True)
+            else : df = pd.read_parquet(path)
+            df.index.name = 'Date'
+            break
+        with self._guard :
+            self._frames[name] = df
+        return df
+
+
+    def history(self, ticker, start=None, period='5y', interval='1d') :
+        if self.delay : time.sleep(self.delay)
+        df = self._load(ticker, interval)
+        if self.clock is not None : df = df[df.index <= self.clock()]
+        if df.empty : return df.copy()
+        if start is None : start = periodStart(df.index[-1], period)
+        if start is None : return df.copy()
+        return df[df.index >= pd.Timestamp(start)].copy()
+
+
+def replayClock(start, speed=60.0) :
+    """
+    Clock of a live replay, starting at start and running speed times faster
+    than the wall clock
+
+    Returns
+    -------
+    callable
+        Returns the current replay Timestamp
+    """
+    origin = time.monotonic()
+    return lambda : pd.Timestamp(start) + pd.Timedelta(seconds=speed*(time.monotonic() - origin))
+
+
+def periodStart(end, period) :
+    """
+    First date of a yfinance-like period ('5d', '1mo', '5y', 'max', ...) ending at end
+
+    Returns
+    -------
+    Timestamp
+        First date of the period, None for 'max'
+    """
+    match = re.fullmatch(r'(\d+)(d|wk|mo|y)', period)
+    if match is None : return None
+    n = int(match.group(1))
+    unit = {'d' : 'days', 'wk' : 'weeks', 'mo' : 'months', 'y' : 'years'}[match.group(2)]
+    return pd.Timestamp(end) - pd.DateOffset(**{unit : n})
+
+
+PROVIDERS = {
+    'yahoo'  : YahooProvider,
+    'replay' : ReplayProvider,
+}
+
+
+def getProvider(lib='yahoo', **kwargs) :
+    """
+    Resolve a market data provider
+
+    Parameters
+    ----------
+    lib : str or Provider, optional
+        Name of the provider in PROVIDERS or a provider instance, by default 'yahoo'
+    **kwargs
+        Arguments of the provider constructor
+
+    Returns
+    -------
+    Provider
+        Market data provider
+    """
+    if isinstance(lib, Provider) : return lib
+    return PROVIDERS[lib](**kwargs)
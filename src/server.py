@@ -1,20 +1,96 @@
+import os
 import dash
-from flask_caching import Cache
+import threading
+from .dataStore import OHLCVStore
+from .providers import getProvider
+from .fetcher import FetchPool
+from .jobs import JobQueue
+from .modelRegistry import ModelRegistry
+from .stockCache import StockCache
+from .sharedCache import SharedCache
+from . import metrics
+from .snapshots import SnapshotStore
 
 
 external_stylesheets = ['https://codepen.io/chriddyp/pen/bWLwgP.css']
 TIMEOUT_CACHE = 150
+STOCK_CACHE_SIZE = 64
+FIGURE_CACHE_SIZE = 256
+STREAM_PERIOD = 5
+INTRADAY_PERIOD = '5d'
+# Points sent per trace inside the visible window and on each side of it
+MAX_POINTS = 1500
+CONTEXT_POINTS = 200
+FETCH_WORKERS = 8
+FORECAST_WORKERS = 1
+JOB_PERIOD = 1
+PROVIDER = os.environ.get('TRADE_DASH_PROVIDER', 'yahoo')
+REPLAY_FOLDER = os.environ.get('TRADE_DASH_REPLAY', 'replay')
+DATA_FOLDER = os.environ.get('TRADE_DASH_DATA', os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data'))
+# Seconds of validity of each class of data and seconds during which an
+# expired value is still served while a single worker refreshes it
+CACHE_TTL = {
+    'history'    : (TIMEOUT_CACHE, 0),
+    'indicators' : (TIMEOUT_CACHE, 4*TIMEOUT_CACHE),
+    'intraday'   : (STREAM_PERIOD, 0),
+    'forecasts'  : (24*3600, 0),
+}
 
 app = dash.Dash(__name__, external_stylesheets=external_stylesheets)
 app.config['suppress_callback_exceptions'] = True
 
-# Cache Setup
-CACHE_CONFIG = {
-    # try 'filesystem' if you don't want to setup redis
-    'CACHE_TYPE': 'simple',
-    'CACHE_DEFAULT_TIMEOUT' : TIMEOUT_CACHE
-}
+# Latency histograms and cache counters on /metrics, TRADE_DASH_TRACE names
+# a file receiving the spans of every callback (profiling sessions)
+metrics.install(app.server, traceLog=os.environ.get('TRADE_DASH_TRACE'))
+
+# Cache shared by the worker processes (waitress threads, gunicorn workers)
+os.makedirs(DATA_FOLDER, exist_ok=True)
+sharedCache = SharedCache(os.path.join(DATA_FOLDER, 'cache.sqlite'), ttls=CACHE_TTL)
+
+# Market data provider, 'replay' serves the files in REPLAY_FOLDER to run offline
+provider = getProvider(PROVIDER, folder=REPLAY_FOLDER) if PROVIDER == 'replay' else getProvider(PROVIDER)
+# Downloads run on a bounded pool, concurrent requests of the same bars share one download
+provider = FetchPool(provider, workers=FETCH_WORKERS)
+
+# Persistent history of the stocks, refreshed with the bars after the last stored date
+store = OHLCVStore(DATA_FOLDER, provider, maxAge=CACHE_TTL['history'][0])
+
+# Indicators precomputed by batch.py, served read-only when present
+snapshots = SnapshotStore(os.path.join(DATA_FOLDER, 'snapshots'))
+
+# Computed Stock objects shared by all the sessions, keyed by ticker
+stockCache = StockCache(STOCK_CACHE_SIZE, *CACHE_TTL['indicators'], shared=sharedCache, kind='indicators')
+
+# Intraday Stock objects, refreshed with the new bars every STREAM_PERIOD seconds
+streamCache = StockCache(STOCK_CACHE_SIZE, *CACHE_TTL['intraday'], shared=sharedCache, kind='intraday')
+
+# Forecasts of the done jobs, keyed by job
+forecastCache = StockCache(FIGURE_CACHE_SIZE, *CACHE_TTL['forecasts'], shared=sharedCache, kind='forecasts')
+
+# Rendered figures keyed by ticker, interval, data version and toggles
+figureCache = StockCache(maxSize=FIGURE_CACHE_SIZE, kind='figures')
+
+# Trained forecast models, later histories of a stock only fine-tune them
+registry = ModelRegistry(os.path.join(DATA_FOLDER, 'models'))
+
+_jobs = None
+_jobsGuard = threading.Lock()
+
+
+def jobQueue() :
+    """
+    Queue of the forecasts trained in the background, status and results
+    survive a restart. Created on first use: the spawned workers import
+    the main script, hence this module, again and must not start a queue
 
-# Init cache
-cache = Cache()
-cache.init_app(app.server, config=CACHE_CONFIG)
\ No newline at end of file
+    Returns
+    -------
+    JobQueue
+        Queue of the server process
+    """
+    global _jobs
+    if _jobs is not None : return _jobs
+    with _jobsGuard :
+        if _jobs is None :
+            _jobs = JobQueue(os.path.join(DATA_FOLDER, 'jobs.sqlite'), workers=FORECAST_WORKERS, registry=registry)
+        return _jobs
@@ -0,0 +1,245 @@
+import os
+import time
+import uuid
+import pickle
+import sqlite3
+import threading
+from . import metrics
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    kind     TEXT,
+    key      TEXT,
+    value    BLOB,
+    created  REAL,
+    PRIMARY KEY (kind, key)
+);
+CREATE TABLE IF NOT EXISTS leases (
+    kind     TEXT,
+    key      TEXT,
+    owner    TEXT,
+    expires  REAL,
+    PRIMARY KEY (kind, key)
+);
+"""
+
+
+def _connect(path) :
+    connection = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+    if path != ':memory:' : connection.execute('PRAGMA journal_mode=WAL')
+    connection.executescript(SCHEMA)
+    return connection
+
+
+# Class Definitions
+class SharedCache(object) :
+    """Cache of pickled values shared by the worker processes of the server
+
+    Entries live in a SQLite file, so every waitress thread and gunicorn
+    worker reads the values computed by the others. Each kind of data
+    (e.g. 'indicators', 'forecasts') has its own ttl and stale window: a
+    value older than ttl but younger than ttl + stale is still returned,
+    while a single worker refreshes it (stale-while-revalidate). Missing or
+    older values are built by a single worker too, the others wait for its
+    result. The worker refreshing a key holds a lease on it, the lease
+    expires after lease seconds when the worker dies.
+
+    Attributes
+    ----------
+    path : str
+        SQLite database, ':memory:' keeps the cache in the process
+    ttls : dict
+        kind -> (ttl, stale) in seconds, a ttl of None never expires
+    lease : float
+        Seconds after which the lease of a worker which did not finish is released
+    poll : float
+        Seconds between two reads of the workers waiting for a value
+
+    Methods
+    -------
+    get(kind,key,build,update=None)
+        Cached value of key, built with build() when missing, refreshed
+        with update(expired) when expired
+
+    entry(kind,key,build,update=None,background=True)
+        Creation time and value of key, see get
+
+    put(kind,key,value)
+        Store a value
+
+    peek(kind,key)
+        Cached value of key, None when missing or expired
+
+    invalidate(kind,key)
+        Drop the entry of key
+    """
+
+    def __init__(self, path=':memory:', ttls=None, lease=60, poll=0.05) :
+        self.path   = path
+        self.ttls   = dict(ttls or {})
+        self.lease  = lease
+        self.poll   = poll
+        self._guard = threading.Lock()
+        self._pid   = None
+        self._db    = None
+
+
+    def _connection(self) :
+        # Called with the guard held, forked workers open their own connection
+        if self._pid != os.getpid() :
+            self._db  = _connect(self.path)
+            self._pid = os.getpid()
+        return self._db
+
+
+    def _execute(self, sql, parameters=()) :
+        with self._guard :
+            return self._connection().execute(sql, parameters).fetchall()
+
+
+    def ttl(self, kind) :
+        return self.ttls.get(kind, (None, 0))
+
+
+    def _age(self, kind, created) :
+        # 0 fresh, 1 stale, 2 expired
+        ttl, stale = self.ttl(kind)
+        age = time.time() - created
+        if (ttl is None) or (age <= ttl) : return 0
+        return 1 if age <= ttl + stale else 2
+
+
+    def _read(self, kind, key) :
+        rows = self._execute('SELECT created, value FROM entries WHERE kind=? AND key=?', (kind, key))
+        if not rows : return None
+        try :
+            return rows[0][0], pickle.loads(rows[0][1])
+        except Exception :
+            # Written by another version of the code, it is built again
+            return None
+
+
+    def _acquire(self, kind, key, owner) :
+        now = time.time()
+        with self._guard :
+            db = self._connection()
+            # The lease is checked and taken in a single write transaction
+            db.execute('BEGIN IMMEDIATE')
+            try :
+                row = db.execute('SELECT owner, expires FROM leases WHERE kind=? AND key=?', (kind, key)).fetchone()
+                if (row is not None) and (row[0] != owner) and (row[1] > now) : return False
+                db.execute('INSERT OR REPLACE INTO leases VALUES (?, ?, ?, ?)', (kind, key, owner, now + self.lease))
+                return True
+            finally :
+                db.execute('COMMIT')
+
+
+    def _release(self, kind, key, owner) :
+        self._execute('DELETE FROM leases WHERE kind=? AND key=? AND owner=?', (kind, key, owner))
+
+
+    def _refresh(self, kind, key, owner, build, update, expired) :
+        # Called by the lease holder, None values are not stored
+        try :
+            value = update(expired[1]) if (expired is not None) and (update is not None) else build()
+            created = self.put(kind, key, value)
+        finally :
+            self._release(kind, key, owner)
+        return created, value
+
+
+    def _refreshAside(self, kind, key, owner, build, update, expired) :
+        try :
+            self._refresh(kind, key, owner, build, update, expired)
+        except Exception :
+            # The stale value is served until the next refresh succeeds
+            pass
+
+
+    def entry(self, kind, key, build, update=None, background=True) :
+        """
+        Creation time and value of key
+
+        Parameters
+        ----------
+        kind : str
+            Kind of data, see ttls
+        key : str
+            Key of the entry
+        build : callable
+            Called without arguments to build the value on a miss
+        update : callable, optional
+            Called with the expired value to refresh it, by default
+            an expired value is built again
+        background : bool, optional
+            Refresh a stale value in a new thread and return it at once (True),
+            or refresh it before returning (False), by default True.
+            Workers not holding the lease always return the stale value
+
+        Returns
+        -------
+        float
+            Creation time of the value (time.time())
+        object
+            Cached or freshly built value
+        """
+        # Identifies the lease of this call, released by the thread refreshing the value
+        owner = uuid.uuid4().hex
+        cached = self._read(kind, key)
+        age = 2 if cached is None else self._age(kind, cached[0])
+        metrics.count('trade_dash_cache_requests_total', cache=kind, layer='shared', result=['hit', 'stale', 'miss'][age])
+        if cached is not None :
+            if age == 0 : return cached
+            if age == 1 :
+                if not self._acquire(kind, key, owner) : return cached
+                if not background : return self._refresh(kind, key, owner, build, update, cached)
+                threading.Thread(target=self._refreshAside, args=(kind, key, owner, build, update, cached), daemon=True).start()
+                return cached
+        # Missing or expired, a single worker builds it and the others wait
+        while not self._acquire(kind, key, owner) :
+            time.sleep(self.poll)
+            latest = self._read(kind, key)
+            if (latest is not None) and (self._age(kind, latest[0]) < 2) : return latest
+        # The value may have been built while waiting for the lease
+        latest = self._read(kind, key)
+        if (latest is not None) and (self._age(kind, latest[0]) == 0) :
+            self._release(kind, key, owner)
+            return latest
+        return self._refresh(kind, key, owner, build, update, latest or cached)
+
+
+    def get(self, kind, key, build, update=None) :
+        """
+        Cached value of key, see entry
+        """
+        return self.entry(kind, key, build, update)[1]
+
+
+    def put(self, kind, key, value) :
+        """
+        Store a value, None is not stored
+
+        Returns
+        -------
+        float
+            Creation time of the value
+        """
+        created = time.time()
+        if value is None : return created
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        self._execute('INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)', (kind, key, blob, created))
+        ttl, stale = self.ttl(kind)
+        if ttl is not None :
+            self._execute('DELETE FROM entries WHERE kind=? AND created<?', (kind, created - ttl - stale))
+        return created
+
+
+    def peek(self, kind, key) :
+        cached = self._read(kind, key)
+        if (cached is None) or (self._age(kind, cached[0]) != 0) : return None
+        return cached[1]
+
+
+    def invalidate(self, kind, key) :
+        self._execute('DELETE FROM entries WHERE kind=? AND key=?', (kind, key))
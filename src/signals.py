@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+from .utils import ColNum2ColName
+
+
+# Buy logics shared by Stock and the parameter sweeps, they only need the
+# closing values and the extrema, not a whole Stock object
+
+def _lastBefore(positions, days) :
+    # Item of positions preceding the first one not before each day, as the
+    # scan of utils.nearest_yesterday (the last item when the first one is not
+    # before the day). The lists of extrema of the histories shorter than the
+    # extrema window wrap around and are not sorted: the first item not
+    # before a day is also the first one where their running maximum is not
+    positions = np.asarray(positions, dtype=np.int64)
+    return positions[np.maximum.accumulate(positions).searchsorted(days, 'left') - 1]
+
+
+def minMaxTrend(close, dateMaxs, dateMins, daysToSubtract=180, windowSize=3) :
+    """
+    Trends of the last days, given by the position of the closing value with
+    respect to the last local Maximum and Minimum
+
+    Parameters
+    ----------
+    close : Series
+        Closing values indexed by date
+    dateMaxs : list
+        Dates of the local Maxima, see utils.computeMinMax
+    dateMins : list
+        Dates of the local Minima, see utils.computeMinMax
+    daysToSubtract : int, optional
+        Number of trailing days evaluated, by default 180
+    windowSize : int, optional
+        Days voting the trend of the following day, by default 3
+
+    Returns
+    -------
+    DataFrame
+        Date, UpTrend and DownTrend labels of the days in a trend
+    list
+        First day of each up trend lasting at least 4 days
+    list
+        Last day of each of those up trends
+    """
+    empty = pd.DataFrame(columns=['Date','UpTrend','DownTrend'])
+    daysToSubtract = min(daysToSubtract, len(close))
+    if (len(dateMaxs) == 0) or (len(dateMins) == 0) or (daysToSubtract == 0) : return empty, [], []
+    values = close.to_numpy(dtype=np.float64)
+    days = close.index[len(close)-daysToSubtract:]
+
+    # Compare each value with the last Min and Max before it, see _lastBefore
+    dayPositions = np.arange(len(close)-daysToSubtract, len(close))
+    lastMax = values[_lastBefore(close.index.get_indexer(dateMaxs), dayPositions)]
+    lastMin = values[_lastBefore(close.index.get_indexer(dateMins), dayPositions)]
+    value = values[len(close)-daysToSubtract:]
+    trend = np.where(value > lastMax, 1, np.where(value < lastMin, -1, 0))
+
+    # Count trends in the windowSize days before each day
+    if len(trend) <= windowSize : return empty, [], []
+    ups = np.r_[0, np.cumsum(trend == 1)];      downs = np.r_[0, np.cumsum(trend == -1)]
+    end = np.arange(windowSize, len(trend))
+    # At least 60% of the days says it is a positive (negative) trend
+    isUp = ups[end] - ups[end-windowSize] >= int(0.6*windowSize)
+    isDown = ~isUp & (downs[end] - downs[end-windowSize] >= int(0.6*windowSize))
+    # Otherwise the day is skipped and the next trend gets a new label
+    labelN = 1 + np.cumsum(~(isUp | isDown))
+    keep = isUp | isDown
+    if not keep.any() : return empty, [], []
+    names = {n : ColNum2ColName(n) for n in np.unique(labelN[keep])}
+    labels = np.array([names[n] for n in labelN[keep]], dtype=object)
+    weightedTrend = pd.DataFrame({
+        'Date'      : days[end[keep]],
+        'UpTrend'   : np.where(isUp[keep], labels, np.nan),
+        'DownTrend' : np.where(isDown[keep], labels, np.nan),
+    }, index=np.zeros(keep.sum(), dtype=np.int64))
+
+    # Up trends lasting at least 4 days
+    upLabels = labelN[isUp]
+    _, first, counts = np.unique(upLabels, return_index=True, return_counts=True)
+    last = len(upLabels) - 1 - np.unique(upLabels[::-1], return_index=True)[1]
+    upDays = days[end[isUp]]
+    enterDays = list(upDays[first[counts >= 4]])
+    exitDays = list(upDays[last[counts >= 4]])
+    return weightedTrend, enterDays, exitDays
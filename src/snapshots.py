@@ -0,0 +1,213 @@
+import os
+import json
+import time
+import hashlib
+import numpy as np
+import pandas as pd
+from .stockClass import Stock, INDICATORS, DATES
+
+
+# Layout of the snapshot files, bumped when the arrays written change
+SNAPSHOT_FORMAT = 2
+ALIGNMENT = 64
+
+# Arrays of the trends of Stock
+TRENDS = ['trendDays', 'trendUp', 'trendDown']
+
+
+def _snapshotArrays(stock) :
+    # name -> array of everything computeIndicators computed, as stored by Stock
+    arrays = {'dates' : stock.dates, 'bars' : stock.bars}
+    for name in INDICATORS + TRENDS :
+        arrays[name] = getattr(stock, name)
+    for name in DATES :
+        arrays[name] = stock.positions[name]
+    return arrays
+
+
+# Class Definitions
+class SnapshotStore(object) :
+    """Indicators of the stocks computed offline (see batch.py) and served
+    read-only by the dashboard
+
+    A snapshot is a single memory-mappable .npy blob holding every array
+    computed by Stock.computeIndicators, next to a .json header with the
+    dtype, shape and offset of each array. The arrays of a loaded Stock are
+    read-only views of the mapped file, so loading does not depend on the
+    cost of the indicators. Snapshots are named after the format and the
+    data version and published by atomically replacing the CURRENT file of
+    the ticker, so readers never see a partial snapshot.
+
+    Attributes
+    ----------
+    folder : str
+        Folder holding one <TICKER> folder per stock
+    keep : int
+        Number of snapshots kept per ticker, older ones are deleted
+
+    Methods
+    -------
+    save(stock)
+        Write the snapshot of a Stock with the indicators computed
+
+    current(ticker)
+        Header of the latest snapshot of the ticker
+
+    load(ticker,provider='yahoo')
+        Stock object of the latest snapshot of the ticker
+    """
+
+    def __init__(self, folder, keep=2) :
+        self.folder = folder
+        self.keep   = keep
+
+
+    def path(self, ticker, snapshot=None) :
+        folder = os.path.join(self.folder, ticker.strip().upper())
+        return folder if snapshot is None else os.path.join(folder, snapshot)
+
+
+    def save(self, stock) :
+        """
+        Write the snapshot of a Stock
+
+        Parameters
+        ----------
+        stock : Stock
+            Stock object with the indicators computed
+
+        Returns
+        -------
+        str
+            Identifier of the snapshot
+        """
+        snapshot = '%d-%s' % (SNAPSHOT_FORMAT, hashlib.sha1(stock.version.encode()).hexdigest()[:12])
+        path = self.path(stock.stockName, snapshot)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if not os.path.exists(path + '.json') :
+            arrays = _snapshotArrays(stock)
+            layout = {};    size = 0
+            for name, array in arrays.items() :
+                layout[name] = {'dtype' : array.dtype.str, 'shape' : list(array.shape), 'offset' : size}
+                size += -(-array.nbytes // ALIGNMENT)*ALIGNMENT
+            blob = np.zeros(size, dtype=np.uint8)
+            for name, array in arrays.items() :
+                offset = layout[name]['offset']
+                blob[offset:offset+array.nbytes] = np.ascontiguousarray(array).view(np.uint8).ravel()
+            header = {
+                'format'   : SNAPSHOT_FORMAT,
+                'snapshot' : snapshot,
+                'ticker'   : stock.stockName.strip().upper(),
+                'name'     : stock.shortName(),
+                'interval' : stock.interval,
+                'version'  : stock.version,
+                'columns'  : list(stock.columns),
+                'created'  : time.time(),
+                'arrays'   : layout,
+            }
+            # The header is written last, it marks the snapshot as complete
+            tmp = '%s.%d.tmp' % (path, os.getpid())
+            np.save(tmp + '.npy', blob)
+            os.replace(tmp + '.npy', path + '.npy')
+            with open(tmp, 'w') as f :
+                json.dump(header, f)
+            os.replace(tmp, path + '.json')
+        current = os.path.join(self.path(stock.stockName), 'CURRENT')
+        with open(current + '.tmp', 'w') as f :
+            f.write(snapshot)
+        os.replace(current + '.tmp', current)
+        self._prune(stock.stockName, snapshot)
+        return snapshot
+
+
+    def _prune(self, ticker, snapshot) :
+        folder = self.path(ticker)
+        headers = sorted((f for f in os.listdir(folder) if f.endswith('.json')),
+                         key=lambda f : os.path.getmtime(os.path.join(folder, f)), reverse=True)
+        # Mapped files stay readable after the unlink
+        for header in headers[self.keep:] :
+            if header[:-len('.json')] == snapshot : continue
+            for extension in ['.json', '.npy'] :
+                try :
+                    os.remove(os.path.join(folder, header[:-len('.json')] + extension))
+                except OSError :
+                    pass
+
+
+    def current(self, ticker) :
+        """
+        Header of the latest snapshot of the ticker
+
+        Returns
+        -------
+        dict
+            Header written by save, None when there is no snapshot of the
+            current format
+        """
+        try :
+            with open(os.path.join(self.path(ticker), 'CURRENT')) as f :
+                snapshot = f.read().strip()
+            with open(self.path(ticker, snapshot) + '.json') as f :
+                header = json.load(f)
+        except (OSError, ValueError) :
+            return None
+        return header if header['format'] == SNAPSHOT_FORMAT else None
+
+
+    def arrays(self, header) :
+        """
+        Arrays of a snapshot, read-only views of the mapped file
+
+        Returns
+        -------
+        dict
+            name -> np.array
+        """
+        blob = np.load(self.path(header['ticker'], header['snapshot']) + '.npy', mmap_mode='r')
+        arrays = {}
+        for name, layout in header['arrays'].items() :
+            dtype = np.dtype(layout['dtype'])
+            count = int(np.prod(layout['shape']))
+            view = blob[layout['offset']:layout['offset']+count*dtype.itemsize].view(dtype).reshape(layout['shape'])
+            arrays[name] = np.asarray(view)
+        return arrays
+
+
+    def load(self, ticker, provider='yahoo') :
+        """
+        Stock object of the latest snapshot of the ticker
+
+        Parameters
+        ----------
+        ticker : str
+            Name of the stock
+        provider : str or Provider, optional
+            Provider of the returned Stock, only used when it is refreshed
+            or extended, by default 'yahoo'
+
+        Returns
+        -------
+        Stock
+            Stock object with the indicators of the snapshot, it must not be
+            modified. None when there is no snapshot
+        """
+        header = self.current(ticker)
+        if header is None : return None
+        try :
+            arrays = self.arrays(header)
+        except (OSError, ValueError) :
+            return None
+        # Built empty, the bars are views of the mapped file like the indicators
+        stock = Stock(header['ticker'], lib=provider, interval=header['interval'], history=pd.DataFrame(columns=header['columns']))
+        stock.dates   = arrays['dates']
+        stock.bars    = arrays['bars']
+        stock.columns = list(header['columns'])
+        stock._frame  = None
+        for name in INDICATORS + TRENDS :
+            setattr(stock, name, arrays[name])
+        for name in DATES :
+            stock.positions[name] = arrays[name]
+        stock._freeze()
+        stock.snapshot    = header['snapshot']
+        stock.displayName = header['name']
+        return stock
@@ -0,0 +1,150 @@
+import time
+import threading
+from collections import OrderedDict
+from . import metrics
+
+
+# Result of a lookup in the metrics, by state of the entry (see _lookup)
+RESULTS = {0 : 'hit', 1 : 'stale', 2 : 'miss', None : 'miss'}
+
+
+# Class Definitions
+class StockCache(object) :
+    """Thread-safe LRU cache of computed objects, shared by all the sessions
+
+    Values are built once per key: concurrent requests for a key being
+    built wait for the first build instead of computing it again. An entry
+    expired for less than stale seconds is still returned, while a single
+    thread refreshes it in the background. With a shared cache the entries
+    are read from and written to it, so the worker processes build each
+    value once; the local entries then avoid unpickling it on every request.
+
+    Attributes
+    ----------
+    maxSize : int
+        Maximum number of entries, the least recently used is evicted first
+    ttl : float
+        Seconds of validity of an entry, None never expires
+    stale : float
+        Seconds after ttl during which an expired entry is returned while it is refreshed
+    shared : SharedCache
+        Cache shared by the worker processes, None keeps the entries in the process
+    kind : str
+        Kind of the entries in the shared cache, it gives their ttl and stale
+        window, also names the cache in the metrics
+
+    Methods
+    -------
+    get(key,build,update=None)
+        Cached value of key, built with build() when missing, refreshed
+        with update(expired) when expired
+
+    peek(key)
+        Cached value of key, None when missing or expired
+
+    invalidate(key)
+        Drop the entry of key
+    """
+
+    def __init__(self, maxSize=64, ttl=None, stale=0, shared=None, kind=None) :
+        self.maxSize   = maxSize
+        self.ttl       = ttl
+        self.stale     = stale
+        self.shared    = shared
+        self.kind      = kind
+        self._entries  = OrderedDict()
+        self._building = {}
+        self._refreshing = set()
+        self._guard    = threading.Lock()
+
+
+    def _lookup(self, key) :
+        # entry and its state: 0 fresh, 1 stale, 2 expired, None when missing
+        entry = self._entries.get(key)
+        if entry is None : return None, None
+        age = time.monotonic() - entry[0]
+        if (self.ttl is not None) and (age > self.ttl) :
+            return entry, 1 if age <= self.ttl + self.stale else 2
+        self._entries.move_to_end(key)
+        return entry, 0
+
+
+    def _load(self, key, build, update, expired, background=True) :
+        if self.shared is not None :
+            created, value = self.shared.entry(self.kind, repr(key), build, update, background)
+            # Entries are as old as the shared value
+            stamp = time.monotonic() - (time.time() - created)
+        else :
+            value = update(expired) if (expired is not None) and (update is not None) else build()
+            stamp = time.monotonic()
+        with self._guard :
+            if value is not None :
+                self._entries[key] = (stamp, value)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.maxSize :
+                    self._entries.popitem(last=False)
+            self._building.pop(key, None)
+        return value
+
+
+    def _refreshAside(self, key, build, update, expired) :
+        try :
+            self._load(key, build, update, expired, background=False)
+        except Exception :
+            # The stale value is served until the next refresh succeeds
+            pass
+        finally :
+            with self._guard :
+                self._refreshing.discard(key)
+
+
+    def get(self, key, build, update=None) :
+        """
+        Cached value of key
+
+        Parameters
+        ----------
+        key : hashable
+            Key of the entry
+        build : callable
+            Called without arguments to build the value on a miss
+        update : callable, optional
+            Called with the expired value to refresh it, by default
+            an expired value is built again
+
+        Returns
+        -------
+        object
+            Cached or freshly built value, a None value is not cached
+        """
+        with self._guard :
+            entry, state = self._lookup(key)
+            metrics.count('trade_dash_cache_requests_total', cache=self.kind or 'local', layer='local', result=RESULTS[state])
+            if state == 0 : return entry[1]
+            if state == 1 :
+                if key not in self._refreshing :
+                    self._refreshing.add(key)
+                    threading.Thread(target=self._refreshAside, args=(key, build, update, entry[1]), daemon=True).start()
+                return entry[1]
+            keyLock = self._building.setdefault(key, threading.Lock())
+        with keyLock :
+            with self._guard :
+                entry, state = self._lookup(key)
+                if state in [0, 1] : return entry[1]
+            return self._load(key, build, update, None if entry is None else entry[1])
+
+
+    def peek(self, key) :
+        with self._guard :
+            entry, state = self._lookup(key)
+        return None if state != 0 else entry[1]
+
+
+    def invalidate(self, key) :
+        with self._guard :
+            self._entries.pop(key, None)
+        if self.shared is not None : self.shared.invalidate(self.kind, repr(key))
+
+
+    def __len__(self) :
+        return len(self._entries)
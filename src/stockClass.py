@@ -1,44 +1,122 @@
 import plotly.graph_objects as go
-import plotly.express as px
 from plotly.subplots import make_subplots
-import yfinance as yf
 import numpy as np
 import pandas as pd
-from .forecast import AutoARIMA, prophet, lstm
-from itertools import compress
-from datetime import datetime, timedelta
-from .utils import derivative, computeMinMax, nearest, nearest_yesterday, ColNum2ColName
-from trendet import identify_df_trends
+import copy
+import threading
+from . import indicators, signals, finiteDifference, metrics
+from .backends import backend
+from .extrema import extremaPositions
+from .providers import getProvider
+
+
+# Lists of dates computed by computeExtrema, stored as positions in the history
+DATES = ['dateMaxs', 'dateMins', 'dateMaxsMACD', 'dateMinsMACD', 'enterDaysTrend', 'exitDaysTrend', 'enterDaysMA', 'exitDaysMA']
+# Indicator arrays computed by computeIndicators, aligned to the last dates
+INDICATORS = ['closeSum', 'momentum', 'momentumDerivative', 'EMA20', 'EMA50', 'SMA200', 'MACD']
+# Attributes which are not pickled
+TRANSIENT = ['provider', '_frame', '_traces', '_guard']
+# Uids of the traces extended in place by streamPoints
+STREAMED = ['OHLC', 'Close', 'Momentum', 'MACD', 'EMA20', 'EMA50', 'SMA200']
+
+
+def _dateArray(index) :
+    # Epoch days when the bars are daily, nanoseconds otherwise (intraday bars)
+    values = pd.DatetimeIndex(index).values
+    days = values.astype('datetime64[D]')
+    return days if (days == values).all() else values
+
+
+def _positions(values) :
+    return np.asarray(values, dtype=np.int64)
+
+
+class _Dates(object) :
+    # List of dates of the history, stored as positions in Stock.positions
+    def __set_name__(self, owner, name) :
+        self.name = name
+
+    def __get__(self, stock, owner=None) :
+        if stock is None : return self
+        return stock.stockValue.index[stock.positions[self.name]]
+
+    def __set__(self, stock, dates) :
+        stock.positions[self.name] = _positions(stock.stockValue.index.get_indexer(pd.DatetimeIndex(dates)))
 
 
 # Class Definitions
 class Stock(object) :
     """Class designed to collect stock info
 
+    The history is kept as one float64 matrix of bars and one array of
+    dates (epoch days for daily bars) shared by every indicator: indicators
+    are float64 arrays aligned to the last dates (see offset) and the lists
+    of dates are int64 positions in the history. The class is slotted, so a
+    cached Stock only holds these arrays, and it is pickled without its
+    provider, the rendered traces and the DataFrame view of the bars
+
     Attributes
     ----------
     stockName : str
         Name of the stock we want to investigate
-    stockTicker : yfinance object
-        Yahoo finance object which collect informations from the web
+    provider : Provider
+        Market data provider which collect informations from the web or from local files,
+        None after unpickling
+    interval : str
+        Bar width of stockValue, '1d' or intraday ('1m', '5m')
+    dates : np.array
+        Dates of the bars, datetime64[D] for daily bars and datetime64[ns] otherwise
+    bars : np.array
+        float64 matrix of the bars, dates x columns
+    columns : list
+        Names of the columns of bars (Open, High, Low, Close, Volume, ...)
     stockValue : DataFrame
-        DataFrame which collect the value of the stock splitted in Open, Close, Low and High
-    momentum : DataFrame
-        Dataframe representing the momentum index
+        DataFrame view of bars indexed by dates, built on first use
+    momentum : Array
+        Array representing the momentum index
     EMA20 : Array
         Array representing the exponential moving average of the last 20 days
     EMA50 : Array
         Array representing the exponential moving average of the last 50 days
     SMA200 : Array
         Array representing the simple moving average of the last 200 days
-    figHandler : Plotly figure
-        Handler to the figure
+    positions : dict
+        name -> int64 positions in dates of the lists of dates (dateMaxs,
+        dateMins, enterDaysMA, ...), which are read as DatetimeIndex
+    trendDays : np.array
+        Positions in dates of the days in a trend, with their labels in
+        trendUp and trendDown ('' when not in an up/down trend), read as
+        the trends DataFrame
+    version : str
+        Identifier of the history the indicators were computed on, changes
+        whenever new bars are added
+    snapshot : str
+        Identifier of the snapshot the stock was loaded from, None when
+        the indicators were computed in process (see snapshots.SnapshotStore)
 
 
     Methods
     -------
-    updateGraphs(EMA20,EMA50,SMA200,Momentum)
-        Update Graphs rendering the class attributes
+    computeIndicators()
+        Compute every indicator rendered by updateGraphs
+
+    extend(bars)
+        Stock updated with new bars, indicators are updated incrementally
+
+    streamPoints(since)
+        New points of the rendered traces, to extend a figure in place
+
+    offset(name)
+        Position in dates of the first value of an indicator
+
+    setForecast(kind,forecast)
+        Attach a forecast trained in the background
+
+    trainForecast(kind)
+        Copy of the stock with a forecast trained in process
+
+    updateGraphs(EMA20,EMA50,SMA200,Momentum,MACD,LSTM,Prophet)
+        Build the figure rendering the class attributes
     
     layout_update(fig)
         Update the figure handler to fit better the screen
@@ -52,8 +130,20 @@ class Stock(object) :
     computeMA(nDays=20,kind='simple')
         Compute Moving Average
     """
-
-    def __init__(self,stockName,lib='yahoo') :
+    __slots__ = ['stockName', 'provider', 'interval', 'dates', 'bars', 'columns', '_frame'] + INDICATORS + [
+        'positions', 'trendDays', 'trendUp', 'trendDown', 'prophetForecast', 'prophetForecast_m30',
+        'LSTM_days', 'LSTM_forecast', 'version', 'snapshot', 'displayName', '_traces', '_guard']
+
+    dateMaxs       = _Dates()
+    dateMins       = _Dates()
+    dateMaxsMACD   = _Dates()
+    dateMinsMACD   = _Dates()
+    enterDaysTrend = _Dates()
+    exitDaysTrend  = _Dates()
+    enterDaysMA    = _Dates()
+    exitDaysMA     = _Dates()
+
+    def __init__(self,stockName,lib='yahoo',store=None,interval='1d',period='5y',history=None) :
         """
         Stock Constructor
 
@@ -61,30 +151,129 @@ class Stock(object) :
         ----------
         stockName : str
             Name of the stock to investigate
+        lib : str or Provider, optional
+            Market data provider, see providers.getProvider, by default 'yahoo'
+        store : OHLCVStore, optional
+            On-disk history store of daily bars, when given only the missing
+            bars are downloaded, by default the whole history is downloaded
+        interval : str, optional
+            Bar width, intraday bars ('1m', '5m') are always read from the provider,
+            by default '1d'
+        period : str, optional
+            History depth, by default '5y'
+        history : DataFrame, optional
+            Bars already loaded (e.g. from a snapshot), nothing is fetched
         """
         self.stockName = stockName
-        self.stockTicker = yf.Ticker(self.stockName.upper())
-        self.stockValue = self.stockTicker.history(period='5y',interval='1d',group_by='ticker') 
-        self.momentum   = []
-        self.momentumDerivative = []
-        self.MACD       = []
-        self.EMA20      = []
-        self.EMA50      = []
-        self.SMA200     = []
-        self.dateMaxs   = []
-        self.dateMins   = []
-        self.dateMaxsMACD=[]
-        self.dateMinsMACD=[]
+        self.provider = getProvider(lib)
+        self.interval = interval
+        if history is not None :
+            self.stockValue = history
+        elif (store is None) or (interval != '1d') :
+            with metrics.span('fetch') :
+                self.stockValue = self.provider.history(self.stockName, period=period, interval=interval)
+        else :
+            with metrics.span('fetch') :
+                self.stockValue = store.history(self.stockName)
+        for name in INDICATORS :
+            setattr(self, name, np.empty(0))
+        self.positions  = {name : np.empty(0, dtype=np.int64) for name in DATES}
+        self.trends     = pd.DataFrame()
         self.prophetForecast = pd.DataFrame()
         self.prophetForecast_m30 = pd.DataFrame()
         self.LSTM_days  = []
         self.LSTM_forecast=[]
-        self.figHandler = []
-        
+        self.version    = None
+        self.snapshot   = None
+        self.displayName= None
+        self._traces    = {}
+        self._guard     = threading.Lock()
+
+
+    @property
+    def stockValue(self) :
+        if self._frame is None :
+            self._frame = pd.DataFrame(self.bars, index=pd.DatetimeIndex(self.dates, name='Date'), columns=self.columns, copy=False)
+        return self._frame
+
+
+    @stockValue.setter
+    def stockValue(self, frame) :
+        # Exchange time is kept, plotly ignores time zones
+        index = frame.index
+        if isinstance(index, pd.DatetimeIndex) and (index.tz is not None) : index = index.tz_localize(None)
+        self.dates   = _dateArray(index)
+        self.bars    = frame.to_numpy(dtype=np.float64)
+        self.columns = list(frame.columns)
+        self._frame  = None
+
+
+    @property
+    def trends(self) :
+        """
+        Date, UpTrend and DownTrend labels of the days in a trend, see signals.minMaxTrend
+        """
+        if len(self.trendDays) == 0 : return pd.DataFrame(columns=['Date','UpTrend','DownTrend'])
+        return pd.DataFrame({
+            'Date'      : self.stockValue.index[self.trendDays],
+            'UpTrend'   : np.where(self.trendUp != '', self.trendUp.astype(object), np.nan),
+            'DownTrend' : np.where(self.trendDown != '', self.trendDown.astype(object), np.nan),
+        }, index=np.zeros(len(self.trendDays), dtype=np.int64))
+
+
+    @trends.setter
+    def trends(self, trends) :
+        if len(trends) == 0 :
+            self.trendDays = np.empty(0, dtype=np.int64)
+            self.trendUp = self.trendDown = np.empty(0, dtype='U1')
+            return
+        self.trendDays = _positions(self.stockValue.index.get_indexer(pd.DatetimeIndex(trends['Date'])))
+        self.trendUp   = trends['UpTrend'].fillna('').to_numpy(dtype=str)
+        self.trendDown = trends['DownTrend'].fillna('').to_numpy(dtype=str)
+
+
+    def offset(self, name) :
+        """
+        Position in dates of the first value of an indicator (e.g. 'EMA50'),
+        indicators are aligned to the last dates
+        """
+        return len(self.dates) - len(getattr(self, name))
+
+
+    def _indicatorDates(self, name) :
+        return self.stockValue.index[self.offset(name):]
+
+
+    def __copy__(self) :
+        stock = Stock.__new__(Stock)
+        for name in self.__slots__ :
+            setattr(stock, name, getattr(self, name))
+        stock.positions = dict(self.positions)
+        stock._traces   = dict(self._traces)
+        stock._guard    = threading.Lock()
+        return stock
+
+
+    def __getstate__(self) :
+        return {name : getattr(self, name) for name in self.__slots__ if name not in TRANSIENT}
+
+
+    def __setstate__(self, state) :
+        for name in self.__slots__ :
+            setattr(self, name, state.get(name))
+        self._traces = {}
+        self._guard  = threading.Lock()
+        if self.version is not None : self._readOnly()
+
 
     def updateGraphs(self,EMA20,EMA50,SMA200,Momentum,MACD,LSTM,Prophet) :
         """
-        Update the graphs embeded in figHandler with the class attributes queried
+        Build the figure with the class attributes queried.
+        The indicators are read from computeIndicators, so a computed Stock
+        can be shared across concurrent callbacks. Traces are built the first
+        time they are queried and reused afterwards, every trace has a
+        stable uid. Forecasts are only rendered once attached, see
+        setForecast and trainForecast, they are never trained here
 
         Parameters
         ----------
@@ -98,10 +287,15 @@ class Stock(object) :
             Trigger to render the attribute
         MACD : bool
             Trigger to render the attribute
-        ARIMA : bool
-            Trigger to render the attribute
+        LSTM : bool
+            Trigger to render the LSTM forecast, if attached
         Prophet : bool
-            Trigger to render the attribute
+            Trigger to render the Prophet forecast, if attached
+
+        Returns
+        -------
+        fig : Plotly figure handler
+            Figure rendering the attributes queried
         """
         if ((Momentum == True) or (MACD == True)) :
             fig = make_subplots(rows=3, cols=1, shared_xaxes=True, vertical_spacing=0.005, row_heights=[0.30, 0.25, 0.45], 
@@ -112,55 +306,54 @@ class Stock(object) :
             fig = make_subplots(rows=2, cols=1, shared_xaxes=True, vertical_spacing=0.005)
             scatterPlotRow= 2
         # OHLCPlot
-        fig.add_trace(
+        self._addTraces(fig, 'OHLC', lambda : [
             go.Ohlc(
                 x=self.stockValue['Close'].index,
                 open=self.stockValue['Open'].array,
                 high=self.stockValue['High'].array,
                 low=self.stockValue['Low'].array,
                 close=self.stockValue['Close'].array,
-                name=self.stockName),
-            row=1, col=1)
+                name=self.stockName,
+                uid='OHLC')],
+            row=1)
 
 
         # Plot the Momentum & Volume
         if ((Momentum == True) or (MACD == True)) :
-            df = pd.DataFrame({'mom' : self.momentum, 'date' : self.stockValue['Close'].index[len(self.stockValue['Close'].array)-len(self.momentum):]})
-            dMom = pd.DataFrame({'mom' : self.momentumDerivative, 'date' : self.stockValue['Close'].index[len(self.stockValue['Close'].array)-len(self.momentumDerivative):]})
-            
             # Volume on secondary axis
-            fig.add_trace(
+            self._addTraces(fig, 'Volume', lambda : [
                 go.Bar(
                     x=self.stockValue['Close'].index,
                     y=self.stockValue['Volume'].values /max(self.stockValue['Volume']),
                     marker_color='black',
                     name='Volume',
+                    uid='Volume',
                     opacity=0.45,
-                ),row=2, col=1,
-                secondary_y=True)
+                )],
+                row=2, secondary_y=True)
             fig['layout']['yaxis3'].update(range=[-0.6, 0.6])
             
             if Momentum == True :
                 # Momentum
-                fig.add_trace(
+                self._addTraces(fig, 'Momentum', lambda : [
                     go.Scatter(
-                        x=df['date'],
-                        y=df['mom'],
+                        x=self._indicatorDates('momentum'),
+                        y=self.momentum,
                         marker=dict(
                             color='black',
                             size=1,
                             autocolorscale=True
                         ),
                         name='Momentum',
-                    ),row=2, col=1,
-                secondary_y=False)
+                        uid='Momentum',
+                    )],
+                    row=2, secondary_y=False)
 
             if MACD == True :
                 # MACD
-                self.MACD = self.computeMACD()
-                fig.add_trace(
+                self._addTraces(fig, 'MACD', lambda : [
                     go.Scatter(
-                        x=self.stockValue['Close'][-len(self.MACD):].index,
+                        x=self._indicatorDates('MACD'),
                         y=self.MACD,
                         marker=dict(
                             color='#00BFFF',
@@ -168,118 +361,94 @@ class Stock(object) :
                             autocolorscale=True
                         ),
                         name='MACD',
-                    ),row=2, col=1,
-                secondary_y=False)
+                        uid='MACD',
+                    )],
+                    row=2, secondary_y=False)
                 # Overlap Maximum and Minimum of MACD
-                dfMACD = pd.Series(data=self.MACD, index=self.stockValue['Close'].index[len(self.stockValue['Close'].array)-len(self.MACD):])
-                self.dateMaxsMACD, self.dateMinsMACD = computeMinMax(dfMACD,length=200, tollerance=4.0)
-                fig.add_trace(
+                offset = self.offset('MACD')
+                self._addTraces(fig, 'MACDExtrema', lambda : [
                     go.Scatter(
                         mode="markers",
                         x=self.dateMaxsMACD,
-                        y=dfMACD[self.dateMaxsMACD].array, 
+                        y=self.MACD[self.positions['dateMaxsMACD'] - offset],
                         marker_symbol=6, marker_color='#00CC96', marker_line_width=2,
                         showlegend=False,
-                        name='MAX'),
-                    row=2, col=1)
-                fig.add_trace(
+                        name='MAX',
+                        uid='MAX_MACD'),
                     go.Scatter(
                         mode="markers",
                         x=self.dateMinsMACD,
-                        y=dfMACD[self.dateMinsMACD].array, 
+                        y=self.MACD[self.positions['dateMinsMACD'] - offset],
                         marker_symbol=5, marker_color='rgb(251,180,174)', marker_line_width=1,
                         showlegend=False,
-                        name='MIN'),
-                    row=2, col=1)
+                        name='MIN',
+                        uid='MIN_MACD')],
+                    row=2)
             
 
         # Bottom plot
         # ScatterPlot of closing values
-        fig.add_trace(
+        self._addTraces(fig, 'Close', lambda : [
             go.Scatter(
                 x=self.stockValue['Close'].index,
                 y=self.stockValue['Close'].array, 
                 marker_color='black',
-                name=self.stockName),
-            row=scatterPlotRow, col=1)
+                name=self.stockName,
+                uid='Close')],
+            row=scatterPlotRow)
 
         # Optional Moving Average Plots
-        trigger_20_50 = 0;  trigger_50_200 = 0  
         if SMA200 == True :
-            fig.add_trace(
+            self._addTraces(fig, 'SMA200', lambda : [
                 go.Scatter(
-                    x=self.stockValue['Close'][-len(self.SMA200):].index,
+                    x=self._indicatorDates('SMA200'),
                     y=self.SMA200,
                     marker_color='#FF1493',
                     name='SMA200',
-                ),
-            row=scatterPlotRow, col=1)
-            trigger_50_200 += 0.5
+                    uid='SMA200',
+                )],
+                row=scatterPlotRow)
 
         if EMA50 == True :
-            fig.add_trace(
+            self._addTraces(fig, 'EMA50', lambda : [
                 go.Scatter(
-                    x=self.stockValue['Close'][-len(self.EMA50):].index,
+                    x=self._indicatorDates('EMA50'),
                     y=self.EMA50,
                     marker_color='#9400D3',
                     name='EMA50',
-                ),
-            row=scatterPlotRow, col=1)
-            trigger_20_50 += 0.5;   trigger_50_200 += 0.5
+                    uid='EMA50',
+                )],
+                row=scatterPlotRow)
         
         if EMA20 == True :
-            fig.add_trace(
+            self._addTraces(fig, 'EMA20', lambda : [
                 go.Scatter(
-                    x=self.stockValue['Close'][-len(self.EMA20):].index,
+                    x=self._indicatorDates('EMA20'),
                     y=self.EMA20,
                     marker_color='#4169E1',
                     name='EMA20',
-                ),
-            row=scatterPlotRow, col=1)
-            trigger_20_50 += 0.5
+                    uid='EMA20',
+                )],
+                row=scatterPlotRow)
 
         # Suggested In/Out based on EMAs
-        if trigger_20_50 == 1 :
-            enterDay_20_50, exitDay_20_50 = self.MA_buyLogic(self.EMA20, self.EMA50, self.stockValue['Close'][-len(self.EMA50):].index) 
-            fig.add_trace(
-                go.Scatter(
-                    x=enterDay_20_50,
-                    y=self.stockValue['Close'][enterDay_20_50],
-                    mode="markers",
-                    marker_color='blue',
-                    marker_symbol=108,
-                    name='Enter MA',
-                    marker_line_width=8
-                ),
-            row=scatterPlotRow, col=1)
-            fig.add_trace(
-                go.Scatter(
-                    x=exitDay_20_50,
-                    y=self.stockValue['Close'][exitDay_20_50],
-                    mode="markers",
-                    marker_color='#AF0038',
-                    marker_symbol=107,
-                    name='Exit MA',
-                    marker_line_width=8
-                ),
-            row=scatterPlotRow, col=1)
-        if trigger_50_200 == 1 :
-            enterDay_50_200, exitDay_50_200, upsDate_50_200, positiveDiffs_50_200 = self.MA_buyLogic(self.EMA50, self.SMA200, self.stockValue['Close'][-len(self.SMA200):].index) 
+        if (EMA20 == True) and (EMA50 == True) :
+            self._addTraces(fig, 'MA_20_50', self._MA_20_50_traces, row=scatterPlotRow)
         
         # Forecast
-        if LSTM == True :
-            if self.LSTM_forecast == [] : self.LSTM_days, self.LSTM_forecast = lstm(self, epochs=10, trainingSetDim=0.85)
+        if (LSTM == True) and self.hasForecast('lstm') :
             #forecasted, lowerConfidence, upperConfidence = AutoARIMA(self)
             # Line
-            fig.add_trace(
+            self._addTraces(fig, 'LSTM', lambda : [
                 go.Scatter(
                     mode="lines",
                     x=self.LSTM_days,
                     y=self.LSTM_forecast,
                     name='LSTM',
+                    uid='LSTM',
                     marker_color='lightcoral',
-                    marker_line_width=1),
-                row=scatterPlotRow, col=1)
+                    marker_line_width=1)],
+                row=scatterPlotRow)
             # # Upper threshold of confidence
             # fig.add_trace(
             #     go.Scatter(
@@ -302,100 +471,201 @@ class Stock(object) :
             #     row=scatterPlotRow, col=1)
 
         # Forecast
-        if Prophet == True :
-            if self.prophetForecast.empty : self.prophetForecast, self.prophetForecast_m30 = prophet(self)
-            days = self.prophetForecast.ds.dt.date.array
-            days_m30 = self.prophetForecast_m30.ds.dt.date.array
-            # Line of the prediction_m30
-            fig.add_trace(
-                go.Scatter(
-                    mode="lines",
-                    x=days_m30[-60:],
-                    y=np.exp(self.prophetForecast_m30.yhat[-60:]),
-                    name='Prophet t-30 Forecast',
-                    marker_color='lightcoral',
-                    marker_line_width=1),
-                row=scatterPlotRow, col=1)
-            # Line of the prediction
-            fig.add_trace(
-                go.Scatter(
-                    mode="lines",
-                    x=days[-45:],
-                    y=np.exp(self.prophetForecast.yhat)[-45:],
-                    name='Prophet Today Forecast',
-                    marker_color='#3283FE',
-                    marker_line_width=1),
-                row=scatterPlotRow, col=1)
-            # Upper threshold of confidence
-            fig.add_trace(
-                go.Scatter(
-                    mode=None,
-                    x=days[-60:],
-                    y=np.exp(self.prophetForecast.yhat_upper[-60:]),
-                    #fill=None,
-                    marker_color='lightblue',
-                    name=self.stockName+' Forecast'),
-                row=scatterPlotRow, col=1)
-            # Lower threshold of confidence
-            fig.add_trace(
-                go.Scatter(
-                    mode=None,
-                    x=days[-60:],
-                    y=np.exp(self.prophetForecast.yhat_lower[-60:]),
-                    #fill='tonexty',
-                    marker_color='lightblue',
-                    name=self.stockName+' Forecast'),
-                row=scatterPlotRow, col=1)
+        if (Prophet == True) and self.hasForecast('prophet') :
+            self._addTraces(fig, 'Prophet', self._prophetTraces, row=scatterPlotRow)
 
         # Overlap local Minimun and Maximum to the bottom plot
-        self.dateMaxs, self.dateMins = computeMinMax(self.stockValue['Close'])
-        fig.add_trace(
+        self._addTraces(fig, 'Extrema', lambda : [
            go.Scatter(
                mode="markers",
                x=self.dateMaxs,
-               y=self.stockValue['Close'][self.dateMaxs].array, 
+               y=self.bars[self.positions['dateMaxs'], self.columns.index('Close')],
                marker_symbol=6, marker_color='#00CC96', marker_line_width=2,
                showlegend=False,
-               name='MAX'),
-            row=scatterPlotRow, col=1)
-        fig.add_trace(
+               name='MAX',
+               uid='MAX'),
            go.Scatter(
                mode="markers",
                x=self.dateMins,
-               y=self.stockValue['Close'][self.dateMins].array, 
+               y=self.bars[self.positions['dateMins'], self.columns.index('Close')],
                marker_symbol=5, marker_color='rgb(251,180,174)', marker_line_width=1,
                showlegend=False,
-               name='MIN'),
-           row=scatterPlotRow, col=1)
+               name='MIN',
+               uid='MIN')],
+            row=scatterPlotRow)
         # Plot shadowed areas based on trends TODO
-        trends, enterDaysTrend, exitDaysTrend = self.minMaxTrend_buylogic(windowSize=6)
+        self._addTraces(fig, 'Trends', self._trendTraces, row=scatterPlotRow)
+
+
+        # Finishing touches
+        return self.layout_update(fig)
+    
+
+    def _addTraces(self, fig, group, build, row, secondary_y=None) :
+        """
+        Add a group of traces to the figure. Traces only depend on the
+        indicators, which never change, so each group is built once per Stock
+        and then reused by every figure. Cached stocks are rendered by many
+        request threads, a group is built by one of them
+        """
+        traces = self._traces.get(group)
+        if traces is None :
+            with self._guard :
+                traces = self._traces.get(group)
+                if traces is None : traces = self._traces[group] = build()
+        for trace in traces :
+            fig.add_trace(trace, row=row, col=1, secondary_y=secondary_y)
+
+
+    def _MA_20_50_traces(self) :
+        close = self.stockValue['Close']
+        enterDay_20_50, exitDay_20_50 = self.positions['enterDaysMA'], self.positions['exitDaysMA']
+        return [
+            go.Scatter(
+                x=close.index[enterDay_20_50],
+                y=close.iloc[enterDay_20_50],
+                mode="markers",
+                marker_color='blue',
+                marker_symbol=108,
+                name='Enter MA',
+                uid='EnterMA',
+                marker_line_width=8
+            ),
+            go.Scatter(
+                x=close.index[exitDay_20_50],
+                y=close.iloc[exitDay_20_50],
+                mode="markers",
+                marker_color='#AF0038',
+                marker_symbol=107,
+                name='Exit MA',
+                uid='ExitMA',
+                marker_line_width=8
+            )]
+
+
+    def _prophetTraces(self) :
+        days = self.prophetForecast.ds.dt.date.array
+        days_m30 = self.prophetForecast_m30.ds.dt.date.array
+        return [
+            # Line of the prediction_m30
+            go.Scatter(
+                mode="lines",
+                x=days_m30[-60:],
+                y=np.exp(self.prophetForecast_m30.yhat[-60:]),
+                name='Prophet t-30 Forecast',
+                uid='ProphetM30',
+                marker_color='lightcoral',
+                marker_line_width=1),
+            # Line of the prediction
+            go.Scatter(
+                mode="lines",
+                x=days[-45:],
+                y=np.exp(self.prophetForecast.yhat)[-45:],
+                name='Prophet Today Forecast',
+                uid='Prophet',
+                marker_color='#3283FE',
+                marker_line_width=1),
+            # Upper threshold of confidence
+            go.Scatter(
+                mode=None,
+                x=days[-60:],
+                y=np.exp(self.prophetForecast.yhat_upper[-60:]),
+                #fill=None,
+                marker_color='lightblue',
+                name=self.stockName+' Forecast',
+                uid='ProphetUpper'),
+            # Lower threshold of confidence
+            go.Scatter(
+                mode=None,
+                x=days[-60:],
+                y=np.exp(self.prophetForecast.yhat_lower[-60:]),
+                #fill='tonexty',
+                marker_color='lightblue',
+                name=self.stockName+' Forecast',
+                uid='ProphetLower')]
+
+
+    def _trendTraces(self) :
+        trends = self.trends
+        traces = []
         labels = trends['UpTrend'].dropna().unique().tolist()
         for label in labels :
-            fig.add_trace(
+            traces.append(
                     go.Scatter(
                         x=trends[trends['UpTrend'] == label]['Date'],
                         y=self.stockValue['Close'][trends[trends['UpTrend'] == label]['Date']],
                         mode="lines",
                         marker_color='green',
                         name='Positive Trend',
-                    ),
-                row=scatterPlotRow, col=1)
+                        uid='UpTrend'+label,
+                    ))
         labels = trends['DownTrend'].dropna().unique().tolist()
         for label in labels :
-            fig.add_trace(
+            traces.append(
                     go.Scatter(
                         x=trends[trends['DownTrend'] == label]['Date'],
                         y=self.stockValue['Close'][trends[trends['DownTrend'] == label]['Date']],
                         mode="lines",
                         marker_color='orange',
                         name='Negative Trend',    
-                    ),
-                row=scatterPlotRow, col=1)
+                        uid='DownTrend'+label,
+                    ))
+        return traces
 
 
-        # Finishing touches
-        self.figHandler = self.layout_update(fig)
-    
+    def setForecast(self, kind, forecast) :
+        """
+        Attach a forecast trained outside of updateGraphs (see jobs.JobQueue).
+        Cached stocks are shared, the forecast is set on a copy of them
+
+        Parameters
+        ----------
+        kind : str
+            'lstm' or 'prophet'
+        forecast : tuple
+            Value returned by forecast.lstm or forecast.prophet
+        """
+        if kind == 'lstm' : self.LSTM_days, self.LSTM_forecast = forecast
+        if kind == 'prophet' : self.prophetForecast, self.prophetForecast_m30 = forecast
+
+
+    def trainForecast(self, kind) :
+        """
+        Train a forecast in process, the dashboard trains them in the
+        background instead (see jobs.JobQueue)
+
+        Parameters
+        ----------
+        kind : str
+            'lstm' or 'prophet'
+
+        Returns
+        -------
+        Stock
+            Copy of the stock with the forecast attached, this one is left
+            unchanged since computed stocks are shared
+        """
+        with metrics.span('forecast') :
+            if kind == 'lstm' : forecast = backend('forecast').lstm(self, epochs=10, trainingSetDim=0.85)
+            if kind == 'prophet' : forecast = backend('forecast').prophet(self)
+        stock = copy.copy(self)
+        stock.setForecast(kind, forecast)
+        return stock
+
+
+    def hasForecast(self, kind) :
+        if kind == 'lstm' : return len(self.LSTM_forecast) > 0
+        if kind == 'prophet' : return self.prophetForecast.empty is False
+
+
+    def shortName(self) :
+        """
+        Human readable name of the stock, as given by the provider
+        (or stored with the snapshot the stock was loaded from)
+        """
+        if self.displayName is not None : return self.displayName
+        return self.provider.shortName(self.stockName)
+
 
     def layout_update(self, fig) :
         """
@@ -416,16 +686,156 @@ class Stock(object) :
                 showlegend=False,
                 height=700,
                 margin=dict(l=80, r=80, t=20, b=10),
+                # Keep the zoom when the figure of the same stock is sent again
+                uirevision=self.stockName + self.interval,
             )
-        fig.update_xaxes(
-            rangebreaks=[
+        rangebreaks = [
                 dict(bounds=["sat", "mon"]), #hide weekends
                 #dict(values=["2015-12-25", "2016-01-01"])  # hide Christmas and New Year's
             ]
-        )
+        if self.interval != '1d' :
+            rangebreaks.append(dict(bounds=[16, 9.5], pattern="hour"))  #hide closed market hours
+        fig.update_xaxes(rangebreaks=rangebreaks)
         return fig
 
 
+    def streamPoints(self, since) :
+        """
+        Points of the traces built by updateGraphs from since on, keyed by
+        trace uid (see STREAMED). Used to extend a rendered figure in place;
+        the point at since is sent again, since that bar may have been
+        partial. The streamed traces must be rendered whole, not downsampled.
+        The extrema, trend and EMA crossing traces are not streamed, a tick
+        leaves them as rendered until the figure is built again
+
+        Parameters
+        ----------
+        since : Timestamp
+            Last date already rendered
+
+        Returns
+        -------
+        dict
+            uid -> {attribute : list of values}, empty when there is nothing to send
+        """
+        index = self.stockValue.index
+        start = int(index.searchsorted(pd.Timestamp(since), side='left'))
+        if start >= len(index) : return {}
+
+        def tail(values) :
+            offset = len(index) - len(values)
+            first = max(start, offset)
+            return {'x' : [d.isoformat() for d in index[first:]], 'y' : np.asarray(values[first-offset:], dtype=float).tolist()}
+
+        points = {'OHLC' : {
+            'x'     : [d.isoformat() for d in index[start:]],
+            'open'  : self.stockValue['Open'].iloc[start:].tolist(),
+            'high'  : self.stockValue['High'].iloc[start:].tolist(),
+            'low'   : self.stockValue['Low'].iloc[start:].tolist(),
+            'close' : self.stockValue['Close'].iloc[start:].tolist(),
+        }}
+        points['Close'] = tail(self.stockValue['Close'].array)
+        for uid in ['Momentum', 'MACD', 'EMA20', 'EMA50', 'SMA200'] :
+            points[uid] = tail(getattr(self, uid.lower() if uid == 'Momentum' else uid))
+        return points
+
+
+    def computeIndicators(self) :
+        """
+        Compute Momentum, EMA20, EMA50, SMA200, MACD, the local
+        Minimum and Maximum of both closing values and MACD and the trends.
+        Indicator arrays are then marked read-only
+        """
+        with metrics.span('indicators') :
+            close = self.stockValue['Close'].array
+            self.closeSum = indicators.cumulativeSum(close)
+            self.computeMomentum()
+            self.EMA20  = self.computeMA(nDays=20, kind='exp')
+            self.EMA50  = self.computeMA(nDays=50, kind='exp')
+            self.SMA200 = indicators.computeSMA(close, 200, csum=self.closeSum)
+            self.MACD   = indicators.computeMACD(close, csum=self.closeSum)
+            self.computeExtrema()
+            self._freeze()
+
+
+    def computeExtrema(self) :
+        """
+        Compute the local Minimum and Maximum of closing values and MACD, the
+        trends based on them and the EMA20/EMA50 signals. The extrema and the
+        trends only look at a trailing window, so their cost does not depend
+        on the length of the history
+        """
+        with metrics.span('computeMinMax') :
+            maxs, mins = extremaPositions(self.MACD, length=200, tollerance=4.0)
+            self.positions['dateMaxsMACD'] = maxs + self.offset('MACD')
+            self.positions['dateMinsMACD'] = mins + self.offset('MACD')
+            self.positions['dateMaxs'], self.positions['dateMins'] = extremaPositions(self.bars[:, self.columns.index('Close')])
+        with metrics.span('minMaxTrend') :
+            self.trends, self.enterDaysTrend, self.exitDaysTrend = self.minMaxTrend_buylogic(windowSize=6)
+        # Only the EMA20/EMA50 crossings are plotted. The EMA50/SMA200 call of the old
+        # updateGraphs unpacked four values out of two and was never rendered
+        # Positions are passed as the dates, so the days come back as positions
+        enterDays, exitDays = self.MA_buyLogic(self.EMA20, self.EMA50, np.arange(self.offset('EMA50'), len(self.dates)))
+        self.positions['enterDaysMA'], self.positions['exitDaysMA'] = _positions(enterDays), _positions(exitDays)
+
+
+    def _readOnly(self) :
+        arrays = [self.dates, self.bars, self.trendDays, self.trendUp, self.trendDown] + [getattr(self, name) for name in INDICATORS]
+        for array in arrays + list(self.positions.values()) :
+            array.setflags(write=False)
+
+
+    def _freeze(self) :
+        self._readOnly()
+        # Identifies the data the indicators were computed on
+        close = self.stockValue['Close']
+        self.version = '%s-%d-%r' % (close.index[-1].isoformat() if len(close) else '', len(close), float(close.iloc[-1]) if len(close) else 0.0)
+        self._traces = {}
+
+
+    def extend(self, bars) :
+        """
+        Stock updated with new bars. Momentum, moving averages and MACD are
+        updated from the previous values, so the cost depends on the number of
+        new bars and not on the history length. The result is the same as a
+        full computeIndicators over the updated history
+
+        Parameters
+        ----------
+        bars : DataFrame
+            New bars indexed by date. Bars at or after the first date of bars
+            replace the stored ones (e.g. the partial bar of today)
+
+        Returns
+        -------
+        Stock
+            New Stock object, this one is left unchanged
+        """
+        if bars.empty : return self
+        if bars.index.tz is not None : bars = bars.tz_localize(None)
+        stock = copy.copy(self)
+        stock.snapshot = None
+        first = int(self.stockValue.index.searchsorted(bars.index[0]))
+        stock.stockValue = pd.concat([self.stockValue.iloc[:first], bars.reindex(columns=self.stockValue.columns, fill_value=0)])
+        close = stock.stockValue['Close'].array
+        stock.closeSum = indicators.extendCumulativeSum(self.closeSum, close, first)
+        stock.momentum = indicators.extendMomentum(self.momentum, close, 14, first)
+        keep = max(min(first-14, len(self.momentum)) - 1, 0)
+        stock.momentumDerivative = np.concatenate([self.momentumDerivative[:keep], finiteDifference.derivative(stock.momentum[keep:], schema='upwind', order='first')])
+        stock.EMA20  = indicators.extendEMA(self.EMA20, close, 20, first)
+        stock.EMA50  = indicators.extendEMA(self.EMA50, close, 50, first)
+        stock.SMA200 = indicators.extendSMA(self.SMA200, stock.closeSum, 200, first)
+        stock.MACD   = indicators.extendMACD(self.MACD, stock.closeSum, [3,10], first)
+        stock.computeExtrema()
+        stock._freeze()
+        # Forecasts are bound to the old history
+        stock.prophetForecast = pd.DataFrame()
+        stock.prophetForecast_m30 = pd.DataFrame()
+        stock.LSTM_days  = []
+        stock.LSTM_forecast=[]
+        return stock
+
+
     def computeMomentum(self,nDays=14) :
         """
         Compute Momentum (Rate of Change) and its derivative
@@ -435,11 +845,8 @@ class Stock(object) :
         nDays : int, optional
             Days used to compute the momentum, by default 14
         """
-        Mom = []
-        for days in range(nDays,len(self.stockValue['Close'].array)) :
-            Mom.append(100*(self.stockValue['Close'].array[days] - self.stockValue['Close'].array[days-nDays])/self.stockValue['Close'].array[days-nDays])
-        self.momentum = Mom
-        self.momentumDerivative = derivative(self.momentum, schema='upwind', order='first')
+        self.momentum = indicators.computeMomentum(self.stockValue['Close'].array, nDays)
+        self.momentumDerivative = finiteDifference.derivative(self.momentum, schema='upwind', order='first')
 
 
     def computeMA(self,nDays=20,kind='simple',limiter=None) :
@@ -458,79 +865,18 @@ class Stock(object) :
 
         Returns
         -------
-        list
+        np.array
             Simple/Exponential Moving average of the last nDays
         """
-        # Number of backward steps
-        if limiter != None : limit = min(len(self.stockValue['Close'])-nDays,limiter)     
-        else : limit = len(self.stockValue['Close'])-nDays
-
-        if kind == 'simple' :
-            SMA = []
-            for i in range(limit) :
-                SMA.append((1/nDays)*sum(self.stockValue['Close'].array[np.arange(-i-nDays,-i)]))
-            SMA.reverse()
-            return SMA
-        if kind == 'exp' :
-            EMA = [(1/nDays)*sum(self.stockValue['Close'].array[-limit:-limit+nDays])]
-            K = 2/(nDays+1)
-            for i in range(1,limit) :
-                EMA.append(K* (self.stockValue['Close'].array[-limit-nDays+i] - EMA[i-1]) + EMA[i-1])
-            return EMA
+        return indicators.computeMA(self.stockValue['Close'].array, nDays, kind, limiter)
 
 
     def computeMACD(self,nDays=[3,10]) :
-        shortTerm = self.computeMA(nDays=nDays[0])
-        longTerm = self.computeMA(nDays=nDays[1])
-        MACD = []
-        for i in range(len(longTerm)) :
-            MACD.append(shortTerm[i] - longTerm[i])
-        return MACD
+        return indicators.computeMACD(self.stockValue['Close'].array, nDays)
 
 
     def minMaxTrend_buylogic(self, daysToSubtract=180, windowSize=3) :
-        trend = []
-        # At each iteration compare the value with last Min and Max 
-        daysToSubtract = min(daysToSubtract, len(self.stockValue['Close']))
-        for i in range(daysToSubtract) :
-            lastMin = nearest_yesterday(self.dateMins, self.stockValue.iloc[-daysToSubtract+i].name)
-            lastMax = nearest_yesterday(self.dateMaxs, self.stockValue.iloc[-daysToSubtract+i].name)
-            if (lastMax == []) or (lastMin == []) : continue
-            if self.stockValue['Close'][-daysToSubtract+i] > self.stockValue['Close'][lastMax] :
-                trend.append((self.stockValue.iloc[-daysToSubtract+i].name,1))
-            elif self.stockValue['Close'][-daysToSubtract+i] < self.stockValue['Close'][lastMin] :
-                trend.append((self.stockValue.iloc[-daysToSubtract+i].name,-1))
-            else :
-                trend.append((self.stockValue.iloc[-daysToSubtract+i].name,0))
-
-
-        # Count trends in a window
-        weightedTrend = pd.DataFrame(columns=['Date','UpTrend','DownTrend'])
-        labelN = 1
-        label = ColNum2ColName(labelN)
-        for i in range(windowSize, len(trend)) :
-            # If at least 70% of points says it is a positive trend append as positive
-            if [x[1] for x in trend[i-windowSize:i]].count(1) >= int(0.6*windowSize) : 
-                toAppend = pd.DataFrame.from_dict({'Date':[trend[i][0]], 'UpTrend':[label]})
-                weightedTrend = weightedTrend.append(toAppend)
-            # Otherwise if 70% of points says it is a negative trend then append as negative
-            elif [x[1] for x in trend[i-windowSize:i]].count(-1) >= int(0.6*windowSize) : 
-                toAppend = pd.DataFrame.from_dict({'Date':[trend[i][0]], 'DownTrend':[label]})
-                weightedTrend = weightedTrend.append(toAppend)
-            # Else skip
-            else :
-                labelN +=1
-                label = ColNum2ColName(labelN)
-        labels = weightedTrend['UpTrend'].dropna().unique().tolist()
-        enterDays = [];     exitDays = []
-        for label in labels :
-            if len(weightedTrend[weightedTrend['UpTrend'] == label]) < 4 : continue
-            enterDays.append(weightedTrend[weightedTrend['UpTrend'] == label]['Date'].iloc[0])
-            exitDays.append(weightedTrend[weightedTrend['UpTrend'] == label]['Date'].iloc[-1])
-        return weightedTrend, enterDays, exitDays
-
-
-
+        return signals.minMaxTrend(self.stockValue['Close'], self.dateMaxs, self.dateMins, daysToSubtract, windowSize)
 
 
     def minMaxTrend_buylogic_dLogic(self, daysToSubtract=180, windowSize=4) :
@@ -539,10 +885,9 @@ class Stock(object) :
         pass
 
 
-
     def minMaxTrend_buylogic_benchmark(self,daysToSubtract=180) :
         resizedDf = self.stockValue.iloc[-daysToSubtract:]
-        trends = identify_df_trends(df=resizedDf, column='Close')
+        trends = backend('trendet').identify_df_trends(df=resizedDf, column='Close')
         trends.reset_index(inplace=True)
         labels = trends['Up Trend'].dropna().unique().tolist()
         enterDays = [];     exitDays = []
@@ -556,8 +901,8 @@ class Stock(object) :
         maxValues = dfMACD[self.dateMaxsMACD].array
         minValues = dfMACD[self.dateMinsMACD].array
         
-        dmaxValues = derivative(maxValues, schema='upwind', order='first') 
-        dminValues = derivative(minValues, schema='upwind', order='first') 
+        dmaxValues = finiteDifference.derivative(maxValues, schema='upwind', order='first')
+        dminValues = finiteDifference.derivative(minValues, schema='upwind', order='first')
 
 
     def MA_buyLogic(self, first, second, timeHistory) :
@@ -586,46 +931,26 @@ class Stock(object) :
         positiveDiffs
             List of values of the positive deltas
         """        
-        # Delta first vs second positive => ascending trend
-        zipped = zip(first, second[-len(first):])
-        difference = [];    comp = []
-        # Compute difference between two indexees
-        for i, j in zipped :
-            difference.append(i-j) 
-        # Of the difference takes only the positive indexes
-        for i in difference :
-            comp.append(i>0)
-
-        # Create label list to define segments
-        labelNumber = 1;    label = ColNum2ColName(labelNumber)
-        labelArray = [label]
-        for i in range(1,len(comp)):
-            if comp[i] == comp[i-1] : 
-                labelArray.append(label)
-            else : 
-                labelNumber += 1
-                label = ColNum2ColName(labelNumber)
-                labelArray.append(label)
-
-        enterDay = [];  exitDay = []
-        df = pd.DataFrame(data = list(zip(difference, timeHistory, comp, labelArray)), columns= ['difference', 'day', 'flagPositivity', 'label'])
-        for l in labelArray :
-            tempDf = df[
-                (df['flagPositivity'] == 1) &
-                (df['label'] == l)
-            ]
-            if not tempDf.empty :
-                enterDay.append(tempDf['day'].iloc[0])
-                exitDay.append(tempDf['day'].iloc[-1])
-        
+        # Delta first vs second positive => ascending trend, paired by position as zip does
+        second = np.asarray(second)[-len(first):]
+        length = min(len(first), len(second))
+        difference = np.asarray(first[:length], dtype=np.float64) - second[:length]
+        comp = difference > 0
+        if length == 0 : return [], []
+
+        # Segments of consecutive days with the same sign
+        starts = np.flatnonzero(np.r_[True, comp[1:] != comp[:-1]])
+        ends = np.r_[starts[1:], length]
+        # Positive segments give their first and last day, once per day of the segment
+        days = min(length, len(timeHistory))
+        keep = comp[starts] & (starts < days)
+        starts, ends = starts[keep], ends[keep]
+        enterDay = list(timeHistory[starts].repeat(ends - starts))
+        exitDay = list(timeHistory[np.minimum(ends, days) - 1].repeat(ends - starts))
         return enterDay, exitDay
 
 
     def computePercentualGain(self,start,end) : 
-        array = self.stockValue.loc[start:end]['Close'].array
-        yesterday_perc = 1
-        for day in range(len(array)-1):
-            today_perc = 1 + (array[day+1] - array[day])/array[day]
-            today_perc*=yesterday_perc
-            yesterday_perc=today_perc
-        return today_perc
\ No newline at end of file
+        array = self.stockValue.loc[start:end]['Close'].to_numpy()
+        # Daily gains compounded from start to end
+        return np.prod(1 + (array[1:] - array[:-1])/array[:-1])
\ No newline at end of file
@@ -0,0 +1,295 @@
+import os
+import itertools
+import multiprocessing
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from . import indicators
+from .backtest import backtest, crossoverPositions, positionsFromDays
+from .signals import minMaxTrend
+from .extrema import extremaMask
+
+
+# Parameters of each strategy, the values hard-coded in Stock are included
+SWEEP_GRID = {
+    'ema'      : {'fast' : [10, 20, 30], 'slow' : [50, 100, 200]},
+    'sma'      : {'nDays' : [50, 100, 200]},
+    'macd'     : {'short' : [3, 5, 8], 'long' : [10, 20, 30]},
+    'momentum' : {'nDays' : [7, 14, 28]},
+    'trend'    : {'tollerance' : [1.0, 1.5, 3.0], 'windowSize' : [3, 6, 9]},
+}
+
+# Statistics of backtest.backtest written for every ticker and parameter set
+METRICS = ['totalReturn', 'maxDrawdown', 'trades', 'hitRate', 'turnover']
+
+# Closing values (dates x tickers x parameter sets) below which the grid is
+# evaluated in the calling process: the backtests are vectorized and a few
+# million values take about a second, less than starting the spawned workers
+PARALLEL_MIN_VALUES = 50000000
+
+
+def _valid(strategy, params) :
+    if strategy == 'ema' : return params['fast'] < params['slow']
+    if strategy == 'macd' : return params['short'] < params['long']
+    return True
+
+
+def sweepCombinations(grid) :
+    """
+    Parameter sets of a grid
+
+    Parameters
+    ----------
+    grid : dict
+        strategy -> {parameter -> list of values}, see SWEEP_GRID
+
+    Returns
+    -------
+    list
+        (strategy, params) pairs, sets where the fast window is not shorter
+        than the slow one are skipped
+    """
+    combinations = []
+    for strategy, params in grid.items() :
+        names = list(params)
+        for values in itertools.product(*[params[name] for name in names]) :
+            params = dict(zip(names, values))
+            if _valid(strategy, params) : combinations.append((strategy, params))
+    return combinations
+
+
+# Class Definitions
+class Sweep(object) :
+    """Backtests of the buy logics over a grid of indicator parameters
+
+    The intermediates are computed once per universe and shared by every
+    parameter set: the cumulative sum behind all the simple averages and
+    MACDs, each EMA window and each extrema tolerance.
+
+    Attributes
+    ----------
+    closes : DataFrame
+        Closing values, one row per date and one column per ticker, see Universe
+    cost : float
+        Cost per unit of position change, see backtest.backtest
+
+    Methods
+    -------
+    positions(strategy,params)
+        Positions of a parameter set, dates x tickers
+
+    evaluate(strategy,combinations)
+        Statistics of many parameter sets of a strategy, one row per ticker and set
+    """
+
+    def __init__(self, closes, cost=0.0) :
+        self.closes = closes
+        self.cost   = cost
+        self.close  = closes.to_numpy(dtype=np.float64)
+        self.csum   = indicators.cumulativeSum(self.close)
+        self._ema      = {}
+        self._extrema  = {}
+
+
+    def ema(self, nDays) :
+        if nDays not in self._ema : self._ema[nDays] = indicators.computeEMA(self.close, nDays)
+        return self._ema[nDays]
+
+
+    def extrema(self, tollerance) :
+        # Dates of the maxima and minima of every ticker
+        if tollerance not in self._extrema :
+            maxima, minima = extremaMask(self.close, tollerance=tollerance)
+            dates = self.closes.index
+            self._extrema[tollerance] = [(list(dates[maxima[:, i]]), list(dates[minima[:, i]])) for i in range(self.close.shape[1])]
+        return self._extrema[tollerance]
+
+
+    def positions(self, strategy, params) :
+        """
+        Positions held by a buy logic
+
+        Parameters
+        ----------
+        strategy : str
+            'ema' (fast EMA above the slow one), 'sma' (close above the SMA),
+            'macd' (positive MACD), 'momentum' (positive momentum) or 'trend'
+            (up trends of signals.minMaxTrend)
+        params : dict
+            Parameters of the strategy, see SWEEP_GRID
+
+        Returns
+        -------
+        np.array
+            Exposure of each date and ticker
+        """
+        length = len(self.close)
+        if strategy == 'ema' :
+            return crossoverPositions(self.ema(params['fast']), self.ema(params['slow']), length)
+        if strategy == 'sma' :
+            return crossoverPositions(self.close, indicators.computeSMA(self.close, params['nDays'], csum=self.csum), length)
+        if strategy == 'macd' :
+            MACD = indicators.computeMACD(self.close, [params['short'], params['long']], csum=self.csum)
+            return crossoverPositions(MACD, np.zeros_like(MACD), length)
+        if strategy == 'momentum' :
+            momentum = indicators.computeMomentum(self.close, params['nDays'])
+            return crossoverPositions(momentum, np.zeros_like(momentum), length)
+        if strategy == 'trend' :
+            positions = np.zeros(self.close.shape)
+            for i, (dateMaxs, dateMins) in enumerate(self.extrema(params['tollerance'])) :
+                close = self.closes.iloc[:, i]
+                _, enterDays, exitDays = minMaxTrend(close, dateMaxs, dateMins, windowSize=params['windowSize'])
+                positions[:, i] = positionsFromDays(close.index, enterDays, exitDays)
+            return positions
+        raise ValueError('Unknown strategy %s' % strategy)
+
+
+    def evaluate(self, strategy, combinations) :
+        """
+        Backtest many parameter sets of a strategy at once
+
+        Parameters
+        ----------
+        strategy : str
+            Strategy of the parameter sets, see positions
+        combinations : list
+            Parameter sets (dicts)
+
+        Returns
+        -------
+        dict
+            Columns of the results: strategy, ticker, one per parameter and
+            one per metric (see METRICS), one row per parameter set and ticker
+        """
+        positions = np.stack([self.positions(strategy, params) for params in combinations], axis=-1)
+        stats = backtest(self.close, positions, cost=self.cost)
+        tickers = len(self.closes.columns)
+        columns = {
+            'strategy' : np.repeat(strategy, tickers*len(combinations)),
+            'ticker'   : np.tile(self.closes.columns.to_numpy(dtype=str), len(combinations)),
+        }
+        for name in combinations[0] :
+            columns[name] = np.repeat([float(params[name]) for params in combinations], tickers)
+        for metric in METRICS :
+            # tickers x sets -> one row per set and ticker
+            columns[metric] = np.asarray(stats[metric], dtype=np.float64).T.ravel()
+        return columns
+
+
+# The universe is sent once to each worker process, as plain arrays
+_sweep = None
+
+def _initWorker(values, dates, tickers, cost) :
+    global _sweep
+    _sweep = Sweep(pd.DataFrame(values, index=pd.DatetimeIndex(dates, name='Date'), columns=tickers), cost)
+
+
+def _evaluate(strategy, chunks) :
+    return [_sweep.evaluate(strategy, combinations) for combinations in chunks]
+
+
+def _tasks(combinations, chunkSize) :
+    # One task per strategy and first parameter, so a single worker computes
+    # the sets sharing the same intermediates. Its sets are backtested
+    # chunkSize at a time
+    tasks = []
+    for (strategy, first), group in itertools.groupby(combinations, key=lambda c : (c[0], list(c[1].values())[0])) :
+        group = [params for _, params in group]
+        tasks.append((strategy, [group[i:i+chunkSize] for i in range(0, len(group), chunkSize)]))
+    return tasks
+
+
+def _concat(results) :
+    names = []
+    for columns in results :
+        names += [name for name in columns if name not in names]
+    rows = [len(columns['ticker']) for columns in results]
+    merged = {}
+    for name in names :
+        parts = []
+        for columns, n in zip(results, rows) :
+            if name in columns : parts.append(columns[name])
+            else : parts.append(np.full(n, np.nan))
+        merged[name] = np.concatenate(parts) if parts else np.empty(0)
+    return merged
+
+
+def runSweep(closes, grid=SWEEP_GRID, path=None, workers=None, cost=0.0, chunkSize=16) :
+    """
+    Backtest every parameter set of a grid over a universe
+
+    Parameters
+    ----------
+    closes : DataFrame
+        Closing values, one row per date and one column per ticker, see Universe
+    grid : dict, optional
+        strategy -> {parameter -> list of values}, by default SWEEP_GRID
+    path : str, optional
+        .npz file where the result columns are written, by default they are not written
+    workers : int, optional
+        Number of worker processes, by default one per core and never more.
+        With 0 or 1, or when the grid holds less than PARALLEL_MIN_VALUES
+        closing values, it is evaluated in the calling process
+    cost : float, optional
+        Cost per unit of position change, by default 0.0
+    chunkSize : int, optional
+        Maximum number of parameter sets backtested together, by default 16
+
+    Returns
+    -------
+    DataFrame
+        One row per parameter set and ticker, parameters not used by a
+        strategy are NaN
+    """
+    combinations = sweepCombinations(grid)
+    tasks = _tasks(combinations, chunkSize)
+    cores = os.cpu_count() or 1
+    workers = min(cores if workers is None else workers, cores, len(tasks))
+    if (workers <= 1) or (closes.size*len(combinations) < PARALLEL_MIN_VALUES) :
+        sweep = Sweep(closes, cost)
+        results = [sweep.evaluate(strategy, combinations) for strategy, chunks in tasks for combinations in chunks]
+    else :
+        universe = (closes.to_numpy(dtype=np.float64), closes.index.to_numpy(), closes.columns.to_numpy(), cost)
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=_initWorker, initargs=universe) as executor :
+            results = [columns for task in executor.map(_evaluate, *zip(*tasks)) for columns in task]
+    columns = _concat(results)
+    if path is not None :
+        np.savez_compressed(path, **columns)
+    return pd.DataFrame(columns)
+
+
+def loadSweep(path) :
+    """
+    Results written by runSweep
+
+    Returns
+    -------
+    DataFrame
+        One row per parameter set and ticker
+    """
+    with np.load(path) as columns :
+        return pd.DataFrame({name : columns[name] for name in columns.files})
+
+
+def rankSweep(results, by='totalReturn', ascending=False) :
+    """
+    Parameter sets ranked by the average of a metric over the tickers
+
+    Parameters
+    ----------
+    results : DataFrame
+        Output of runSweep or loadSweep
+    by : str, optional
+        Metric ranked, see METRICS, by default 'totalReturn'
+    ascending : bool, optional
+        Rank from the lowest value, by default False
+
+    Returns
+    -------
+    DataFrame
+        Mean of every metric over the tickers, one row per parameter set
+    """
+    params = [name for name in results.columns if name not in ['ticker'] + METRICS]
+    ranked = results.groupby(params, dropna=False)[METRICS].mean()
+    return ranked.sort_values(by, ascending=ascending).reset_index()
@@ -0,0 +1,164 @@
+import numpy as np
+import pandas as pd
+from . import indicators, finiteDifference
+from .extrema import extremaMask
+from .providers import getProvider
+
+
+# Class Definitions
+class Universe(object) :
+    """Class designed to compute the indicators of many stocks at once
+
+    Attributes
+    ----------
+    closes : DataFrame
+        Closing values, one row per date and one column per ticker
+
+    Methods
+    -------
+    fromProvider(tickers,lib='yahoo',period='5y')
+        Build the universe from a market data provider
+
+    compute(momentumDays=14,emaDays=[20,50],smaDays=[200],macdDays=[3,10],minMaxLength=200,minMaxTollerance=None)
+        Compute every indicator column-wise over the close matrix
+
+    screen(panel=None)
+        Latest value of every indicator, one row per ticker
+    """
+
+    def __init__(self, closes) :
+        """
+        Universe Constructor
+
+        Parameters
+        ----------
+        closes : DataFrame
+            Closing values (dates x tickers). Interior gaps are forward filled
+            and the matrix is trimmed to the dates shared by all the tickers
+        """
+        closes = closes.ffill()
+        self.closes = closes.loc[closes.notna().all(axis=1).idxmax():] if not closes.empty else closes
+
+
+    @classmethod
+    def fromProvider(cls, tickers, lib='yahoo', period='5y') :
+        """
+        Load the history of all the tickers, with a single batched request
+        when the provider supports it
+
+        Parameters
+        ----------
+        tickers : list
+            Names of the stocks
+        lib : str or Provider, optional
+            Market data provider, see providers.getProvider, by default 'yahoo'
+        period : str, optional
+            History depth, by default '5y'
+
+        Returns
+        -------
+        Universe
+            Universe over the closing values
+        """
+        histories = getProvider(lib).historyMany(tickers, period=period, interval='1d')
+        return cls(pd.DataFrame({t.upper() : df['Close'] for t, df in histories.items() if not df.empty}))
+
+
+    def compute(self, momentumDays=14, emaDays=[20,50], smaDays=[200], macdDays=[3,10], minMaxLength=200, minMaxTollerance=None) :
+        """
+        Compute momentum and its derivative, moving averages, MACD and min/max
+        markers for every ticker
+
+        Parameters
+        ----------
+        momentumDays : int, optional
+            Days used to compute the momentum, by default 14
+        emaDays : list, optional
+            Windows of the exponential moving averages, by default [20,50]
+        smaDays : list, optional
+            Windows of the simple moving averages, by default [200]
+        macdDays : list, optional
+            Short and long windows of the MACD, by default [3,10]
+        minMaxLength : int, optional
+            Trailing window where min/max markers are searched, by default 200
+        minMaxTollerance : float, optional
+            Percentual tollerance of the min/max markers, as in utils.computeMinMax
+            (e.g. 1.5 as used by Stock), by default every local extremum is marked
+
+        Returns
+        -------
+        DataFrame
+            Indicators indexed by date, columns are (indicator, ticker).
+            Shorter series are aligned to the most recent dates and NaN padded
+        """
+        close = self.closes.to_numpy(dtype=np.float64)
+        series = {'Close' : close}
+        series['Momentum'] = indicators.computeMomentum(close, momentumDays)
+        series['MomentumDerivative'] = finiteDifference.derivative(series['Momentum'], schema='upwind', order='first')
+        for nDays in emaDays :
+            series['EMA'+str(nDays)] = indicators.computeEMA(close, nDays)
+        for nDays in smaDays :
+            series['SMA'+str(nDays)] = indicators.computeSMA(close, nDays)
+        series['MACD'] = indicators.computeMACD(close, macdDays)
+        if minMaxTollerance is None : series['Max'], series['Min'] = localExtrema(close, minMaxLength)
+        else : series['Max'], series['Min'] = extremaMask(close, minMaxLength, minMaxTollerance)
+
+        frames = {}
+        for name, values in series.items() :
+            frames[name] = pd.DataFrame(_padHead(values, close.shape[0]), index=self.closes.index, columns=self.closes.columns)
+        return pd.concat(frames, axis=1, names=['Indicator', 'Ticker'])
+
+
+    def screen(self, panel=None) :
+        """
+        Latest value of every indicator, ready to be ranked
+
+        Parameters
+        ----------
+        panel : DataFrame, optional
+            Output of compute(), by default it is computed with the default windows
+
+        Returns
+        -------
+        DataFrame
+            One row per ticker and one column per indicator
+        """
+        if panel is None : panel = self.compute()
+        return panel.iloc[-1].unstack(level='Indicator').infer_objects()
+
+
+def localExtrema(close, length=200) :
+    """
+    Flag local maxima and minima in the last length values of each column.
+    The last value is flagged following its last step, as in utils.computeMinMax
+
+    Parameters
+    ----------
+    close : np.array
+        Closing values, 1-D or 2-D (dates x tickers)
+    length : int, optional
+        Trailing window of computation, by default 200
+
+    Returns
+    -------
+    np.array
+        Boolean markers of the maxima
+    np.array
+        Boolean markers of the minima
+    """
+    close = np.asarray(close, dtype=np.float64)
+    maxima = np.zeros(close.shape, dtype=bool);     minima = np.zeros(close.shape, dtype=bool)
+    start = max(close.shape[0] - length, 1)
+    prev, curr, succ = close[start-1:-2], close[start:-1], close[start+1:]
+    maxima[start:-1] = (prev < curr) & (curr > succ)
+    minima[start:-1] = (prev > curr) & (curr < succ)
+    maxima[-1] = close[-2] < close[-1]
+    minima[-1] = close[-2] > close[-1]
+    return maxima, minima
+
+
+def _padHead(values, length) :
+    if values.shape[0] == length : return values
+    padded = np.full((length,) + values.shape[1:], np.nan)
+    padded[length-values.shape[0]:] = values
+    return padded
@@ -1,3 +1,7 @@
+from . import finiteDifference
+from .extrema import extremaDates
+
+
 # Derivative scheme
 def derivative(A, schema='upwind', order='first') :
     """
@@ -14,26 +18,11 @@ def derivative(A, schema='upwind', order='first') :
 
     Returns
     -------
-    array
-        Derivative of the array A
+    list
+        Derivative of the array A, see finiteDifference.derivative
     """    
-    dA = []
-    if schema == 'upwind' :
-        if order == 'first' : 
-            for i in range(1,len(A)) :
-                dA.append(A[i]-A[i-1])
-        if order == 'second' :
-            for i in range(2,len(A)) : 
-                dA.append((3*A[i] - 4*A[i-1] + A[i-2])*0.5)
-        if order == 'third' :
-            for i in range(3,len(A)) :
-                dA.append((11*A[i] - 18*A[i-1] + 9*A[i-2] - 2*A[i-3])/6)
-                
-    if schema == 'centered' :
-        if order == 'second' :
-            for i in range(1,len(A)-1) :
-                dA.append((A[i+1] - A[i-1])*0.5)
-    return dA
+    if (schema, order) not in finiteDifference.SCHEMES : return []
+    return list(finiteDifference.derivative(A, schema, order))
 
 
 def nearest(items, pivot):
@@ -84,8 +73,8 @@ def computeMinMax(arr,length=200, tollerance=1.5) :
 
     Parameters
     ----------
-    arr : list
-        f(x)
+    arr : Series
+        f(x) indexed by date
     length : int, optional
         Window length of computation, by default 200
     tollerance : float, optional
@@ -99,33 +88,8 @@ def computeMinMax(arr,length=200, tollerance=1.5) :
     list
         List of minima
     """        
-    maxima = [];    minima = []
-    # Compute for the last n values
-    length = len(arr) - length
-    for i in range(length,len(arr)-1) : 
-        if arr[i-1] < arr[i] > arr[i+1] :
-            if maxima == [] : maxima.append(arr.index[i]) 
-            if minima != [] :
-                if (((arr[maxima[-1]]+arr[maxima[-1]]*0.01*tollerance) >= arr[i]) \
-                    and (((arr[maxima[-1]]-arr[maxima[-1]]*0.01*tollerance) <= arr[i]))
-                    or
-                    ((arr[minima[-1]]+arr[minima[-1]]*0.01*tollerance) >= arr[i] ) \
-                    and ((arr[minima[-1]]-arr[minima[-1]]*0.01*tollerance <= arr[i]))): continue
-                maxima.append(arr.index[i]) 
-        if arr[i-1] > arr[i] < arr[i+1] :
-            if minima == [] : minima.append(arr.index[i]) 
-            if maxima != [] :
-                if (((arr[minima[-1]]+arr[minima[-1]]*0.01*tollerance) >= arr[i] ) \
-                    and ((arr[minima[-1]]-arr[minima[-1]]*0.01*tollerance <= arr[i]))
-                    or
-                    ((arr[maxima[-1]]+arr[maxima[-1]]*0.01*tollerance) >= arr[i]) \
-                    and (((arr[maxima[-1]]-arr[maxima[-1]]*0.01*tollerance) <= arr[i]))): continue
-            minima.append(arr.index[i]) 
-
-    i = len(arr)-1
-    if arr[-2] < arr[-1] : maxima.append(arr.index[-1]) 
-    if arr[-2] > arr[-1] : minima.append(arr.index[-1])
-    return maxima[1:], minima[1:]
+    # Single pass over the candidate points, see extrema.extremaPositions
+    return extremaDates(arr, length, tollerance)
 
 
 def ColNum2ColName(n):
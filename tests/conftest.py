@@ -0,0 +1,24 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+
+def dailyBars(days, start='2020-01-01', seed=0) :
+    # Random walk of daily bars, as served by the providers
+    close = 100*np.exp(np.cumsum(np.random.default_rng(seed).normal(0, 0.02, days)))
+    return pd.DataFrame({
+        'Open'   : close*0.99,
+        'High'   : close*1.01,
+        'Low'    : close*0.98,
+        'Close'  : close,
+        'Volume' : np.full(days, 1e6),
+    }, index=pd.DatetimeIndex(pd.bdate_range(start, periods=days), name='Date'))
+
+
+@pytest.fixture
+def replayFolder(tmp_path) :
+    # Daily bars of ABC for the ReplayProvider
+    folder = tmp_path / 'replay'
+    folder.mkdir()
+    dailyBars(300).to_csv(folder / 'ABC.csv')
+    return str(folder)
@@ -0,0 +1,36 @@
+import os
+import sys
+import json
+import subprocess
+import pytest
+from src import backends
+from benchmarks.importTime import LAZY
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def importedModules(module, tmp_path) :
+    # Modules loaded by a new interpreter importing module
+    code = 'import sys, json, %s; print(json.dumps(sorted(sys.modules)))' % module
+    env = dict(os.environ, TRADE_DASH_DATA=str(tmp_path))
+    done = subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=env, capture_output=True, text=True)
+    assert done.returncode == 0, done.stderr
+    return json.loads(done.stdout.splitlines()[-1])
+
+
+@pytest.mark.parametrize('module', ['src.server', 'src.layout'])
+def test_server_starts_without_the_backends(module, tmp_path) :
+    modules = importedModules(module, tmp_path)
+    eager = [lazy for lazy in LAZY if any((name == lazy) or name.startswith(lazy + '.') for name in modules)]
+    assert eager == []
+
+
+def test_backend_is_imported_once(monkeypatch) :
+    monkeypatch.setitem(backends.BACKENDS, 'json', 'json')
+    monkeypatch.delitem(backends._modules, 'json', raising=False)
+    assert not backends.loaded('json')
+    assert backends.backend('json') is json
+    assert backends.loaded('json')
+    with pytest.raises(KeyError) :
+        backends.backend('unknown')
@@ -0,0 +1,50 @@
+import os
+import pandas as pd
+from src.dataStore import OHLCVStore
+from src.providers import ReplayProvider
+from conftest import dailyBars
+
+
+class RecordingProvider(ReplayProvider) :
+    # Replay provider keeping the start of every history call
+    def __init__(self, folder, clock=None) :
+        super().__init__(folder, clock=clock)
+        self.calls = []
+
+    def history(self, ticker, start=None, period='5y', interval='1d') :
+        self.calls.append(start)
+        return super().history(ticker, start=start, period=period, interval=interval)
+
+
+def test_history_is_stored(replayFolder, tmp_path) :
+    provider = RecordingProvider(replayFolder)
+    store = OHLCVStore(str(tmp_path / 'store'), provider, period='max')
+    history = store.history('abc')
+    expected = dailyBars(300)
+    assert list(history.index) == list(expected.index)
+    assert (history['Close'].values == pd.read_csv(os.path.join(replayFolder, 'ABC.csv'), index_col=0)['Close'].values).all()
+    assert os.listdir(str(tmp_path / 'store')) == ['ABC.npy']
+    # Served from the disk until maxAge
+    assert store.history('ABC').equals(history)
+    assert provider.calls == [None]
+
+
+def test_refresh_fetches_the_new_bars(replayFolder, tmp_path) :
+    dates = dailyBars(300).index
+    now = [dates[249]]
+    provider = RecordingProvider(replayFolder, clock=lambda : now[0])
+    store = OHLCVStore(str(tmp_path / 'store'), provider, period='max')
+    assert len(store.history('ABC')) == 250
+    now[0] = dates[-1]
+    history = store.refresh('ABC')
+    # Only the bars from the last stored one (maybe partial) are fetched
+    assert provider.calls == [None, dates[249]]
+    assert len(history) == 300 and history.index.is_unique
+    assert store.load('ABC').equals(history)
+    assert os.listdir(str(tmp_path / 'store')) == ['ABC.npy']
+
+
+def test_unknown_ticker_is_empty(replayFolder, tmp_path) :
+    store = OHLCVStore(str(tmp_path / 'store'), ReplayProvider(replayFolder))
+    assert store.history('XYZ').empty
+    assert store.load('XYZ').empty
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+from src.stockClass import Stock, INDICATORS, DATES
+from conftest import dailyBars
+
+
+def assertSameIndicators(stock, expected) :
+    assert stock.stockValue.equals(expected.stockValue)
+    for name in INDICATORS :
+        assert np.array_equal(getattr(stock, name), getattr(expected, name)), name
+    for name in DATES :
+        assert getattr(stock, name).equals(getattr(expected, name)), name
+    assert stock.trends.equals(expected.trends)
+    assert stock.version == expected.version
+
+
+@pytest.mark.parametrize('chunk', [1, 7, 60])
+def test_extend_matches_a_full_recompute(chunk) :
+    bars = dailyBars(600, seed=chunk)
+    stock = Stock('ABC', history=bars.iloc[:400])
+    stock.computeIndicators()
+    for start in range(400, len(bars), chunk) :
+        # The last bar is passed again, it may have been partial
+        stock = stock.extend(bars.iloc[start-1:start+chunk])
+    expected = Stock('ABC', history=bars)
+    expected.computeIndicators()
+    assertSameIndicators(stock, expected)
+
+
+def test_extend_replaces_a_partial_bar() :
+    bars = dailyBars(450)
+    partial = bars.iloc[:401].copy()
+    partial.iloc[-1] *= 0.97
+    stock = Stock('ABC', history=partial)
+    stock.computeIndicators()
+    stock = stock.extend(bars.iloc[400:])
+    expected = Stock('ABC', history=bars)
+    expected.computeIndicators()
+    assertSameIndicators(stock, expected)
+
+
+def test_extend_leaves_the_stock_unchanged() :
+    bars = dailyBars(450)
+    stock = Stock('ABC', history=bars.iloc[:400])
+    stock.computeIndicators()
+    EMA20, version = stock.EMA20.copy(), stock.version
+    stock.extend(bars.iloc[399:])
+    assert np.array_equal(stock.EMA20, EMA20) and stock.version == version
+    assert stock.extend(bars.iloc[:0]) is stock
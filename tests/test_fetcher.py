@@ -0,0 +1,66 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from src.fetcher import FetchPool
+from src.providers import Provider
+from conftest import dailyBars
+
+
+class SlowProvider(Provider) :
+    # Provider counting its downloads, each one takes delay seconds
+    def __init__(self, delay=0.2, batched=False) :
+        self.delay   = delay
+        self.batched = batched
+        self.calls   = []
+        self._guard  = threading.Lock()
+
+    def history(self, ticker, start=None, period='5y', interval='1d') :
+        with self._guard :
+            self.calls.append(ticker.upper())
+        time.sleep(self.delay)
+        return dailyBars(50)
+
+    def historyMany(self, tickers, period='5y', interval='1d') :
+        with self._guard :
+            self.calls.append(tuple(tickers))
+        time.sleep(self.delay)
+        return {t : dailyBars(50) for t in tickers}
+
+
+def test_concurrent_requests_share_one_download() :
+    provider = SlowProvider()
+    pool = FetchPool(provider, workers=4)
+    try :
+        with ThreadPoolExecutor(max_workers=8) as requests :
+            results = list(requests.map(lambda i : pool.history('abc' if i % 2 else 'ABC'), range(8)))
+    finally :
+        pool.shutdown()
+    assert provider.calls == ['ABC']
+    assert all(result.equals(results[0]) for result in results)
+    # Every caller gets its own copy
+    assert len({id(result) for result in results}) == 8
+
+
+def test_finished_downloads_are_not_shared() :
+    provider = SlowProvider(delay=0.0)
+    pool = FetchPool(provider, workers=2)
+    try :
+        pool.history('ABC')
+        pool.history('ABC')
+    finally :
+        pool.shutdown()
+    assert provider.calls == ['ABC', 'ABC']
+
+
+def test_batched_downloads_are_coalesced() :
+    provider = SlowProvider(batched=True)
+    pool = FetchPool(provider, workers=4, batchSize=2)
+    try :
+        first = pool.submitMany(['A', 'B', 'C'])
+        second = pool.submitMany(['B', 'C'])
+        assert second['B'] is first['B']
+        frames = {t : future.result() for t, future in first.items()}
+    finally :
+        pool.shutdown()
+    assert sorted(provider.calls) == [('A', 'B'), ('C',)]
+    assert all(len(frame) == 50 for frame in frames.values())
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+from src.finiteDifference import derivative, derivativeShape, SCHEMES
+
+
+def legacyDerivative(A, schema='upwind', order='first') :
+    # Loops of the former utils.derivative
+    dA = []
+    if schema == 'upwind' :
+        if order == 'first' :
+            for i in range(1,len(A)) :
+                dA.append(A[i]-A[i-1])
+        if order == 'second' :
+            for i in range(2,len(A)) :
+                dA.append((3*A[i] - 4*A[i-1] + A[i-2])*0.5)
+        if order == 'third' :
+            for i in range(3,len(A)) :
+                dA.append((11*A[i] - 18*A[i-1] + 9*A[i-2] - 2*A[i-3])/6)
+    if schema == 'centered' :
+        if order == 'second' :
+            for i in range(1,len(A)-1) :
+                dA.append((A[i+1] - A[i-1])*0.5)
+    return np.array(dA, dtype=np.float64)
+
+
+def series(kind, n=500) :
+    rng = np.random.default_rng(n)
+    if kind == 'int' : return rng.integers(-10**6, 10**6, n)
+    return 100*np.exp(np.cumsum(rng.normal(0, 0.02, n)))
+
+
+@pytest.mark.parametrize('kind', ['float', 'int'])
+@pytest.mark.parametrize('scheme', sorted(SCHEMES))
+def test_series_are_bit_identical(scheme, kind) :
+    A = series(kind)
+    assert np.array_equal(derivative(A, *scheme), legacyDerivative(list(A), *scheme))
+
+
+@pytest.mark.parametrize('scheme', sorted(SCHEMES))
+def test_panels_axis_and_out(scheme) :
+    panel = np.stack([series('float', 300 + i)[:300] for i in range(5)], axis=1)
+    expected = np.stack([legacyDerivative(list(panel[:, j]), *scheme) for j in range(panel.shape[1])], axis=1)
+    assert np.array_equal(derivative(panel, *scheme), expected)
+    assert np.array_equal(derivative(panel.T, *scheme, axis=1), expected.T)
+    assert np.array_equal(derivative(panel.T, *scheme, axis=-1), expected.T)
+    out = np.full(derivativeShape(panel.shape, *scheme), np.nan)
+    assert derivative(panel, *scheme, out=out) is out
+    assert np.array_equal(out, expected)
+
+
+@pytest.mark.parametrize('scheme', sorted(SCHEMES))
+def test_short_series_are_empty(scheme) :
+    for n in range(4) :
+        assert np.array_equal(derivative(np.arange(n), *scheme), legacyDerivative(list(range(n)), *scheme))
+
+
+def test_invalid_arguments() :
+    with pytest.raises(ValueError) :
+        derivative(np.arange(10), 'centered', 'first')
+    with pytest.raises(ValueError) :
+        derivative(np.arange(10), out=np.empty(3))
@@ -0,0 +1,73 @@
+import os
+import time
+import sqlite3
+import pytest
+from src import jobs
+from src.jobs import JobQueue
+
+
+class FakeStock(object) :
+    # What a job needs of a Stock: its name and data version
+    def __init__(self, name, version) :
+        self.stockName = name
+        self.version   = version
+
+
+def fakeForecast(stock, progress, registry) :
+    # Imported by reference in the worker process
+    progress(0.5)
+    return {'ticker' : stock.stockName, 'version' : stock.version}
+
+
+def wait(queue, jobId, timeout=60) :
+    deadline = time.time() + timeout
+    while time.time() < deadline :
+        status = queue.status(jobId)
+        if status['status'] in ['done', 'failed'] : return status
+        time.sleep(0.1)
+    raise AssertionError('job %s still %s' % (jobId, status))
+
+
+@pytest.fixture
+def queue(tmp_path, monkeypatch) :
+    monkeypatch.setitem(jobs.FORECASTS, 'fake', fakeForecast)
+    queue = JobQueue(str(tmp_path / 'jobs.sqlite'))
+    yield queue
+    queue.shutdown()
+
+
+def test_submitted_job_finishes(queue) :
+    stock = FakeStock('abc', 'v1')
+    jobId = queue.submit('fake', stock)
+    assert queue.status(jobId)['status'] in ['queued', 'running']
+    assert wait(queue, jobId)['status'] == 'done'
+    assert queue.result(jobId) == {'ticker' : 'abc', 'version' : 'v1'}
+    # Done jobs are not trained again
+    assert queue.submit('fake', stock) == jobId
+
+
+def test_new_queue_keeps_running_jobs(queue, tmp_path) :
+    # A second queue on the same table, e.g. built by another server process
+    jobId = queue.submit('fake', FakeStock('abc', 'v2'))
+    other = JobQueue(str(tmp_path / 'jobs.sqlite'))
+    try :
+        assert other.status(jobId) is not None
+        assert wait(queue, jobId)['status'] == 'done'
+    finally :
+        other.shutdown()
+
+
+def test_orphaned_jobs_are_trained_again(queue, tmp_path) :
+    path = str(tmp_path / 'jobs.sqlite')
+    connection = sqlite3.connect(path, isolation_level=None)
+    # Left running by a previous run of the server with the same pid (e.g. pid 1 in a container)
+    connection.execute("INSERT INTO jobs VALUES ('fake-ABC-v3', 'fake', 'ABC', 'running', 0.3, '', NULL, 0, ?)", ('%d-previous' % os.getpid(),))
+    connection.close()
+    restarted = JobQueue(path)
+    try :
+        assert restarted.status('fake-ABC-v3')['status'] == 'failed'
+        jobId = restarted.submit('fake', FakeStock('abc', 'v3'))
+        assert jobId == 'fake-ABC-v3'
+        assert wait(restarted, jobId)['status'] == 'done'
+    finally :
+        restarted.shutdown()
@@ -0,0 +1,21 @@
+import pandas as pd
+import pytest
+from src.providers import Provider, ReplayProvider, getProvider
+
+
+def test_provider_without_history_is_not_instantiated() :
+    class Incomplete(Provider) :
+        def shortName(self, ticker) :
+            return ticker
+
+    with pytest.raises(TypeError) :
+        Incomplete()
+
+
+def test_replay_serves_the_bars_up_to_the_clock(replayFolder) :
+    now = pd.Timestamp('2020-03-02')
+    provider = getProvider(ReplayProvider(replayFolder, clock=lambda : now))
+    bars = provider.history('abc', period='max')
+    assert bars.index[-1] <= now
+    assert provider.history('abc', start='2020-02-27').index.min() >= pd.Timestamp('2020-02-27')
+    assert provider.history('XYZ').empty
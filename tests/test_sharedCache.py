@@ -0,0 +1,67 @@
+import time
+import threading
+from src.sharedCache import SharedCache
+from src.stockCache import StockCache
+from test_stockCache import Builder, waitFor
+
+
+def workers(tmp_path, count, **kwargs) :
+    # Caches on the same file, as opened by the worker processes of the server
+    path = str(tmp_path / 'cache.sqlite')
+    return [SharedCache(path, **kwargs) for _ in range(count)]
+
+
+def test_single_build_across_workers(tmp_path) :
+    caches = workers(tmp_path, 4, ttls={'indicators' : (60, 0)}, poll=0.01)
+    builder = Builder(delay=0.2)
+    start = threading.Barrier(len(caches))
+    results = []
+
+    def get(cache) :
+        start.wait()
+        results.append(cache.get('indicators', 'A', builder.build))
+
+    threads = [threading.Thread(target=get, args=(cache,)) for cache in caches]
+    for thread in threads : thread.start()
+    for thread in threads : thread.join()
+    assert builder.builds == 1
+    assert results == [{'version' : 0}]*len(caches)
+
+
+def test_stale_entry_is_served_while_refreshed(tmp_path) :
+    first, second = workers(tmp_path, 2, ttls={'indicators' : (0.05, 60)})
+    builder = Builder()
+    first.get('indicators', 'A', builder.build, builder.update)
+    time.sleep(0.1)
+    builder.release.clear()
+    # One worker refreshes in the background, both keep serving the stale value
+    assert first.get('indicators', 'A', builder.build, builder.update) == {'version' : 0}
+    assert second.get('indicators', 'A', builder.build, builder.update) == {'version' : 0}
+    builder.release.set()
+    assert waitFor(lambda : second.peek('indicators', 'A') is not None)
+    assert second.get('indicators', 'A', builder.build, builder.update) == {'version' : 1}
+    assert len(builder.updates) == 1
+
+
+def test_lease_of_a_dead_worker_expires(tmp_path) :
+    dead, alive = workers(tmp_path, 2, ttls={'indicators' : (60, 0)}, lease=0.3, poll=0.01)
+    builder = Builder()
+    start = time.monotonic()
+    # Taken by a worker which died before storing the value
+    assert dead._acquire('indicators', 'A', 'dead')
+    assert alive.get('indicators', 'A', builder.build) == {'version' : 0}
+    assert time.monotonic() - start >= 0.3
+    assert builder.builds == 1
+    # The lease is released once the value is stored
+    assert dead._acquire('indicators', 'A', 'next')
+
+
+def test_stock_cache_reads_the_shared_entries(tmp_path) :
+    first, second = workers(tmp_path, 2, ttls={'indicators' : (60, 0)})
+    builder = Builder()
+    a = StockCache(shared=first, kind='indicators')
+    b = StockCache(shared=second, kind='indicators')
+    assert a.get('A', builder.build) == b.get('A', builder.build)
+    assert builder.builds == 1
+    b.invalidate('A')
+    assert first.peek('indicators', repr('A')) is None
@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+import pytest
+from src.signals import minMaxTrend
+from src.utils import nearest_yesterday, ColNum2ColName
+from conftest import dailyBars
+
+
+def referenceTrend(close, dateMaxs, dateMins, daysToSubtract, windowSize) :
+    # Loop of the original Stock.minMaxTrend_buylogic
+    trend = []
+    daysToSubtract = min(daysToSubtract, len(close))
+    for i in range(daysToSubtract) :
+        day = close.index[-daysToSubtract+i]
+        lastMin = nearest_yesterday(dateMins, day)
+        lastMax = nearest_yesterday(dateMaxs, day)
+        if close.iloc[-daysToSubtract+i] > close[lastMax] : trend.append((day, 1))
+        elif close.iloc[-daysToSubtract+i] < close[lastMin] : trend.append((day, -1))
+        else : trend.append((day, 0))
+    rows = []
+    labelN = 1
+    for i in range(windowSize, len(trend)) :
+        votes = [x[1] for x in trend[i-windowSize:i]]
+        if votes.count(1) >= int(0.6*windowSize) : rows.append((trend[i][0], ColNum2ColName(labelN), np.nan))
+        elif votes.count(-1) >= int(0.6*windowSize) : rows.append((trend[i][0], np.nan, ColNum2ColName(labelN)))
+        else : labelN += 1
+    weightedTrend = pd.DataFrame(rows, columns=['Date','UpTrend','DownTrend'])
+    enterDays = [];     exitDays = []
+    for label in weightedTrend['UpTrend'].dropna().unique() :
+        days = weightedTrend[weightedTrend['UpTrend'] == label]['Date']
+        if len(days) < 4 : continue
+        enterDays.append(days.iloc[0])
+        exitDays.append(days.iloc[-1])
+    return weightedTrend, enterDays, exitDays
+
+
+def wrappedExtrema(dates, rng) :
+    # Extrema of a history shorter than the extrema window: the search starts
+    # from the last dates and wraps around, so the list is not sorted
+    dates = sorted(rng.choice(dates, size=rng.integers(2, 12), replace=False))
+    shift = rng.integers(0, len(dates))
+    return list(dates[shift:] + dates[:shift])
+
+
+@pytest.mark.parametrize('seed', range(60))
+def test_short_series_match_the_scan(seed) :
+    rng = np.random.default_rng(seed)
+    close = dailyBars(int(rng.integers(20, 200)), seed=seed)['Close']
+    dateMaxs = wrappedExtrema(close.index, rng)
+    dateMins = wrappedExtrema(close.index, rng)
+    windowSize = int(rng.integers(3, 7))
+    trends, enterDays, exitDays = minMaxTrend(close, dateMaxs, dateMins, 180, windowSize)
+    expected, expectedEnter, expectedExit = referenceTrend(close, dateMaxs, dateMins, 180, windowSize)
+    assert list(trends['Date']) == list(expected['Date'])
+    assert list(trends['UpTrend'].fillna('')) == list(expected['UpTrend'].fillna(''))
+    assert list(trends['DownTrend'].fillna('')) == list(expected['DownTrend'].fillna(''))
+    assert enterDays == expectedEnter and exitDays == expectedExit
+
+
+def test_no_extrema_is_no_trend() :
+    close = dailyBars(50)['Close']
+    trends, enterDays, exitDays = minMaxTrend(close, [], list(close.index[:3]))
+    assert trends.empty and enterDays == [] and exitDays == []
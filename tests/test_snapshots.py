@@ -0,0 +1,44 @@
+import mmap
+import numpy as np
+import pytest
+from src.snapshots import SnapshotStore
+from src.stockClass import Stock, INDICATORS, DATES
+from conftest import dailyBars
+
+
+def mappedFile(array) :
+    # File mapping an array is a view of, None when it owns its data
+    while isinstance(array, np.ndarray) : array = array.base
+    return array if isinstance(array, mmap.mmap) else None
+
+
+@pytest.fixture
+def stock() :
+    stock = Stock('ABC', history=dailyBars(400))
+    stock.computeIndicators()
+    return stock
+
+
+def test_load_maps_the_arrays(stock, tmp_path) :
+    snapshots = SnapshotStore(str(tmp_path))
+    snapshot = snapshots.save(stock)
+    assert snapshots.current('ABC')['snapshot'] == snapshot
+    loaded = snapshots.load('abc')
+    # Nothing is copied out of the mapped file, the bars included
+    mapped = mappedFile(loaded.EMA20)
+    assert mapped is not None
+    blob = np.frombuffer(mapped, dtype=np.uint8)
+    for array in [loaded.bars, loaded.dates] + [getattr(loaded, name) for name in INDICATORS] :
+        assert np.shares_memory(array, blob)
+    assert np.array_equal(loaded.bars, stock.bars)
+    assert loaded.stockValue.equals(stock.stockValue)
+    assert loaded.version == stock.version and loaded.snapshot == snapshot
+    for name in INDICATORS :
+        assert np.array_equal(getattr(loaded, name), getattr(stock, name)), name
+    for name in DATES :
+        assert getattr(loaded, name).equals(getattr(stock, name)), name
+    assert loaded.trends.equals(stock.trends)
+
+
+def test_missing_snapshot(tmp_path) :
+    assert SnapshotStore(str(tmp_path)).load('XYZ') is None
@@ -0,0 +1,102 @@
+import time
+import threading
+from src.stockCache import StockCache
+
+
+class Builder(object) :
+    # Counts the builds and the updates, each result is a new object
+    def __init__(self, delay=0.0) :
+        self.delay   = delay
+        self.builds  = 0
+        self.updates = []
+        self.release = threading.Event()
+        self.release.set()
+        self._guard  = threading.Lock()
+
+    def build(self) :
+        with self._guard :
+            self.builds += 1
+        time.sleep(self.delay)
+        return {'version' : 0}
+
+    def update(self, expired) :
+        self.release.wait(10)
+        with self._guard :
+            self.updates.append(expired)
+        return {'version' : expired['version'] + 1}
+
+
+def waitFor(condition, timeout=5) :
+    end = time.monotonic() + timeout
+    while (not condition()) and (time.monotonic() < end) :
+        time.sleep(0.01)
+    return condition()
+
+
+def test_least_recently_used_is_evicted() :
+    cache = StockCache(maxSize=2)
+    builder = Builder()
+    a = cache.get('A', builder.build)
+    cache.get('B', builder.build)
+    # A is used again, so B is the least recently used
+    assert cache.get('A', builder.build) is a
+    cache.get('C', builder.build)
+    assert len(cache) == 2
+    assert cache.peek('B') is None
+    assert cache.peek('A') is a
+    assert builder.builds == 3
+    cache.get('B', builder.build)
+    assert builder.builds == 4
+    # peek counts as a use, C was the least recently used
+    assert cache.peek('C') is None and cache.peek('A') is a
+
+
+def test_single_build_under_concurrent_gets() :
+    cache = StockCache()
+    builder = Builder(delay=0.2)
+    start = threading.Barrier(8)
+    results = []
+
+    def get() :
+        start.wait()
+        results.append(cache.get('A', builder.build))
+
+    threads = [threading.Thread(target=get) for _ in range(8)]
+    for thread in threads : thread.start()
+    for thread in threads : thread.join()
+    assert builder.builds == 1
+    assert len(results) == 8
+    assert all(result is results[0] for result in results)
+
+
+def test_stale_entry_is_served_while_refreshed() :
+    cache = StockCache(ttl=0.05, stale=60)
+    builder = Builder()
+    first = cache.get('A', builder.build, builder.update)
+    time.sleep(0.1)
+    builder.release.clear()
+    # The refresh is blocked, the stale value is returned at once by every get
+    for _ in range(3) :
+        assert cache.get('A', builder.build, builder.update) is first
+    builder.release.set()
+    assert waitFor(lambda : cache.peek('A') is not None)
+    assert cache.get('A', builder.build, builder.update) == {'version' : 1}
+    assert builder.updates == [first]
+    assert builder.builds == 1
+
+
+def test_expired_entry_is_updated_before_returning() :
+    cache = StockCache(ttl=0.05, stale=0)
+    builder = Builder()
+    first = cache.get('A', builder.build, builder.update)
+    time.sleep(0.1)
+    assert cache.get('A', builder.build, builder.update) == {'version' : 1}
+    assert builder.updates == [first]
+
+
+def test_none_is_not_cached() :
+    cache = StockCache()
+    calls = []
+    assert cache.get('A', lambda : calls.append(1)) is None
+    assert cache.get('A', lambda : calls.append(1)) is None
+    assert len(calls) == 2 and len(cache) == 0
@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+import pytest
+from conftest import dailyBars
+from src.providers import ReplayProvider
+from src.stockClass import Stock, STREAMED
+
+
+@pytest.fixture
+def dashCallbacks(tmp_path, monkeypatch) :
+    # The server keeps its caches in TRADE_DASH_DATA
+    monkeypatch.setenv('TRADE_DASH_DATA', str(tmp_path / 'data'))
+    pytest.importorskip('dash')
+    from src import dashCallbacks
+    return dashCallbacks
+
+
+@pytest.fixture
+def replay(tmp_path) :
+    # One session of minute bars of ABC, served up to the moving clock
+    folder = tmp_path / 'replay'
+    folder.mkdir()
+    bars = dailyBars(390)
+    bars.index = pd.DatetimeIndex(pd.date_range('2020-01-02 09:30', periods=390, freq='1min'), name='Date')
+    bars.to_csv(folder / 'ABC_1m.csv')
+    clock = {'now' : bars.index[299]}
+    return ReplayProvider(str(folder), clock=lambda : clock['now']), clock, bars.index
+
+
+def intradayStock(provider) :
+    stock = Stock('ABC', lib=provider, interval='1m', period='5d')
+    stock.computeIndicators()
+    return stock
+
+
+def streamedTraces(fig) :
+    # uid -> {attribute : values} of the traces extended by the browser
+    traces = {}
+    for trace in fig.data :
+        if trace.uid not in STREAMED : continue
+        keys = ['x', 'open', 'high', 'low', 'close'] if trace.uid == 'OHLC' else ['x', 'y']
+        traces[trace.uid] = {key : list(getattr(trace, key)) for key in keys}
+    return traces
+
+
+def extendTraces(traces, points) :
+    # Same as assets/stream.js, a point at the last rendered date replaces it
+    for uid, update in points.items() :
+        trace = traces[uid]
+        if pd.Timestamp(trace['x'][-1]) == pd.Timestamp(update['x'][0]) :
+            for key in trace : trace[key] = trace[key][:-1]
+        for key in trace : trace[key] = trace[key] + list(update[key])
+    return traces
+
+
+def graphs(stock) :
+    return stock.updateGraphs(EMA20=True, EMA50=True, SMA200=True, Momentum=True, MACD=True, LSTM=False, Prophet=False)
+
+
+def test_ticks_extend_the_rendered_traces(dashCallbacks, replay, monkeypatch) :
+    provider, clock, index = replay
+    monkeypatch.setattr(dashCallbacks, 'provider', provider)
+    stock = intradayStock(provider)
+    rendered = streamedTraces(graphs(stock))
+    cursor = stock.stockValue.index[-1]
+    for end in [300, 301, 330, 389] :
+        clock['now'] = index[end]
+        stock = dashCallbacks.refreshIntraday(stock)
+        points = stock.streamPoints(cursor)
+        # Only the bars from the cursor on are sent
+        assert sorted(points) == sorted(STREAMED)
+        for uid, update in points.items() :
+            assert [pd.Timestamp(x) for x in update['x']] == list(index[index.get_loc(cursor):end+1])
+        rendered = extendTraces(rendered, points)
+        cursor = stock.stockValue.index[-1]
+        assert cursor == index[end]
+
+    full = streamedTraces(graphs(intradayStock(provider)))
+    for uid in STREAMED :
+        for key, values in full[uid].items() :
+            if key == 'x' :
+                assert [pd.Timestamp(x) for x in rendered[uid]['x']] == [pd.Timestamp(x) for x in values]
+            else :
+                assert np.array_equal(np.asarray(rendered[uid][key], dtype=float), np.asarray(values, dtype=float))
+
+
+def test_tick_without_new_bars(dashCallbacks, replay, monkeypatch) :
+    provider, clock, index = replay
+    monkeypatch.setattr(dashCallbacks, 'provider', provider)
+    stock = intradayStock(provider)
+    cursor = stock.stockValue.index[-1]
+    stock = dashCallbacks.refreshIntraday(stock)
+    points = stock.streamPoints(cursor)
+    # The last bar is sent again, it may have been partial
+    assert all(update['x'] == [cursor.isoformat()] for update in points.values())
+    assert stock.streamPoints(cursor + pd.Timedelta(minutes=1)) == {}